@@ -1,47 +1,363 @@
 import os
 import json
+import math
 import argparse
 import sys
 import base64
-import re
-from pydub import AudioSegment
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
-from services.azure_service import AzureService
-from services.github_service import GitHubService
-from openai import AzureOpenAI
-import tempfile
-from prompts import AUDIO_TRANSCRIPTION_PROMPT, MODIFY_TASKS_VOICE_PROMPT, MODIFY_GANTT_VOICE_PROMPT
 
-# Load environment variables
+# Load environment variables before the services read their settings at import time
 load_dotenv()
 
+from services.azure_service import AzureService, BREAKDOWN_CONCURRENCY, BREAKDOWN_TIMEOUT
+from services.github_service import GitHubService
+from services.rate_limiter import GitHubRateLimitError
+from services.task_snapshots import TaskSnapshotStore, verify_webhook_signature, WEBHOOK_SECRET
+from services.plan_store import PlanStore, PlanNotFoundError, PlanConflictError, InvalidPlanError, plan_goal, plan_goals, plan_goal_titles, plan_issue_goals
+from services.audio_normalizer import read_upload, AudioNormalizationError, TARGET_RATE, TARGET_SAMPLE_WIDTH, get_stats as get_audio_stats
+from services.audio_workers import audio_pool, AudioPoolBusy
+from services.audio_chunker import split_at_silence
+from services.token_budget import count_message_tokens, rewrite_budget, patch_budget, summary_budget, token_usage
+from services.llm_gateway import llm_gateway
+from services.response_decoder import extract_json, decode_task_list
+from services.json_patch import apply_patch, JSONPatchError
+from prompts import (
+    AUDIO_TRANSCRIPTION_PROMPT,
+    MODIFY_TASKS_VOICE_PROMPT,
+    MODIFY_GANTT_VOICE_PROMPT,
+    MODIFY_TASKS_VOICE_PATCH_PROMPT,
+    MODIFY_GANTT_VOICE_PATCH_PROMPT
+)
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Initialize services
-azure_service = AzureService()
-github_service = GitHubService()
-
-# Azure OpenAI configuration
-base_endpoint = os.getenv("ENDPOINT_URL", "https://general-github-manager.openai.azure.com/")
-text_deployment = os.getenv("DEPLOYMENT_NAME", "gpt-4o")
-audio_endpoint = "https://general-github-manager.openai.azure.com/"  # Base endpoint only
-subscription_key = os.getenv("AZURE_OPENAI_KEY")
-
-# Initialize Azure OpenAI clients
-text_client = AzureOpenAI(
-    azure_endpoint=base_endpoint,
-    api_key=subscription_key,
-    api_version="2024-02-15-preview",
-)
+# Services, created by create_app(). Importing this module must not build them:
+# spawned audio decode workers re-run the main script (python app.py) on start.
+azure_service = None
+github_service = None
+task_snapshots = None
+plan_store = None
 
-audio_client = AzureOpenAI(
-    azure_endpoint=audio_endpoint,
-    api_key=subscription_key,
-    api_version="2024-02-15-preview",
-)
+def create_app():
+    """
+    Create the services the routes use, once per process, and return the Flask app.
+    
+    Entry points call this before serving: python app.py, asgi.py, or
+    gunicorn "app:create_app()".
+    """
+    global azure_service, github_service, task_snapshots, plan_store
+    if plan_store is None:
+        azure_service = AzureService()
+        github_service = GitHubService()
+        task_snapshots = TaskSnapshotStore()
+        plan_store = PlanStore()
+    return app
+
+# Ceiling of the completion budget for a whole-recording summary
+TRANSCRIBE_MAX_TOKENS = 5000
+
+# Default for the voice edit routes' "mode" field: "full" (the model rewrites the
+# whole document) or "patch" (the model returns JSON Patch operations)
+VOICE_EDIT_MODE = os.getenv('VOICE_EDIT_MODE', 'full')
+
+# Streaming transcription: windows summarized at once, and the token cap per window
+TRANSCRIBE_WORKERS = int(os.getenv('AUDIO_TRANSCRIBE_WORKERS', '4'))
+TRANSCRIBE_WINDOW_MAX_TOKENS = int(os.getenv('AUDIO_TRANSCRIBE_WINDOW_MAX_TOKENS', '1500'))
+
+# Helpers shared by the Flask routes and the async routes in asgi.py
+def _azure_error_response(action, e):
+    """Map an AzureService failure to an error body and status code."""
+    print(f"Error {action}: {str(e)}")
+    error_message = str(e)
+    if "Azure OpenAI credentials not properly configured" in error_message:
+        return {"error": "Azure API is not properly configured. Please set up your Azure OpenAI credentials."}, 500
+    return {"error": f"Failed to {action}: {error_message}"}, 500
+
+def _plan_error_response(e):
+    """Map a plan store failure to an error body and status code."""
+    print(f"Plan store error: {str(e)}")
+    if isinstance(e, InvalidPlanError):
+        return {"error": str(e)}, 422
+    return {"error": str(e)}, 409 if isinstance(e, PlanConflictError) else 404
+
+def _load_plan(data):
+    """
+    Return the latest plan document named by a request's plan_id, or None without one.
+    
+    Raises:
+        PlanNotFoundError: If the plan does not exist
+    """
+    plan_id = data.get('plan_id')
+    return plan_store.get(plan_id)['plan'] if plan_id else None
+
+def _store_generated_plan(prompt, goals):
+    """Save generated goals as a new plan; returns the response fields (empty if saving failed)."""
+    try:
+        plan_id, version = plan_store.create({"prompt": prompt, "goals": goals}, 'generate_goals')
+        return {"plan_id": plan_id, "plan_version": version}
+    except Exception as e:
+        print(f"Error saving plan: {str(e)}")
+        return {}
+
+def _resolve_break_down(data, plan=None):
+    """
+    Read one goal of a break-down request, filling it in from the plan if there is one.
+    
+    Args:
+        data (dict): Goal fields (goal_id, goal_title, goal_description, or
+                     id/title/description) plus the request's "regenerate" flag
+        plan (dict, optional): The request's plan document
+    
+    Returns:
+        tuple: (goal_id, goal_title, goal_description, stored smaller goals or None);
+               the stored ones are only returned while the goal matches the plan
+    
+    Raises:
+        PlanNotFoundError: If the goal is not in the plan
+        InvalidPlanError: If the stored plan is malformed
+    """
+    goal_id = data.get('goal_id', data.get('id'))
+    goal_title = data.get('goal_title', data.get('title', ''))
+    goal_description = data.get('goal_description', data.get('description', ''))
+    if plan is None:
+        return goal_id, goal_title, goal_description, None
+    
+    goal = plan_goal(plan, goal_id)
+    if goal is None:
+        raise PlanNotFoundError(f"Goal {goal_id} not found in plan")
+    unchanged = goal_title in ('', goal.get('title', '')) and goal_description in ('', goal.get('description', ''))
+    stored = goal.get('smaller_goals') if unchanged and not data.get('regenerate') else None
+    return goal_id, goal_title or goal.get('title', ''), goal_description or goal.get('description', ''), stored or None
+
+def _store_break_down(plan_id, goal_id, smaller_goals):
+    """Record a goal's break-down in its plan; returns the response fields (empty without a plan or on failure)."""
+    if not plan_id:
+        return {}
+    try:
+        return {"plan_id": plan_id, "plan_version": plan_store.set_smaller_goals(plan_id, goal_id, smaller_goals)}
+    except Exception as e:
+        print(f"Error saving break-down of goal {goal_id}: {str(e)}")
+        return {}
+
+def _normalize_repo_info(repo_info):
+    """Ensure generated repository info has repo_name and description keys."""
+    print(f"Generated repo info: {repo_info}")
+    if not isinstance(repo_info, dict) or 'repo_name' not in repo_info or 'description' not in repo_info:
+        print(f"Warning: Repo info has incorrect format: {repo_info}")
+        # Fix the format if needed
+        if isinstance(repo_info, dict):
+            if 'name' in repo_info and 'repo_name' not in repo_info:
+                repo_info['repo_name'] = repo_info['name']
+            if 'repo_description' in repo_info and 'description' not in repo_info:
+                repo_info['description'] = repo_info['repo_description']
+        else:
+            # Provide fallback values
+            repo_info = {
+                "repo_name": "github-project",
+                "description": "A GitHub project."
+            }
+    print(f"Returning repo info: {repo_info}")
+    return repo_info
+
+def _create_issues_options(data):
+    """Read the parallel flag and worker count of a create-issues request."""
+    parallel = data.get('parallel', os.getenv('GITHUB_PARALLEL_ISSUES', 'true').lower() == 'true')
+    try:
+        max_workers = int(data['max_workers']) if data.get('max_workers') is not None else None
+    except (TypeError, ValueError):
+        max_workers = None  # create_issues_parallel falls back to GITHUB_ISSUE_WORKERS
+    return parallel, max_workers
+
+def _break_down_options(data):
+    """
+    Read the concurrency and timeout of a break-down-goals request.
+    
+    Returns:
+        tuple: (max_workers clamped to 1..BREAKDOWN_CONCURRENCY, timeout clamped to
+               BREAKDOWN_TIMEOUT); None where the request leaves it to the default
+    
+    Raises:
+        ValueError: If either value is not a number, or the timeout is not positive
+    """
+    max_workers = data.get('max_concurrency')
+    timeout = data.get('timeout')
+    if max_workers is not None:
+        try:
+            if isinstance(max_workers, bool):
+                raise TypeError
+            max_workers = max(1, min(int(max_workers), BREAKDOWN_CONCURRENCY))
+        except (TypeError, ValueError):
+            raise ValueError("max_concurrency must be an integer")
+    if timeout is not None:
+        try:
+            if isinstance(timeout, bool):
+                raise TypeError
+            timeout = float(timeout)
+        except (TypeError, ValueError):
+            raise ValueError("timeout must be a number of seconds")
+        if not 0 < timeout < float('inf'):
+            raise ValueError("timeout must be a positive number of seconds")
+        timeout = min(timeout, BREAKDOWN_TIMEOUT)
+    return max_workers, timeout
+
+def _create_issues_result(result):
+    """Build the create-issues response body from a create_issues_parallel result."""
+    if result["failures"] and not result["issues"]:
+        # Nothing was created; surface the first error through _create_issues_error
+        raise Exception(result["failures"][0]["error"])
+    return {
+        "success": not result["failures"],
+        "issues": result["issues"],
+        "failures": result["failures"]
+    }
+
+def _retry_after_headers(e):
+    """Retry-After header for a GitHubRateLimitError, rounded up to whole seconds."""
+    return {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else {}
+
+def _rate_limit_response(e):
+    """Map a GitHubRateLimitError in a Flask route to a 429 response."""
+    print(f"GitHub rate limited: {str(e)}")
+    return jsonify({"error": "GitHub rate limit reached. Please try again shortly."}), 429, _retry_after_headers(e)
+
+def _create_issues_error(repo_name, e):
+    """Map a create-issues failure to an error body, status code and headers."""
+    if isinstance(e, GitHubRateLimitError):
+        print(f"Rate limited while creating issues: {str(e)}")
+        return {"error": "GitHub rate limit reached. Please try again shortly."}, 429, _retry_after_headers(e)
+    # Some issues may have been created before the failure
+    task_snapshots.invalidate(repo_name)
+    print(f"Error creating issues: {str(e)}")
+    error_message = str(e)
+    if "GitHub token is not configured" in error_message:
+        return {"error": "GitHub API is not properly configured. Please set up your GitHub token."}, 500, {}
+    elif "Not Found" in error_message:
+        return {"error": f"Repository '{repo_name}' not found. Please check the repository name."}, 404, {}
+    return {"error": f"Failed to create issues: {error_message}"}, 500, {}
+
+def _audio_busy_error(e):
+    """Map a full audio decode queue to an error body, status code and headers."""
+    print(f"Shedding audio upload: {str(e)}")
+    return {"error": "Audio processing is busy. Please try again shortly."}, 503, {"Retry-After": str(e.retry_after)}
+
+def _build_transcription_messages(audio_data, user_text="\n"):
+    """Create the messages for the transcription call with the exact required structure."""
+    return [
+        {
+            "role": "system",
+            "content": [
+                {
+                    "type": "text",
+                    "text": AUDIO_TRANSCRIPTION_PROMPT
+                }
+            ]
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": user_text
+                },
+                {
+                    "type": "input_audio",
+                    "input_audio": {
+                        "data": audio_data,
+                        "format": "wav"
+                    }
+                }
+            ]
+        },
+        {
+            "role": "assistant",
+            "content": []
+        }
+    ]
+
+def _audio_seconds(audio_data):
+    """Length of a base64-encoded normalized WAV, in seconds."""
+    return len(audio_data) * 3 / 4 / (TARGET_RATE * TARGET_SAMPLE_WIDTH)
+
+def _audio_completion(messages, max_tokens, usage_kind):
+    """Call the audio deployment pool and record the call's token usage."""
+    response = llm_gateway.create(
+        'audio',
+        messages=messages,
+        temperature=0.7,
+        top_p=0.95,
+        max_tokens=max_tokens
+    )
+    token_usage.record(usage_kind, count_message_tokens(messages), max_tokens, response)
+    return response
+
+def _voice_edit_mode():
+    """The edit mode requested for a voice edit route."""
+    mode = request.form.get('mode', VOICE_EDIT_MODE)
+    return mode if mode in ('full', 'patch') else VOICE_EDIT_MODE
+
+def _apply_voice_patch(ai_response, original):
+    """
+    Decode a patch-mode voice edit and apply it to the current document.
+    
+    Returns:
+        dict: "transcription", "patch" and the merged document ("updated"); when
+              the patch is missing or does not apply, "error" says why and
+              "updated" is the original document
+    """
+    decoded = extract_json(ai_response, accept=lambda value: isinstance(value, list) or (
+        isinstance(value, dict) and isinstance(value.get('patch'), list)))
+    if decoded is None:
+        return {'transcription': ai_response, 'patch': [], 'updated': original,
+                'error': 'No JSON Patch found in the response'}
+    
+    transcription, patch = (None, decoded) if isinstance(decoded, list) else (decoded.get('transcription'), decoded['patch'])
+    result = {'transcription': transcription or '', 'patch': patch}
+    try:
+        result['updated'] = apply_patch(original, patch)
+    except JSONPatchError as e:
+        print(f"Rejected voice edit patch: {str(e)}")
+        result['updated'] = original
+        result['error'] = str(e)
+    return result
+
+def _sse_event(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _transcribe_window(index, total, start, end, wav_bytes):
+    """Summarize one window of a long recording with the audio deployment."""
+    audio_data = base64.b64encode(wav_bytes).decode('utf-8')
+    user_text = f"Part {index + 1} of {total} of a longer recording ({start:.0f}s to {end:.0f}s)." if total > 1 else "\n"
+    response = _audio_completion(
+        _build_transcription_messages(audio_data, user_text),
+        summary_budget(end - start, cap=TRANSCRIBE_WINDOW_MAX_TOKENS),
+        'transcribe_window'
+    )
+    return response.choices[0].message.content
+
+def _message_stream(messages):
+    """
+    Stream dict messages as NDJSON, or as server-sent events (named by their
+    "type") when the client sends "Accept: text/event-stream" or ?format=sse.
+    """
+    use_sse = request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+    
+    def generate():
+        for message in messages:
+            if use_sse:
+                yield _sse_event(message['type'], message)
+            else:
+                yield json.dumps(message) + "\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 # Routes for serving the frontend
 @app.route('/')
@@ -64,6 +380,22 @@ def health_check():
     """Health check endpoint to verify the API is running."""
     return jsonify({"status": "healthy"}), 200
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Expose runtime counters for the backend services."""
+    return jsonify({
+        "github": github_service.get_stats(),
+        "task_snapshots": task_snapshots.get_stats(),
+        "audio": get_audio_stats(),
+        "audio_pool": audio_pool.get_stats(),
+        "speech": azure_service.speech_transcriber.get_stats(),
+        "llm_cache": azure_service.llm_cache.get_stats(),
+        "llm_single_flight": azure_service.single_flight.get_stats(),
+        "token_budget": token_usage.get_stats(),
+        "llm_gateway": llm_gateway.get_stats(),
+        "plan_store": plan_store.get_stats()
+    }), 200
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze_prompt():
     """Analyze the user's prompt and generate big goals."""
@@ -76,42 +408,154 @@ def analyze_prompt():
     
     try:
         goals = azure_service.generate_goals(prompt)
-        return jsonify({"big_goals": goals})
+        return jsonify({"big_goals": goals, **_store_generated_plan(prompt, goals["goals"])})
     except Exception as e:
-        print(f"Error generating goals: {str(e)}")
-        error_message = str(e)
-        if "Azure OpenAI credentials not properly configured" in error_message:
-            return jsonify({"error": "Azure API is not properly configured. Please set up your Azure OpenAI credentials."}), 500
-        return jsonify({"error": f"Failed to generate goals: {error_message}"}), 500
+        body, status = _azure_error_response("generate goals", e)
+        return jsonify(body), status
+
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_prompt_stream():
+    """
+    Stream big goals as the model writes them.
+    
+    Responds with NDJSON by default, or server-sent events when the client
+    sends "Accept: text/event-stream" or ?format=sse. Messages:
+        {"type": "goal", "goal": {...}}   one per goal, in order, as soon as it is complete
+        {"type": "done", "count": n, "plan_id": "...", "plan_version": 1}
+        {"type": "error", "error": "..."} if generation fails midway
+    """
+    data = request.json
+    prompt = data.get('prompt', '')
+    
+    # Validate input
+    if not prompt:
+        return jsonify({"error": "No prompt provided"}), 400
+    
+    def generate():
+        goals = []
+        try:
+            for goal in azure_service.stream_goals(prompt):
+                goals.append(goal)
+                yield {"type": "goal", "goal": goal}
+            yield {"type": "done", "count": len(goals), **_store_generated_plan(prompt, goals)}
+        except Exception as e:
+            body, _ = _azure_error_response("generate goals", e)
+            yield {"type": "error", "error": body["error"]}
+    
+    return _message_stream(generate())
 
 @app.route('/api/break-down-goal', methods=['POST'])
 def break_down_goal():
-    """Break down a big goal into smaller, more specific goals."""
+    """
+    Break down a big goal into smaller, more specific goals.
+    
+    With a plan_id, the goal's title and description may be omitted, the
+    result is saved in the plan, and a break-down already saved there is
+    returned without calling the model (unless "regenerate" is set).
+    """
     data = request.json
-    goal_id = data.get('goal_id')
-    goal_title = data.get('goal_title', '')
-    goal_description = data.get('goal_description', '')
+    try:
+        goal_id, goal_title, goal_description, stored = _resolve_break_down(data, _load_plan(data))
+    except (PlanNotFoundError, InvalidPlanError) as e:
+        body, status = _plan_error_response(e)
+        return jsonify(body), status
     
     # Validate input
     if not goal_id or not goal_title:
         return jsonify({"error": "Missing goal information"}), 400
     
+    if stored:
+        return jsonify({"smaller_goals": stored, "plan_id": data['plan_id']})
+    
     try:
         smaller_goals = azure_service.break_down_goal(goal_id, goal_title, goal_description)
-        return jsonify({"smaller_goals": smaller_goals})
+        return jsonify({"smaller_goals": smaller_goals, **_store_break_down(data.get('plan_id'), goal_id, smaller_goals)})
     except Exception as e:
-        print(f"Error breaking down goal: {str(e)}")
-        error_message = str(e)
-        if "Azure OpenAI credentials not properly configured" in error_message:
-            return jsonify({"error": "Azure API is not properly configured. Please set up your Azure OpenAI credentials."}), 500
-        return jsonify({"error": f"Failed to break down goal: {error_message}"}), 500
+        body, status = _azure_error_response("break down goal", e)
+        return jsonify(body), status
+
+@app.route('/api/break-down-goals', methods=['POST'])
+def break_down_goals():
+    """
+    Break down several big goals concurrently, streaming each result as it completes.
+    
+    Body: {"goals": [{"goal_id", "goal_title", "goal_description"}, ...],
+           "max_concurrency": optional cap, "timeout": optional seconds per model attempt}
+    (id/title/description are accepted as aliases, matching the goals from /api/analyze.)
+    With a "plan_id", "goals" defaults to all goals of the plan, results are
+    saved in the plan, and goals already broken down there are answered
+    from the plan (unless "regenerate" is set).
+    
+    Responds with NDJSON, or server-sent events as for /api/analyze/stream:
+        {"type": "goal", "goal_id": n, "smaller_goals": [...]}
+        {"type": "goal_error", "goal_id": n, "error": "..."}
+        {"type": "done", "completed": n, "failed": m}
+    """
+    data = request.json or {}
+    plan_id = data.get('plan_id')
+    try:
+        max_workers, timeout = _break_down_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    requested = data.get('goals')
+    if requested and (not isinstance(requested, list) or not all(isinstance(goal, dict) for goal in requested)):
+        return jsonify({"error": "goals must be a list of objects"}), 400
+    goals = []
+    stored = []
+    try:
+        plan = _load_plan(data)
+        requested = requested or (plan_goals(plan) if plan else None) or []
+        for goal in requested:
+            goal_id, goal_title, goal_description, smaller_goals = _resolve_break_down(
+                {**goal, 'regenerate': data.get('regenerate')}, plan
+            )
+            if not goal_id or not goal_title:
+                return jsonify({"error": "Missing goal information"}), 400
+            if smaller_goals:
+                stored.append((goal_id, smaller_goals))
+            else:
+                goals.append((goal_id, goal_title, goal_description))
+    except (PlanNotFoundError, InvalidPlanError) as e:
+        body, status = _plan_error_response(e)
+        return jsonify(body), status
+    
+    # Validate input
+    if not goals and not stored:
+        return jsonify({"error": "At least one goal is required"}), 400
+    
+    def generate():
+        completed = failed = 0
+        for goal_id, smaller_goals in stored:
+            completed += 1
+            yield {"type": "goal", "goal_id": goal_id, "smaller_goals": smaller_goals}
+        results = azure_service.break_down_goals(goals, max_workers=max_workers, timeout=timeout)
+        for goal_id, smaller_goals, error in results:
+            if error is None:
+                completed += 1
+                _store_break_down(plan_id, goal_id, smaller_goals)
+                yield {"type": "goal", "goal_id": goal_id, "smaller_goals": smaller_goals}
+            else:
+                failed += 1
+                body, _ = _azure_error_response("break down goal", Exception(error))
+                yield {"type": "goal_error", "goal_id": goal_id, "error": body["error"]}
+        yield {"type": "done", "completed": completed, "failed": failed}
+    
+    return _message_stream(generate())
 
 @app.route('/api/generate-repo-info', methods=['POST'])
 def generate_repo_info():
-    """Generate repository name and description based on the prompt and goals."""
+    """Generate repository name and description based on the prompt and goals (or those of plan_id)."""
     data = request.json
     prompt = data.get('prompt', '')
     goals = data.get('goals', '')
+    try:
+        plan = _load_plan(data)
+        if plan is not None:
+            prompt = prompt or plan.get('prompt', '')
+            goals = goals or plan_goal_titles(plan)
+    except (PlanNotFoundError, InvalidPlanError) as e:
+        body, status = _plan_error_response(e)
+        return jsonify(body), status
     
     print(f"Received request to generate repo info with prompt: {prompt[:100]}... and goals: {goals[:100]}...")
     
@@ -122,32 +566,10 @@ def generate_repo_info():
     
     try:
         repo_info = azure_service.generate_repo_info(prompt, goals)
-        print(f"Generated repo info: {repo_info}")
-        
-        # Ensure the response has the expected format
-        if not isinstance(repo_info, dict) or 'repo_name' not in repo_info or 'description' not in repo_info:
-            print(f"Warning: Repo info has incorrect format: {repo_info}")
-            # Fix the format if needed
-            if isinstance(repo_info, dict):
-                if 'name' in repo_info and 'repo_name' not in repo_info:
-                    repo_info['repo_name'] = repo_info['name']
-                if 'repo_description' in repo_info and 'description' not in repo_info:
-                    repo_info['description'] = repo_info['repo_description']
-            else:
-                # Provide fallback values
-                repo_info = {
-                    "repo_name": "github-project",
-                    "description": "A GitHub project."
-                }
-        
-        print(f"Returning repo info: {repo_info}")
-        return jsonify(repo_info)
+        return jsonify(_normalize_repo_info(repo_info))
     except Exception as e:
-        print(f"Error generating repository info: {str(e)}")
-        error_message = str(e)
-        if "Azure OpenAI credentials not properly configured" in error_message:
-            return jsonify({"error": "Azure API is not properly configured. Please set up your Azure OpenAI credentials."}), 500
-        return jsonify({"error": f"Failed to generate repository info: {error_message}"}), 500
+        body, status = _azure_error_response("generate repository info", e)
+        return jsonify(body), status
 
 @app.route('/api/create-repository', methods=['POST'])
 def create_repository():
@@ -164,6 +586,8 @@ def create_repository():
         repository = github_service.create_repository(repo_name, repo_description)
         return jsonify({"success": True, "repository": repository})
     except Exception as e:
+        if isinstance(e, GitHubRateLimitError):
+            return _rate_limit_response(e)
         print(f"Error creating repository: {str(e)}")
         error_message = str(e)
         if "GitHub token is not configured" in error_message:
@@ -174,10 +598,17 @@ def create_repository():
 
 @app.route('/api/create-issues', methods=['POST'])
 def create_issues():
-    """Create GitHub issues for goals."""
+    """Create GitHub issues for goals (or for the goals and break-downs of plan_id)."""
     data = request.json
     repo_name = data.get('repo_name', '')
     goals = data.get('goals', [])
+    try:
+        plan = _load_plan(data)
+        if plan is not None and not goals:
+            goals = plan_issue_goals(plan)
+    except (PlanNotFoundError, InvalidPlanError) as e:
+        body, status = _plan_error_response(e)
+        return jsonify(body), status
     
     # Validate input
     if not repo_name:
@@ -186,114 +617,158 @@ def create_issues():
     if not goals:
         return jsonify({"error": "At least one goal is required"}), 400
     
+    parallel, max_workers = _create_issues_options(data)
+    
     try:
-        issues = github_service.create_issues(repo_name, goals)
-        return jsonify({"success": True, "issues": issues})
+        if not parallel:
+            issues = github_service.create_issues(repo_name, goals)
+            task_snapshots.invalidate(repo_name)
+            return jsonify({"success": True, "issues": issues})
+        
+        result = github_service.create_issues_parallel(repo_name, goals, max_workers=max_workers)
+        task_snapshots.invalidate(repo_name)
+        return jsonify(_create_issues_result(result))
     except Exception as e:
-        print(f"Error creating issues: {str(e)}")
-        error_message = str(e)
-        if "GitHub token is not configured" in error_message:
-            return jsonify({"error": "GitHub API is not properly configured. Please set up your GitHub token."}), 500
-        elif "Not Found" in error_message:
-            return jsonify({"error": f"Repository '{repo_name}' not found. Please check the repository name."}), 404
-        return jsonify({"error": f"Failed to create issues: {error_message}"}), 500
+        body, status, headers = _create_issues_error(repo_name, e)
+        return jsonify(body), status, headers
+
+@app.route('/api/plans/<plan_id>', methods=['GET'])
+def get_plan(plan_id):
+    """Return the latest version of a stored plan, or ?version=n."""
+    version = request.args.get('version', type=int)
+    try:
+        return jsonify(plan_store.get(plan_id, version))
+    except PlanNotFoundError as e:
+        body, status = _plan_error_response(e)
+        return jsonify(body), status
+
+@app.route('/api/plans/<plan_id>', methods=['PUT'])
+def save_plan(plan_id):
+    """
+    Save edited goals as a new version of a plan.
+    
+    Body: {"goals": [...], "prompt": optional, "expected_version": optional}.
+    With expected_version, the save fails with 409 if the plan has moved on.
+    """
+    data = request.json or {}
+    goals = data.get('goals')
+    if not isinstance(goals, list) or not all(isinstance(goal, dict) for goal in goals):
+        return jsonify({"error": "goals must be a list of objects"}), 400
+    expected_version = data.get('expected_version')
+    if expected_version is not None:
+        try:
+            expected_version = int(expected_version)
+        except (TypeError, ValueError):
+            return jsonify({"error": "expected_version must be an integer"}), 400
+    
+    def modify(plan):
+        plan['goals'] = goals
+        if 'prompt' in data:
+            plan['prompt'] = data['prompt']
+        return plan
+    
+    try:
+        version, _ = plan_store.update(plan_id, modify, 'edit', expected_version)
+        return jsonify({"plan_id": plan_id, "plan_version": version})
+    except (PlanNotFoundError, PlanConflictError) as e:
+        body, status = _plan_error_response(e)
+        return jsonify(body), status
 
 @app.route('/api/transcribe', methods=['POST'])
 def transcribe_audio():
     try:
         # Debug: Print configuration
-        print(f"Using audio endpoint: {audio_endpoint}")
-        print(f"Using audio deployment: gpt-4o-mini-audio-preview")
+        print(f"Using audio pool: {', '.join(d.name for d in llm_gateway.deployments if d.pool == 'audio')}")
         
         if 'audio' not in request.files:
             return jsonify({'error': 'No audio file provided'}), 400
 
-        audio_file = request.files['audio']
+        audio_data = audio_pool.normalize_upload_to_base64(request.files['audio'])
         
-        # Save the file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
-            audio_file.save(temp_audio.name)
-            
-            try:
-                # Convert to proper WAV format using pydub
-                audio = AudioSegment.from_file(temp_audio.name)
-                
-                # Export as proper WAV file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as proper_wav:
-                    # Export with standard WAV parameters
-                    audio.export(proper_wav.name, format='wav', 
-                               parameters=[
-                                   "-acodec", "pcm_s16le",  # 16-bit PCM
-                                   "-ac", "1",              # mono
-                                   "-ar", "16000"           # 16kHz sample rate
-                               ])
-                    
-                    # Read the properly formatted WAV file
-                    with open(proper_wav.name, 'rb') as audio_file:
-                        audio_data = base64.b64encode(audio_file.read()).decode('utf-8')
-                    
-                    # Clean up the proper WAV file
-                    os.unlink(proper_wav.name)
-                
-                # Create the messages for the API call with the exact required structure
-                messages = [
-                    {
-                        "role": "system",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": AUDIO_TRANSCRIPTION_PROMPT
-                            }
-                        ]
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "\n"
-                            },
-                            {
-                                "type": "input_audio",
-                                "input_audio": {
-                                    "data": audio_data,
-                                    "format": "wav"
-                                }
-                            }
-                        ]
-                    },
-                    {
-                        "role": "assistant",
-                        "content": []
-                    }
-                ]
-                
-                # Call the Azure OpenAI API with audio deployment
-                response = audio_client.chat.completions.create(
-                    model="gpt-4o-mini-audio-preview",
-                    messages=messages,
-                    temperature=0.7,
-                    top_p=0.95,
-                    max_tokens=5000
-                )
-                
-                # Clean up the original temporary file
-                os.unlink(temp_audio.name)
-                
-                # Extract the transcribed text
-                transcribed_text = response.choices[0].message.content
-                return jsonify({'text': transcribed_text})
-                
-            except Exception as e:
-                # Clean up the temporary files in case of error
-                if os.path.exists(temp_audio.name):
-                    os.unlink(temp_audio.name)
-                raise e
-                
+        # Call the Azure OpenAI API with audio deployment
+        response = _audio_completion(
+            _build_transcription_messages(audio_data),
+            summary_budget(_audio_seconds(audio_data), cap=TRANSCRIBE_MAX_TOKENS),
+            'transcribe'
+        )
+        
+        # Extract the transcribed text
+        transcribed_text = response.choices[0].message.content
+        return jsonify({'text': transcribed_text})
+    except AudioPoolBusy as e:
+        body, status, headers = _audio_busy_error(e)
+        return jsonify(body), status, headers
+    except AudioNormalizationError as e:
+        print(f"Unreadable audio in transcribe_audio: {str(e)}")
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in transcribe_audio: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/transcribe/stream', methods=['POST'])
+def transcribe_audio_stream():
+    """
+    Transcribe a long recording window by window, streaming results as server-sent events.
+    
+    Accepts the same multipart "audio" field as /api/transcribe, or the raw
+    recording as the request body (chunked transfer encoding is fine). The
+    recording is split at pauses into windows of about AUDIO_CHUNK_SECONDS,
+    which are summarized concurrently. Events:
+        start:        {"chunks": n, "duration": seconds}
+        partial:      {"index", "start", "end", "text"} as each window finishes
+        chunk_error:  {"index", "start", "end", "error"} for a failed window
+        done:         {"text": the window summaries stitched in order, "failed": [indexes]}
+    """
+    try:
+        if 'audio' in request.files:
+            raw_audio = read_upload(request.files['audio'])
+        else:
+            raw_audio = read_upload(request.stream)
+        if not raw_audio:
+            return jsonify({'error': 'No audio file provided'}), 400
+        windows = split_at_silence(audio_pool.normalize(raw_audio))
+    except AudioPoolBusy as e:
+        body, status, headers = _audio_busy_error(e)
+        return jsonify(body), status, headers
+    except AudioNormalizationError as e:
+        print(f"Unreadable audio in transcribe_audio_stream: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in transcribe_audio_stream: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        yield _sse_event('start', {'chunks': len(windows), 'duration': windows[-1][1]})
+        texts = [None] * len(windows)
+        executor = ThreadPoolExecutor(max_workers=min(TRANSCRIBE_WORKERS, len(windows)))
+        try:
+            futures = {
+                executor.submit(_transcribe_window, index, len(windows), start, end, wav_bytes): index
+                for index, (start, end, wav_bytes) in enumerate(windows)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                start, end, _ = windows[index]
+                try:
+                    texts[index] = future.result()
+                    yield _sse_event('partial', {'index': index, 'start': start, 'end': end, 'text': texts[index]})
+                except Exception as e:
+                    print(f"Error transcribing window {index} ({start:.0f}s-{end:.0f}s): {str(e)}")
+                    yield _sse_event('chunk_error', {'index': index, 'start': start, 'end': end, 'error': str(e)})
+            yield _sse_event('done', {
+                'text': "\n\n".join(text for text in texts if text),
+                'failed': [index for index, text in enumerate(texts) if text is None]
+            })
+        finally:
+            # Stop pending windows if the client disconnects
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/voice-chat', methods=['POST'])
 def voice_chat():
     try:
@@ -305,7 +780,7 @@ def voice_chat():
         conversation = json.loads(request.form.get('conversation', '[]'))
         
         # Process audio file to get transcription
-        transcription = azure_service.transcribe_audio(audio_file)
+        transcription, segments = azure_service.transcribe_audio_with_segments(audio_file)
         
         # Get AI response based on transcription and conversation history
         response = azure_service.process_voice_chat(
@@ -316,11 +791,15 @@ def voice_chat():
         
         return jsonify({
             'transcription': transcription,
+            'segments': segments,
             'response': response.get('message', ''),
             'updatedTask': response.get('updatedTask'),
             'updatedSubTasks': response.get('updatedSubTasks')
         })
         
+    except AudioPoolBusy as e:
+        body, status, headers = _audio_busy_error(e)
+        return jsonify(body), status, headers
     except Exception as e:
         print(f"Error in voice chat: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -330,8 +809,7 @@ def modify_tasks_voice():
     """Modify tasks using voice input"""
     try:
         # Debug: Print configuration
-        print(f"Using audio endpoint: {audio_endpoint}")
-        print(f"Using audio deployment: gpt-4o-mini-audio-preview")
+        print(f"Using audio pool: {', '.join(d.name for d in llm_gateway.deployments if d.pool == 'audio')}")
         
         if 'audio' not in request.files:
             return jsonify({'error': 'No audio file provided'}), 400
@@ -341,184 +819,116 @@ def modify_tasks_voice():
         
         print(f"Received current tasks: {current_tasks[:200]}...")
         
-        # Validate the current tasks JSON
+        # Parse the current tasks once; they are also the fallback result
         try:
-            json.loads(current_tasks)
+            original_tasks = json.loads(current_tasks)
         except json.JSONDecodeError as e:
             print(f"Invalid JSON in current_tasks: {str(e)}")
             return jsonify({'error': f'Invalid tasks JSON: {str(e)}'}), 400
         
-        # Save the file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
-            audio_file.save(temp_audio.name)
-            
-            try:
-                # Convert to proper WAV format using pydub
-                audio = AudioSegment.from_file(temp_audio.name)
-                
-                # Export as proper WAV file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as proper_wav:
-                    # Export with standard WAV parameters
-                    audio.export(proper_wav.name, format='wav', 
-                               parameters=[
-                                   "-acodec", "pcm_s16le",  # 16-bit PCM
-                                   "-ac", "1",              # mono
-                                   "-ar", "16000"           # 16kHz sample rate
-                               ])
-                    
-                    # Read the properly formatted WAV file
-                    with open(proper_wav.name, 'rb') as audio_file:
-                        audio_data = base64.b64encode(audio_file.read()).decode('utf-8')
-                    
-                    # Clean up the proper WAV file
-                    os.unlink(proper_wav.name)
-                
-                # Create a better prompt that explicitly tells the model to return a JSON array
-                prompt_with_json = f"""
-                {MODIFY_TASKS_VOICE_PROMPT}
-                
-                Here are the current tasks in JSON format:
-                {current_tasks}
-                
-                Listen to the audio and modify the tasks according to the user's instructions.
-                Return ONLY a valid JSON array of tasks with the same structure as the input.
-                Each task should have: id, title, description, and sub_tasks array.
-                Each sub_task should have: id, title, description, and estimatedHours (if available).
-                """
-                
-                messages = [
+        # Decode and resample the upload in memory
+        audio_data = audio_pool.normalize_upload_to_base64(audio_file)
+        mode = _voice_edit_mode()
+        
+        # Static instructions first, then the tasks; the recording follows in the user message
+        if mode == 'patch':
+            prompt_with_json = MODIFY_TASKS_VOICE_PATCH_PROMPT + "\n" + current_tasks
+        else:
+            prompt_with_json = MODIFY_TASKS_VOICE_PROMPT + "\n" + current_tasks
+        
+        messages = [
+            {
+                "role": "system",
+                "content": [
                     {
-                        "role": "system",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt_with_json
-                            }
-                        ]
-                    },
+                        "type": "text",
+                        "text": prompt_with_json
+                    }
+                ]
+            },
+            {
+                "role": "user",
+                "content": [
                     {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "I want to modify these tasks. Here's my voice instruction:"
-                            },
-                            {
-                                "type": "input_audio",
-                                "input_audio": {
-                                    "data": audio_data,
-                                    "format": "wav"
-                                }
-                            }
-                        ]
+                        "type": "text",
+                        "text": "I want to modify these tasks. Here's my voice instruction:"
                     },
                     {
-                        "role": "assistant",
-                        "content": []
+                        "type": "input_audio",
+                        "input_audio": {
+                            "data": audio_data,
+                            "format": "wav"
+                        }
                     }
                 ]
-                
-                print("Sending request to OpenAI API...")
-                # Call the Azure OpenAI API with audio deployment
-                response = audio_client.chat.completions.create(
-                    model="gpt-4o-mini-audio-preview",
-                    messages=messages,
-                    temperature=0.7,
-                    top_p=0.95,
-                    max_tokens=5000
-                )
-                
-                # Clean up the original temporary file
-                os.unlink(temp_audio.name)
-                
-                # Extract the response from the API
-                ai_response = response.choices[0].message.content
-                
-                # Process the API response to extract the updated tasks JSON
-                try:
-                    print(f"Raw AI response: {ai_response[:500]}...")
-                    
-                    # First, check if the response is already valid JSON
-                    try:
-                        updated_tasks = json.loads(ai_response)
-                        print("Successfully parsed entire response as JSON")
-                    except json.JSONDecodeError:
-                        print("Response is not valid JSON, trying to extract JSON from text...")
-                        # If not, try to extract JSON from the text response
-                        import re
-
-                        # Try to extract JSON from a code block
-                        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', ai_response)
-                        if json_match:
-                            json_str = json_match.group(1).strip()
-                            print(f"Found JSON in code block: {json_str[:200]}...")
-                            try:
-                                updated_tasks = json.loads(json_str)
-                                print("Successfully parsed JSON from code block")
-                            except json.JSONDecodeError:
-                                # If code block extraction fails, try other methods
-                                print(f"Failed to parse JSON from code block")
-                                updated_tasks = json.loads(current_tasks)
-                        else:
-                            # Try to extract JSON from the text by looking for array/object patterns
-                            print("No code block found, looking for JSON patterns")
-                            json_pattern = re.search(r'(\[.*\]|\{.*\})', ai_response, re.DOTALL)
-                            if json_pattern:
-                                try:
-                                    json_str = json_pattern.group(1).strip()
-                                    print(f"Found JSON pattern: {json_str[:200]}...")
-                                    updated_tasks = json.loads(json_str)
-                                    print("Successfully parsed JSON from pattern")
-                                except json.JSONDecodeError:
-                                    print(f"Failed to parse JSON from pattern")
-                                    updated_tasks = json.loads(current_tasks)
-                            else:
-                                # If we can't extract JSON, return the original tasks
-                                print("No JSON pattern found in response")
-                                updated_tasks = json.loads(current_tasks)
-                    
-                    # Ensure updated_tasks is an array
-                    if not isinstance(updated_tasks, list):
-                        if isinstance(updated_tasks, dict) and 'tasks' in updated_tasks:
-                            updated_tasks = updated_tasks['tasks']
-                        else:
-                            print("Updated tasks is not an array or object with tasks property")
-                            updated_tasks = json.loads(current_tasks)
-                    
-                    # Get the first line as transcription (or fallback to the whole response)
-                    transcription = ai_response.split('\n')[0] if '\n' in ai_response else ai_response
-                    if transcription.startswith('```') and '\n' in ai_response:
-                        # Skip the code block marker and get the next line
-                        lines = ai_response.split('\n')
-                        for line in lines:
-                            if line and not line.startswith('```'):
-                                transcription = line
-                                break
-                    
-                    # Log success and return the response
-                    print(f"Successfully processed voice modification: {transcription[:100]}")
-                    print(f"Returning updated tasks: {json.dumps(updated_tasks)[:200]}...")
-                    return jsonify({
-                        'transcription': transcription,
-                        'updatedTasks': updated_tasks
-                    })
-                    
-                except Exception as json_error:
-                    print(f"Error parsing response JSON: {str(json_error)}")
-                    print(f"Raw response: {ai_response}")
-                    # Return the original tasks on error
-                    return jsonify({
-                        'transcription': ai_response,
-                        'updatedTasks': json.loads(current_tasks)
-                    })
-                
-            except Exception as e:
-                # Clean up the temporary files in case of error
-                if os.path.exists(temp_audio.name):
-                    os.unlink(temp_audio.name)
-                print(f"Error processing audio: {str(e)}")
-                raise e
-                
+            },
+            {
+                "role": "assistant",
+                "content": []
+            }
+        ]
+        
+        print("Sending request to OpenAI API...")
+        # Call the Azure OpenAI API with audio deployment
+        if mode == 'patch':
+            response = _audio_completion(messages, patch_budget(), 'modify_tasks_voice_patch')
+            result = _apply_voice_patch(response.choices[0].message.content, original_tasks)
+            body = {
+                'transcription': result['transcription'],
+                'patch': result['patch'],
+                'updatedTasks': result['updated']
+            }
+            if 'error' in result:
+                body['patchError'] = result['error']
+            return jsonify(body)
+        
+        response = _audio_completion(messages, rewrite_budget(current_tasks), 'modify_tasks_voice')
+        
+        # Extract the response from the API
+        ai_response = response.choices[0].message.content
+        
+        # Process the API response to extract the updated tasks JSON
+        try:
+            print(f"Raw AI response: {ai_response[:500]}...")
+            
+            # Pure JSON, JSON in a code fence or JSON inside prose, in one pass
+            updated_tasks = decode_task_list(ai_response)
+            if updated_tasks is None:
+                print("No task array found in response; keeping the current tasks")
+                updated_tasks = original_tasks
+            
+            # Get the first line as transcription (or fallback to the whole response)
+            transcription = ai_response.split('\n')[0] if '\n' in ai_response else ai_response
+            if transcription.startswith('```') and '\n' in ai_response:
+                # Skip the code block marker and get the next line
+                lines = ai_response.split('\n')
+                for line in lines:
+                    if line and not line.startswith('```'):
+                        transcription = line
+                        break
+            
+            # Log success and return the response
+            print(f"Successfully processed voice modification: {transcription[:100]}")
+            print(f"Returning {len(updated_tasks)} updated tasks")
+            return jsonify({
+                'transcription': transcription,
+                'updatedTasks': updated_tasks
+            })
+            
+        except Exception as json_error:
+            print(f"Error parsing response JSON: {str(json_error)}")
+            print(f"Raw response: {ai_response}")
+            # Return the original tasks on error
+            return jsonify({
+                'transcription': ai_response,
+                'updatedTasks': original_tasks
+            })
+    except AudioPoolBusy as e:
+        body, status, headers = _audio_busy_error(e)
+        return jsonify(body), status, headers
+    except AudioNormalizationError as e:
+        print(f"Unreadable audio in modify-tasks-voice: {str(e)}")
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in modify-tasks-voice: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -528,8 +938,7 @@ def modify_gantt_voice():
     """Modify Gantt chart data using voice input"""
     try:
         # Debug: Print configuration
-        print(f"Using audio endpoint: {audio_endpoint}")
-        print(f"Using audio deployment: gpt-4o-mini-audio-preview")
+        print(f"Using audio pool: {', '.join(d.name for d in llm_gateway.deployments if d.pool == 'audio')}")
         
         if 'audio' not in request.files:
             return jsonify({'error': 'No audio file provided'}), 400
@@ -537,152 +946,112 @@ def modify_gantt_voice():
         audio_file = request.files['audio']
         current_gantt_data = request.form.get('currentGanttData', '{}')
         
-        # Save the file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
-            audio_file.save(temp_audio.name)
-            
-            try:
-                # Convert to proper WAV format using pydub
-                audio = AudioSegment.from_file(temp_audio.name)
-                
-                # Export as proper WAV file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as proper_wav:
-                    # Export with standard WAV parameters
-                    audio.export(proper_wav.name, format='wav', 
-                               parameters=[
-                                   "-acodec", "pcm_s16le",  # 16-bit PCM
-                                   "-ac", "1",              # mono
-                                   "-ar", "16000"           # 16kHz sample rate
-                               ])
-                    
-                    # Read the properly formatted WAV file
-                    with open(proper_wav.name, 'rb') as audio_file:
-                        audio_data = base64.b64encode(audio_file.read()).decode('utf-8')
-                    
-                    # Clean up the proper WAV file
-                    os.unlink(proper_wav.name)
-                
-                # Create the messages for the API call with the exact required structure
-                # Include the current Gantt chart JSON in the prompt
-                prompt_with_json = MODIFY_GANTT_VOICE_PROMPT + "\n" + current_gantt_data
-                
-                messages = [
+        # Parse the current chart once; it is also the fallback result
+        try:
+            original_gantt_data = json.loads(current_gantt_data) if current_gantt_data else {}
+        except json.JSONDecodeError as e:
+            print(f"Invalid JSON in current_gantt_data: {str(e)}")
+            return jsonify({'error': f'Invalid Gantt chart JSON: {str(e)}'}), 400
+        
+        # Decode and resample the upload in memory
+        audio_data = audio_pool.normalize_upload_to_base64(audio_file)
+        
+        mode = _voice_edit_mode()
+        
+        # Create the messages for the API call with the exact required structure
+        # Include the current Gantt chart JSON in the prompt
+        if mode == 'patch':
+            prompt_with_json = MODIFY_GANTT_VOICE_PATCH_PROMPT + "\n" + current_gantt_data
+        else:
+            prompt_with_json = MODIFY_GANTT_VOICE_PROMPT + "\n" + current_gantt_data
+        
+        messages = [
+            {
+                "role": "system",
+                "content": [
                     {
-                        "role": "system",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt_with_json
-                            }
-                        ]
-                    },
+                        "type": "text",
+                        "text": prompt_with_json
+                    }
+                ]
+            },
+            {
+                "role": "user",
+                "content": [
                     {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "\n"
-                            },
-                            {
-                                "type": "input_audio",
-                                "input_audio": {
-                                    "data": audio_data,
-                                    "format": "wav"
-                                }
-                            }
-                        ]
+                        "type": "text",
+                        "text": "\n"
                     },
                     {
-                        "role": "assistant",
-                        "content": []
+                        "type": "input_audio",
+                        "input_audio": {
+                            "data": audio_data,
+                            "format": "wav"
+                        }
                     }
                 ]
-                
-                # Call the Azure OpenAI API with audio deployment
-                response = audio_client.chat.completions.create(
-                    model="gpt-4o-mini-audio-preview",
-                    messages=messages,
-                    temperature=0.7,
-                    top_p=0.95,
-                    max_tokens=5000
-                )
-                
-                # Clean up the original temporary file
-                os.unlink(temp_audio.name)
-                
-                # Extract the response from the API
-                ai_response = response.choices[0].message.content
-                
-                # Process the API response to extract the updated Gantt chart JSON
-                try:
-                    print(f"Raw AI response: {ai_response[:500]}...")
-                    
-                    # First, check if the response is already valid JSON
-                    try:
-                        updated_gantt_data = json.loads(ai_response)
-                        print("Successfully parsed entire response as JSON")
-                    except json.JSONDecodeError:
-                        print("Response is not valid JSON, trying to extract JSON from text...")
-                        # If not, try to extract JSON from the text response
-                        import re
-
-                        # Try to extract JSON from a code block
-                        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', ai_response)
-                        if json_match:
-                            json_str = json_match.group(1).strip()
-                            print(f"Found JSON in code block: {json_str[:200]}...")
-                            try:
-                                updated_gantt_data = json.loads(json_str)
-                                print("Successfully parsed JSON from code block")
-                            except json.JSONDecodeError:
-                                # If code block extraction fails, try other methods
-                                print(f"Failed to parse JSON from code block")
-                        else:
-                            # Try to extract JSON from the text by looking for array/object patterns
-                            print("No code block found, looking for JSON patterns")
-                            json_pattern = re.search(r'(\[.*\]|\{.*\})', ai_response, re.DOTALL)
-                            if json_pattern:
-                                try:
-                                    json_str = json_pattern.group(1).strip()
-                                    print(f"Found JSON pattern: {json_str[:200]}...")
-                                    updated_gantt_data = json.loads(json_str)
-                                    print("Successfully parsed JSON from pattern")
-                                except json.JSONDecodeError:
-                                    print(f"Failed to parse JSON from pattern")
-                                    updated_gantt_data = json.loads(current_gantt_data) if current_gantt_data else {}
-                            else:
-                                # If we can't extract JSON, return the original data
-                                print("No JSON pattern found in response")
-                                updated_gantt_data = json.loads(current_gantt_data) if current_gantt_data else {}
-                    
-                    # Get the first line as transcription (or fallback to the whole response)
-                    transcription = ai_response.split('\n')[0] if '\n' in ai_response else ai_response
-                    
-                    # Convert updated Gantt data to JSON string
-                    updated_gantt_json = json.dumps(updated_gantt_data)
-                    
-                    # Log success and return the response
-                    print(f"Successfully processed Gantt chart voice modification: {transcription[:100]}")
-                    return jsonify({
-                        'transcription': transcription,
-                        'updatedGanttData': updated_gantt_json
-                    })
-                    
-                except Exception as json_error:
-                    print(f"Error parsing response JSON: {str(json_error)}")
-                    print(f"Raw response: {ai_response}")
-                    # Return the original Gantt data on error
-                    return jsonify({
-                        'transcription': ai_response,
-                        'updatedGanttData': current_gantt_data
-                    })
-                
-            except Exception as e:
-                # Clean up the temporary files in case of error
-                if os.path.exists(temp_audio.name):
-                    os.unlink(temp_audio.name)
-                raise e
-                
+            },
+            {
+                "role": "assistant",
+                "content": []
+            }
+        ]
+        
+        # Call the Azure OpenAI API with audio deployment
+        if mode == 'patch':
+            response = _audio_completion(messages, patch_budget(), 'modify_gantt_voice_patch')
+            result = _apply_voice_patch(response.choices[0].message.content, original_gantt_data)
+            body = {
+                'transcription': result['transcription'],
+                'patch': result['patch'],
+                'updatedGanttData': json.dumps(result['updated'])
+            }
+            if 'error' in result:
+                body['patchError'] = result['error']
+            return jsonify(body)
+        
+        response = _audio_completion(messages, rewrite_budget(current_gantt_data), 'modify_gantt_voice')
+        
+        # Extract the response from the API
+        ai_response = response.choices[0].message.content
+        
+        # Process the API response to extract the updated Gantt chart JSON
+        try:
+            print(f"Raw AI response: {ai_response[:500]}...")
+            
+            # Pure JSON, JSON in a code fence or JSON inside prose, in one pass
+            updated_gantt_data = extract_json(ai_response)
+            if updated_gantt_data is None:
+                print("No JSON found in response; keeping the current Gantt data")
+                updated_gantt_data = original_gantt_data
+            
+            # Get the first line as transcription (or fallback to the whole response)
+            transcription = ai_response.split('\n')[0] if '\n' in ai_response else ai_response
+            
+            # Convert updated Gantt data to JSON string
+            updated_gantt_json = json.dumps(updated_gantt_data)
+            
+            # Log success and return the response
+            print(f"Successfully processed Gantt chart voice modification: {transcription[:100]}")
+            return jsonify({
+                'transcription': transcription,
+                'updatedGanttData': updated_gantt_json
+            })
+            
+        except Exception as json_error:
+            print(f"Error parsing response JSON: {str(json_error)}")
+            print(f"Raw response: {ai_response}")
+            # Return the original Gantt data on error
+            return jsonify({
+                'transcription': ai_response,
+                'updatedGanttData': current_gantt_data
+            })
+    except AudioPoolBusy as e:
+        body, status, headers = _audio_busy_error(e)
+        return jsonify(body), status, headers
+    except AudioNormalizationError as e:
+        print(f"Unreadable audio in modify-gantt-voice: {str(e)}")
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in modify-gantt-voice: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -691,152 +1060,90 @@ def modify_gantt_voice():
 def get_repositories():
     """Get list of user's GitHub repositories."""
     try:
-        repos = github_service.get_user_repositories()
-        return jsonify({"success": True, "repositories": repos})
+        repos = github_service.iter_user_repositories()
+        # Pull the first item eagerly so auth and API errors still map to a 500
+        first = next(repos, None)
     except Exception as e:
+        if isinstance(e, GitHubRateLimitError):
+            return _rate_limit_response(e)
         print(f"Error fetching repositories: {str(e)}")
         return jsonify({"error": str(e)}), 500
+    
+    def generate():
+        # Stream the array page by page; "success" comes last so a failure on a
+        # later page can still be reported in the same document
+        yield '{"repositories": ['
+        try:
+            if first is not None:
+                yield json.dumps(first)
+                for repo in repos:
+                    yield ',' + json.dumps(repo)
+            yield '], "success": true}'
+        except Exception as e:
+            print(f"Error fetching repositories: {str(e)}")
+            yield '], "success": false, "error": ' + json.dumps(str(e)) + '}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 @app.route('/api/repository/<repo_name>/tasks', methods=['GET'])
 def get_repository_tasks(repo_name):
     """Get tasks for a repository by analyzing its issues and sub-issues."""
     try:
-        print(f"Fetching tasks for repository: {repo_name}")
-        
-        # Get all issues for the repository
-        issues = github_service.get_repository_issues(repo_name)
-        print(f"Retrieved {len(issues)} issues from repository {repo_name}")
+        # Serve the in-memory snapshot when it is fresh; ?refresh=1 forces a rebuild from GitHub
+        if not request.args.get('refresh'):
+            payload = task_snapshots.get_payload(repo_name)
+            if payload is not None:
+                return Response(payload, mimetype='application/json')
         
-        # Process issues into tasks
-        tasks = []
-        parent_tasks = []
-        child_tasks = []
-        
-        # First pass: identify all issues and create task objects
-        for issue in issues:
-            print(f"Processing issue #{issue['id']}: {issue['title']}")
-            print(f"  Labels: {issue['labels']}")
-            
-            # Determine if this is a parent task based on multiple criteria
-            is_parent = False
-            
-            # Check for broad-goal label
-            if issue['is_broad_goal']:
-                is_parent = True
-                print(f"  Identified as parent task via 'broad-goal' label")
-            
-            # Check for specific-goal label (this would make it a child task)
-            is_child = issue['is_specific_goal']
-            if is_child:
-                print(f"  Identified as child task via 'specific-goal' label")
-            
-            # If neither label is present, use heuristics to determine task type
-            if not is_parent and not is_child:
-                # Default: If we can't determine from labels, treat as a parent task
-                is_parent = True
-                print(f"  Defaulting to parent task (no specific labels)")
-            
-            task = {
-                'number': issue['id'],
-                'title': issue['title'],
-                'body': issue['description'],
-                'is_parent': is_parent,
-                'parent_id': None
-            }
-            
-            tasks.append(task)
-            
-            # Categorize for easier processing
-            if is_parent:
-                parent_tasks.append(task)
-            else:
-                child_tasks.append(task)
+        print(f"Fetching tasks for repository: {repo_name}")
         
-        # Second pass: try to get sub-issues for each parent task using GitHub's sub-issues API
-        for parent_task in parent_tasks:
-            parent_id = parent_task['number']
+        # Fetch issues and sub-issue links in one paginated GraphQL query when possible,
+        # otherwise fall back to REST with one sub-issues call per parent task
+        sub_issue_map = None
+        if os.getenv('GITHUB_USE_GRAPHQL', 'true').lower() == 'true':
             try:
-                # Try to get sub-issues using the GitHub API
-                sub_issues = github_service.list_sub_issues(repo_name, parent_id)
-                print(f"Retrieved {len(sub_issues)} sub-issues for parent #{parent_id}")
-                
-                # Update child tasks with parent information
-                for sub_issue in sub_issues:
-                    sub_issue_id = sub_issue.get('number')
-                    if sub_issue_id:
-                        # Find the corresponding task in our tasks list
-                        child_task = next((t for t in tasks if t['number'] == sub_issue_id), None)
-                        
-                        if child_task:
-                            # Update the parent_id
-                            child_task['parent_id'] = parent_id
-                            child_task['is_parent'] = False  # Ensure it's marked as a child
-                            print(f"  Set parent #{parent_id} for sub-issue #{sub_issue_id} via GitHub sub-issues API")
-                        else:
-                            # This sub-issue wasn't in our original list, might be a new issue
-                            print(f"  Sub-issue #{sub_issue_id} not found in tasks list, might be new")
-            except Exception as sub_err:
-                # If the sub-issues API fails (e.g., not enabled for this repo), fall back to description parsing
-                print(f"  Failed to get sub-issues via API for parent #{parent_id}: {str(sub_err)}")
-                print(f"  Falling back to description parsing for parent-child relationships")
-                
-                # Fall back to the old method: look for references in description
-                for child in child_tasks:
-                    if child['parent_id'] is None:  # Only process children without assigned parents
-                        child_id = child['number']
-                        child_issue = next((i for i in issues if i['id'] == child_id), None)
-                        
-                        if child_issue and child_issue['description']:
-                            # Look for explicit parent references in the description using #123 format
-                            if f"#{parent_id}" in child_issue['description']:
-                                child['parent_id'] = parent_id
-                                print(f"  Assigned parent #{parent_id} to child #{child_id} via description reference")
-        
-        # Third pass: for any remaining child tasks without parents, try to find references in their descriptions
-        for task in child_tasks:
-            if task['parent_id'] is None:  # Only process children without assigned parents
-                issue_id = task['number']
-                issue = next((i for i in issues if i['id'] == issue_id), None)
-                
-                if issue and issue['description']:
-                    # Look for explicit parent references in the description using #123 format
-                    parent_refs = set()
-                    for match in re.finditer(r'#(\d+)', issue['description']):
-                        parent_id = int(match.group(1))
-                        # Make sure the referenced issue exists and is a parent task
-                        if any(p['number'] == parent_id for p in parent_tasks):
-                            parent_refs.add(parent_id)
-                            print(f"  Issue #{issue_id} references parent #{parent_id}")
-                    
-                    # If we found exactly one parent reference, use it
-                    if len(parent_refs) == 1:
-                        task['parent_id'] = next(iter(parent_refs))
-                        print(f"  Assigned parent #{task['parent_id']} to child #{issue_id}")
-                    # If we found multiple, use the first one that's a parent task
-                    elif len(parent_refs) > 1:
-                        for parent_id in parent_refs:
-                            if any(p['number'] == parent_id for p in parent_tasks):
-                                task['parent_id'] = parent_id
-                                print(f"  Selected parent #{parent_id} from multiple references for child #{issue_id}")
-                                break
-        
-        print(f"Processed {len(parent_tasks)} parent tasks and {len(child_tasks)} child tasks")
-        
-        # Ensure we have at least one parent task
-        if not parent_tasks and tasks:
-            # If we have tasks but no parents, treat the first task as a parent
-            print("No parent tasks found, converting first task to parent")
-            tasks[0]['is_parent'] = True
-            parent_tasks.append(tasks[0])
+                issues, sub_issue_map = github_service.get_repository_task_graph(repo_name)
+            except Exception as graphql_err:
+                print(f"GraphQL task fetch failed, falling back to REST: {str(graphql_err)}")
         
-        return jsonify({
-            "success": True,
-            "tasks": tasks
-        })
+        if sub_issue_map is not None:
+            get_sub_issues = lambda parent_id: sub_issue_map.get(parent_id, [])
+        else:
+            # Stream the REST pages; the next page downloads while this one is processed
+            issues = github_service.iter_repository_issues(repo_name)
+            get_sub_issues = lambda parent_id: github_service.list_sub_issues(repo_name, parent_id)
+        
+        payload = task_snapshots.build(repo_name, issues, get_sub_issues, owner=github_service.get_username())
+        return Response(payload, mimetype='application/json')
     except Exception as e:
+        if isinstance(e, GitHubRateLimitError):
+            return _rate_limit_response(e)
         print(f"Error fetching repository tasks: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/github/webhook', methods=['POST'])
+def github_webhook():
+    """Receive GitHub webhook deliveries and update the task tree snapshots."""
+    if not WEBHOOK_SECRET:
+        return jsonify({"error": "Webhook secret is not configured. Please set GITHUB_WEBHOOK_SECRET."}), 500
+    
+    body = request.get_data()
+    if not verify_webhook_signature(body, request.headers.get('X-Hub-Signature-256')):
+        return jsonify({"error": "Invalid webhook signature"}), 401
+    
+    event = request.headers.get('X-GitHub-Event', '')
+    if event == 'ping':
+        return jsonify({"success": True, "message": "pong"})
+    
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError as e:
+        return jsonify({"error": f"Invalid webhook payload: {str(e)}"}), 400
+    
+    updated = task_snapshots.apply_webhook(event, payload)
+    print(f"Webhook {event}/{payload.get('action')}: {'snapshot updated' if updated else 'ignored'}")
+    return jsonify({"success": True, "updated": updated})
+
 @app.route('/api/repository/<repo_name>/issues', methods=['GET'])
 def get_repository_issues(repo_name):
     """Get all issues for a repository."""
@@ -845,6 +1152,8 @@ def get_repository_issues(repo_name):
         issues = github_service.get_repository_issues(repo_name, state)
         return jsonify({"success": True, "issues": issues})
     except Exception as e:
+        if isinstance(e, GitHubRateLimitError):
+            return _rate_limit_response(e)
         print(f"Error fetching issues: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
@@ -855,8 +1164,11 @@ def update_repository_issue(repo_name, issue_number):
         try:
             print(f"Deleting issue #{issue_number} in {repo_name}")
             github_service.delete_issue(repo_name, issue_number)
+            task_snapshots.invalidate(repo_name)
             return jsonify({"success": True, "message": f"Issue #{issue_number} deleted successfully"})
         except Exception as e:
+            if isinstance(e, GitHubRateLimitError):
+                return _rate_limit_response(e)
             print(f"Error deleting issue: {str(e)}")
             return jsonify({"error": str(e)}), 500
     else:  # PUT method
@@ -880,8 +1192,11 @@ def update_repository_issue(repo_name, issue_number):
                 is_broad_goal=is_broad_goal,
                 is_specific_goal=is_specific_goal
             )
+            task_snapshots.invalidate(repo_name)
             return jsonify({"success": True, "issue": updated_issue})
         except Exception as e:
+            if isinstance(e, GitHubRateLimitError):
+                return _rate_limit_response(e)
             print(f"Error updating issue: {str(e)}")
             return jsonify({"error": str(e)}), 500
 
@@ -924,12 +1239,16 @@ def create_repository_issue(repo_name):
             is_specific_goal=is_specific_goal,
             parent_issue_number=parent_issue_number
         )
+        task_snapshots.invalidate(repo_name)
         return jsonify(issue)
     except Exception as e:
+        if isinstance(e, GitHubRateLimitError):
+            return _rate_limit_response(e)
         print(f"Error creating issue: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-if __name__ == '__main__':
+def main():
+    """Run the development server (python app.py [port])."""
     # Check if port is provided as command line argument
     port = 5001
     if len(sys.argv) > 1:
@@ -939,4 +1258,8 @@ if __name__ == '__main__':
             print(f"Invalid port: {sys.argv[1]}. Using default port 5000.")
     
     print(f"Starting server on http://0.0.0.0:{port}")
-    app.run(debug=True, host='0.0.0.0', port=port) 
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=port)
+
+if __name__ == '__main__':
+    main()
+ 
\ No newline at end of file
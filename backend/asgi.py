@@ -0,0 +1,215 @@
+"""
+ASGI entrypoint: async routes for the slow LLM and GitHub calls, Flask for the rest.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 5001
+
+The routes below hold no worker thread while waiting on Azure OpenAI or
+GitHub, so many requests can be in flight on one event loop. Every other
+path (frontend, repositories, tasks, voice editing, webhooks, ...) is
+served unchanged by the Flask app in app.py through a WSGI adapter.
+"""
+import asyncio
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, request, jsonify
+from services.audio_normalizer import AudioNormalizationError
+from services.audio_workers import audio_pool, AudioPoolBusy
+from services.token_budget import count_message_tokens, summary_budget, token_usage
+from services.llm_gateway import llm_gateway
+from services.plan_store import PlanNotFoundError, InvalidPlanError, plan_goal_titles, plan_issue_goals
+from app import (
+    create_app,
+    _azure_error_response,
+    _plan_error_response,
+    _load_plan,
+    _store_generated_plan,
+    _resolve_break_down,
+    _store_break_down,
+    _normalize_repo_info,
+    _create_issues_options,
+    _create_issues_result,
+    _create_issues_error,
+    _audio_busy_error,
+    _build_transcription_messages,
+    _audio_seconds,
+    TRANSCRIBE_MAX_TOKENS
+)
+
+flask_app = create_app()
+# Bound after create_app(), which builds them
+from app import azure_service, github_service, task_snapshots
+
+async_app = Quart(__name__)
+
+# Paths answered by async_app; everything else goes to the Flask app
+ASYNC_PATHS = frozenset([
+    '/api/analyze',
+    '/api/break-down-goal',
+    '/api/generate-repo-info',
+    '/api/transcribe',
+    '/api/create-issues'
+])
+
+
+@async_app.after_request
+async def add_cors_headers(response):
+    """Mirror the flask_cors defaults of the Flask app."""
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    if request.method == 'OPTIONS':
+        response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get('Access-Control-Request-Headers', '*')
+    return response
+
+
+@async_app.route('/api/analyze', methods=['POST'])
+async def analyze_prompt():
+    """Analyze the user's prompt and generate big goals."""
+    data = await request.get_json()
+    prompt = data.get('prompt', '')
+
+    # Validate input
+    if not prompt:
+        return jsonify({"error": "No prompt provided"}), 400
+
+    try:
+        goals = await azure_service.agenerate_goals(prompt)
+        return jsonify({"big_goals": goals, **_store_generated_plan(prompt, goals["goals"])})
+    except Exception as e:
+        body, status = _azure_error_response("generate goals", e)
+        return jsonify(body), status
+
+
+@async_app.route('/api/break-down-goal', methods=['POST'])
+async def break_down_goal():
+    """Break down a big goal into smaller, more specific goals (see the Flask route for plan_id)."""
+    data = await request.get_json()
+    try:
+        goal_id, goal_title, goal_description, stored = _resolve_break_down(data, _load_plan(data))
+    except (PlanNotFoundError, InvalidPlanError) as e:
+        body, status = _plan_error_response(e)
+        return jsonify(body), status
+
+    # Validate input
+    if not goal_id or not goal_title:
+        return jsonify({"error": "Missing goal information"}), 400
+
+    if stored:
+        return jsonify({"smaller_goals": stored, "plan_id": data['plan_id']})
+
+    try:
+        smaller_goals = await azure_service.abreak_down_goal(goal_id, goal_title, goal_description)
+        return jsonify({"smaller_goals": smaller_goals, **_store_break_down(data.get('plan_id'), goal_id, smaller_goals)})
+    except Exception as e:
+        body, status = _azure_error_response("break down goal", e)
+        return jsonify(body), status
+
+
+@async_app.route('/api/generate-repo-info', methods=['POST'])
+async def generate_repo_info():
+    """Generate repository name and description based on the prompt and goals (or those of plan_id)."""
+    data = await request.get_json()
+    prompt = data.get('prompt', '')
+    goals = data.get('goals', '')
+    try:
+        plan = _load_plan(data)
+        if plan is not None:
+            prompt = prompt or plan.get('prompt', '')
+            goals = goals or plan_goal_titles(plan)
+    except (PlanNotFoundError, InvalidPlanError) as e:
+        body, status = _plan_error_response(e)
+        return jsonify(body), status
+
+    # Validate input
+    if not prompt and not goals:
+        print("Error: No prompt or goals provided")
+        return jsonify({"error": "No prompt or goals provided"}), 400
+
+    try:
+        repo_info = await azure_service.agenerate_repo_info(prompt, goals)
+        return jsonify(_normalize_repo_info(repo_info))
+    except Exception as e:
+        body, status = _azure_error_response("generate repository info", e)
+        return jsonify(body), status
+
+
+@async_app.route('/api/transcribe', methods=['POST'])
+async def transcribe_audio():
+    """Transcribe an uploaded recording with the audio deployment."""
+    try:
+        files = await request.files
+        if 'audio' not in files:
+            return jsonify({'error': 'No audio file provided'}), 400
+
+        # Decoding runs in the audio process pool; wait for it off the event loop
+        audio_data = await asyncio.to_thread(audio_pool.normalize_upload_to_base64, files['audio'])
+
+        messages = _build_transcription_messages(audio_data)
+        max_tokens = summary_budget(_audio_seconds(audio_data), cap=TRANSCRIBE_MAX_TOKENS)
+        response = await llm_gateway.acreate(
+            'audio',
+            messages=messages,
+            temperature=0.7,
+            top_p=0.95,
+            max_tokens=max_tokens
+        )
+        token_usage.record('transcribe', count_message_tokens(messages), max_tokens, response)
+
+        transcribed_text = response.choices[0].message.content
+        return jsonify({'text': transcribed_text})
+    except AudioPoolBusy as e:
+        body, status, headers = _audio_busy_error(e)
+        return jsonify(body), status, headers
+    except AudioNormalizationError as e:
+        print(f"Unreadable audio in transcribe_audio: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in transcribe_audio: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@async_app.route('/api/create-issues', methods=['POST'])
+async def create_issues():
+    """Create GitHub issues for goals (or for the goals and break-downs of plan_id)."""
+    data = await request.get_json()
+    repo_name = data.get('repo_name', '')
+    goals = data.get('goals', [])
+    try:
+        plan = _load_plan(data)
+        if plan is not None and not goals:
+            goals = plan_issue_goals(plan)
+    except (PlanNotFoundError, InvalidPlanError) as e:
+        body, status = _plan_error_response(e)
+        return jsonify(body), status
+
+    # Validate input
+    if not repo_name:
+        return jsonify({"error": "Repository name is required"}), 400
+
+    if not goals:
+        return jsonify({"error": "At least one goal is required"}), 400
+
+    parallel, max_workers = _create_issues_options(data)
+
+    try:
+        if not parallel:
+            issues = await asyncio.to_thread(github_service.create_issues, repo_name, goals)
+            task_snapshots.invalidate(repo_name)
+            return jsonify({"success": True, "issues": issues})
+
+        result = await github_service.acreate_issues_parallel(repo_name, goals, max_workers=max_workers)
+        task_snapshots.invalidate(repo_name)
+        return jsonify(_create_issues_result(result))
+    except Exception as e:
+        body, status, headers = _create_issues_error(repo_name, e)
+        return jsonify(body), status, headers
+
+
+wsgi_application = WsgiToAsgi(flask_app)
+
+
+async def application(scope, receive, send):
+    """Dispatch to the async routes or the Flask app by path."""
+    if scope['type'] == 'lifespan' or scope.get('path') in ASYNC_PATHS:
+        await async_app(scope, receive, send)
+    else:
+        await wsgi_application(scope, receive, send)
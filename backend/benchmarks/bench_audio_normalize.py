@@ -0,0 +1,118 @@
+"""
+Throughput benchmark for services.audio_normalizer.normalize_audio.
+
+Usage (from the backend directory):
+    python benchmarks/bench_audio_normalize.py [--seconds 10] [--repeat 20]
+
+Synthetic speech-length recordings are normalized on each available path:
+a WAV that is already 16 kHz mono s16le (passed through), 44.1 kHz and
+48 kHz stereo WAVs (converted in-process), and, if ffmpeg is installed,
+an Ogg/Opus file decoded over pipes. With pydub and ffmpeg available, the
+previous temp-file pipeline is timed on the same inputs for comparison.
+"""
+import io
+import os
+import sys
+import math
+import time
+import wave
+import shutil
+import struct
+import argparse
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.audio_normalizer import normalize_audio, FFMPEG_BINARY
+
+
+def make_wav(seconds, rate, channels):
+    """Generate a WAV with a 440 Hz tone and some noise-like harmonics."""
+    frames = []
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        sample = int(8000 * math.sin(2 * math.pi * 440 * t) + 2000 * math.sin(2 * math.pi * 1370 * t))
+        frames.append(struct.pack('<h', sample) * channels)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(b''.join(frames))
+    return buffer.getvalue()
+
+
+def make_opus(wav_bytes):
+    result = subprocess.run(
+        [FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0', '-c:a', 'libopus', '-f', 'ogg', 'pipe:1'],
+        input=wav_bytes, capture_output=True
+    )
+    return result.stdout if result.returncode == 0 else None
+
+
+def legacy_normalize(data):
+    """The previous pipeline: temp file, pydub decode, ffmpeg export to a second temp file, read back."""
+    from pydub import AudioSegment
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
+        temp_audio.write(data)
+    try:
+        audio = AudioSegment.from_file(temp_audio.name)
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as proper_wav:
+            audio.export(proper_wav.name, format='wav',
+                         parameters=["-acodec", "pcm_s16le", "-ac", "1", "-ar", "16000"])
+            with open(proper_wav.name, 'rb') as wav_file:
+                result = wav_file.read()
+            os.unlink(proper_wav.name)
+        return result
+    finally:
+        os.unlink(temp_audio.name)
+
+
+def throughput(func, data, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(data)
+    elapsed = time.perf_counter() - start
+    return repeat / elapsed, elapsed / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    inputs = [
+        ('wav 16k mono', make_wav(args.seconds, 16000, 1)),
+        ('wav 44.1k stereo', make_wav(args.seconds, 44100, 2)),
+        ('wav 48k stereo', make_wav(args.seconds, 48000, 2)),
+    ]
+    has_ffmpeg = shutil.which(FFMPEG_BINARY) is not None
+    if has_ffmpeg:
+        opus = make_opus(inputs[0][1])
+        if opus:
+            inputs.append(('ogg/opus', opus))
+    try:
+        import pydub  # noqa: F401
+        has_legacy = has_ffmpeg
+    except ImportError:
+        has_legacy = False
+
+    print(f"{args.seconds:g}s recordings, {args.repeat} runs each")
+    print(f"{'input':>18} {'bytes':>10} {'files/s':>9} {'ms/file':>9} {'legacy ms':>10} {'speedup':>8}")
+    for label, data in inputs:
+        rate, per_file = throughput(normalize_audio, data, args.repeat)
+        if has_legacy:
+            _, legacy_per_file = throughput(legacy_normalize, data, max(1, args.repeat // 4))
+            legacy = f"{legacy_per_file * 1000:>10.2f} {legacy_per_file / per_file:>7.1f}x"
+        else:
+            legacy = f"{'-':>10} {'-':>8}"
+        print(f"{label:>18} {len(data):>10} {rate:>9.1f} {per_file * 1000:>9.2f} {legacy}")
+
+    if not has_ffmpeg:
+        print("ffmpeg not found: non-WAV decoding and the legacy pipeline were not measured")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Micro-benchmark for services.response_decoder against the regex salvage chain.
+
+Usage (from the backend directory):
+    python benchmarks/bench_response_decoder.py [--sizes 50,200,1000] [--repeat 20]
+                                               [--responses DIR]
+
+Each input is a voice-edit response carrying an edited task list of
+the given size in KB, in three shapes: pure JSON, JSON in a code fence after a
+line of prose, and JSON after prose containing bracketed notes. The
+legacy chain is what the voice routes used to run: json.loads on the
+whole response, then a code-fence regex, then a greedy DOTALL regex,
+with current_tasks parsed again on every fallback. With --responses,
+every *.txt or *.json file in DIR (recorded model output) is timed as
+well.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.response_decoder import decode_task_list
+
+
+def make_tasks(kilobytes, seed=7):
+    """Generate a task list whose JSON is about the given size."""
+    rng = random.Random(seed)
+    words = ['api', 'login', 'schema', 'deploy', 'cache', 'review', 'tests', 'docs', 'queue', 'ui']
+    tasks = []
+    size = 2
+    task_id = 1
+    while size < kilobytes * 1024:
+        task = {
+            'id': task_id,
+            'title': ' '.join(rng.choice(words) for _ in range(4)).title(),
+            'description': ' '.join(rng.choice(words) for _ in range(30)) + ' (see [notes] and {"quoted"} text)',
+            'sub_tasks': [
+                {
+                    'id': task_id * 100 + index,
+                    'title': ' '.join(rng.choice(words) for _ in range(3)),
+                    'description': ' '.join(rng.choice(words) for _ in range(15)),
+                    'estimatedHours': rng.randint(1, 16)
+                }
+                for index in range(1, 6)
+            ]
+        }
+        tasks.append(task)
+        size += len(json.dumps(task)) + 2
+        task_id += 1
+    return tasks
+
+
+def make_responses(tasks):
+    # The response carries an edit, so a salvage that falls back to current_tasks shows up
+    edited = json.loads(json.dumps(tasks))
+    edited[0]['title'] = 'Edited by voice'
+    document = json.dumps(edited, indent=2)
+    return [
+        ('pure json', document),
+        ('code fence', "Moved the login tasks ahead of deploy.\n```json\n" + document + "\n```\n"),
+        ('prose + json', "Updated [3] tasks as asked {per your note}: " + document + "\nLet me know if [anything] else."),
+    ]
+
+
+def legacy_decode(ai_response, current_tasks):
+    """The previous salvage chain from the voice routes."""
+    json.loads(current_tasks)  # request validation
+    try:
+        updated_tasks = json.loads(ai_response)
+    except json.JSONDecodeError:
+        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', ai_response)
+        if json_match:
+            try:
+                updated_tasks = json.loads(json_match.group(1).strip())
+            except json.JSONDecodeError:
+                updated_tasks = json.loads(current_tasks)
+        else:
+            json_pattern = re.search(r'(\[.*\]|\{.*\})', ai_response, re.DOTALL)
+            if json_pattern:
+                try:
+                    updated_tasks = json.loads(json_pattern.group(1).strip())
+                except json.JSONDecodeError:
+                    updated_tasks = json.loads(current_tasks)
+            else:
+                updated_tasks = json.loads(current_tasks)
+    if not isinstance(updated_tasks, list):
+        if isinstance(updated_tasks, dict) and 'tasks' in updated_tasks:
+            updated_tasks = updated_tasks['tasks']
+        else:
+            updated_tasks = json.loads(current_tasks)
+    return updated_tasks
+
+
+def new_decode(ai_response, current_tasks):
+    """The shared decoder, with current_tasks parsed once."""
+    original_tasks = json.loads(current_tasks)
+    updated_tasks = decode_task_list(ai_response)
+    return original_tasks if updated_tasks is None else updated_tasks
+
+
+def per_call(func, ai_response, current_tasks, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(ai_response, current_tasks)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def _has_edit(tasks):
+    return 'yes' if tasks and tasks[0].get('title') == 'Edited by voice' else 'no'
+
+
+def load_recorded(directory):
+    responses = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(('.txt', '.json')):
+            with open(os.path.join(directory, name), encoding='utf-8') as handle:
+                responses.append((name, handle.read()))
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='50,200,1000', help='Task list sizes in KB')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--responses', help='Directory of recorded model responses')
+    args = parser.parse_args()
+
+    inputs = []
+    for kilobytes in (int(size) for size in args.sizes.split(',')):
+        tasks = make_tasks(kilobytes)
+        current_tasks = json.dumps(tasks)
+        for shape, response in make_responses(tasks):
+            inputs.append((f"{kilobytes}KB {shape}", response, current_tasks))
+    if args.responses:
+        for name, response in load_recorded(args.responses):
+            inputs.append((name, response, '[]'))
+
+    print(f"{args.repeat} runs each")
+    print("edit found: whether the returned tasks carry the edit (synthetic inputs only)")
+    print(f"{'input':>24} {'bytes':>9} {'legacy ms':>10} {'decoder ms':>11} {'speedup':>8} {'edit found':>22}")
+    for label, response, current_tasks in inputs:
+        legacy, legacy_result = per_call(legacy_decode, response, current_tasks, args.repeat)
+        new, new_result = per_call(new_decode, response, current_tasks, args.repeat)
+        found = f"{_has_edit(legacy_result):>10} {_has_edit(new_result):>11}"
+        print(f"{label:>24} {len(response):>9} {legacy * 1000:>10.2f} {new * 1000:>11.2f} {legacy / new:>7.1f}x {found}")
+
+
+if __name__ == '__main__':
+    main()
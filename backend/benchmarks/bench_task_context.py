@@ -0,0 +1,121 @@
+"""
+Benchmark for services.task_context: prompt size and latency of voice edits.
+
+Usage (from the backend directory):
+    python benchmarks/bench_task_context.py [--sizes 20,100,500] [--repeat 20] [--live]
+
+For each synthetic plan size (number of tasks, five sub-tasks each), a
+voice edit naming one sub-task is prompted two ways:
+- before: the whole plan as json.dumps(indent=2), as modify_tasks_voice used to send it
+- after: build_task_context's compact JSON, pruned to the matching tasks when
+  the plan is over TASK_CONTEXT_MAX_TOKENS
+
+The benchmark reports prompt tokens (plus the whole plan as compact JSON, to
+separate the indentation saving from the pruning) and the time to build each prompt. It
+also checks that the pruned subset contains the named sub-task. With
+--live, each prompt is also sent once through AzureService (the Azure
+OpenAI settings in .env are required), and the end-to-end latency is
+reported.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.task_context import build_task_context, compact_json
+from services.token_budget import count_tokens
+
+WORDS = ['api', 'login', 'schema', 'deploy', 'cache', 'review', 'tests', 'docs', 'queue', 'ui',
+         'billing', 'search', 'export', 'metrics', 'onboarding', 'mobile', 'webhooks', 'audit']
+
+
+def make_plan(task_count, seed=3):
+    """Generate a plan shaped like the planner's task lists."""
+    rng = random.Random(seed)
+    tasks = []
+    for task_id in range(1, task_count + 1):
+        tasks.append({
+            'id': task_id,
+            'title': ' '.join(rng.choice(WORDS) for _ in range(3)).title(),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(25)),
+            'sub_tasks': [
+                {
+                    'id': task_id * 100 + index,
+                    'title': ' '.join(rng.choice(WORDS) for _ in range(3)),
+                    'description': ' '.join(rng.choice(WORDS) for _ in range(12)),
+                    'estimatedHours': rng.randint(1, 16)
+                }
+                for index in range(1, 6)
+            ]
+        })
+    # A distinctive sub-task for the voice edit to name
+    target = tasks[task_count // 2]['sub_tasks'][2]
+    target['title'] = 'Password reset email template'
+    return tasks, target['id'], "Change the password reset email template estimate to six hours"
+
+
+def legacy_prompt(transcription, tasks):
+    task_json = json.dumps(tasks, indent=2)
+    return f'MAKE ONLY CHANGES BASED ON THE VOICE INPUT: "{transcription}"\n{task_json}'
+
+
+def pruned_prompt(transcription, tasks):
+    context = build_task_context(tasks, transcription)
+    return f'MAKE ONLY CHANGES BASED ON THE VOICE INPUT: "{transcription}"\n{context.to_json()}', context
+
+
+def per_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def live_latency(service, transcription, task_json, context):
+    system_prompt, user_prompt = service._build_modify_tasks_prompt(transcription, task_json, context)
+    start = time.perf_counter()
+    service._call_openai_api(system_prompt=system_prompt, user_prompt=user_prompt,
+                             usage_kind='bench_task_context')
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='20,100,500', help='Plan sizes in tasks')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--live', action='store_true', help='Also time one model call per prompt')
+    args = parser.parse_args()
+
+    service = None
+    if args.live:
+        from services.azure_service import AzureService
+        service = AzureService()
+
+    print(f"{args.repeat} runs each; tokens per {os.getenv('TOKENIZER_ENCODING', 'o200k_base')} (chars/4 without tiktoken)")
+    header = f"{'tasks':>6} {'before tok':>11} {'compact tok':>12} {'after tok':>10} {'saved':>7} {'before ms':>10} {'after ms':>9} {'pruned':>7} {'target sent':>12}"
+    if args.live:
+        header += f" {'before s':>9} {'after s':>8}"
+    print(header)
+    for size in (int(size) for size in args.sizes.split(',')):
+        tasks, target_id, transcription = make_plan(size)
+        before_time, before = per_call(lambda: legacy_prompt(transcription, tasks), args.repeat)
+        after_time, (after, context) = per_call(lambda: pruned_prompt(transcription, tasks), args.repeat)
+        before_tokens = count_tokens(before)
+        compact_tokens = count_tokens(compact_json(tasks))
+        after_tokens = count_tokens(after)
+        sent = any(sub['id'] == target_id for task in context.subset for sub in task.get('sub_tasks') or [])
+        line = (f"{size:>6} {before_tokens:>11} {compact_tokens:>12} {after_tokens:>10} {1 - after_tokens / before_tokens:>6.0%} "
+                f"{before_time * 1000:>10.2f} {after_time * 1000:>9.2f} {str(context.pruned):>7} {str(sent):>12}")
+        if args.live:
+            full = build_task_context(tasks, transcription, max_tokens=float('inf'))
+            line += (f" {live_latency(service, transcription, json.dumps(tasks, indent=2), full):>9.2f}"
+                     f" {live_latency(service, transcription, context.to_json(), context):>8.2f}")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark for services.task_tree.build_task_tree on synthetic repositories.
+
+Usage (from the backend directory):
+    python benchmarks/bench_task_tree.py [--sizes 100,1000,10000,50000] [--legacy-max 2000]
+
+Each synthetic repository has one parent per six issues. Children carry a
+"Parent Task: #n" reference like the ones create_issue writes. Sub-issue
+lookups succeed for even-numbered parents and raise for odd ones, so both
+the sub-issues path and the description fallback are exercised. For sizes
+up to --legacy-max the previous quadratic implementation is timed as well,
+and its output is checked against the new one.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.task_tree import build_task_tree
+
+
+def make_repository(size, seed=0):
+    """Generate issues and a sub-issue map shaped like a planner-created repository."""
+    rng = random.Random(seed)
+    issues = []
+    sub_issues = {}
+    parents = []
+    for number in range(1, size + 1):
+        if number % 6 == 1 or not parents:
+            parents.append(number)
+            sub_issues[number] = []
+            issues.append({
+                'id': number,
+                'title': f"Goal {number}",
+                'description': f"Broad goal {number}",
+                'labels': ['broad-goal'],
+                'is_broad_goal': True,
+                'is_specific_goal': False
+            })
+        else:
+            parent = parents[-1] if rng.random() < 0.9 else rng.choice(parents)
+            sub_issues[parent].append({'number': number})
+            issues.append({
+                'id': number,
+                'title': f"Task {number}",
+                'description': f"Do part of #{parent}, see also #{rng.randint(1, size)}\n\nParent Task: #{parent}",
+                'labels': ['specific-goal'],
+                'is_broad_goal': False,
+                'is_specific_goal': True
+            })
+    issues.reverse()  # GitHub lists newest first
+    return issues, sub_issues
+
+
+def make_lookup(sub_issues):
+    def get_sub_issues(parent_id):
+        if parent_id % 2:
+            raise Exception("Sub-issues API not available")
+        return sub_issues.get(parent_id, [])
+    return get_sub_issues
+
+
+def legacy_build_task_tree(issues, get_sub_issues):
+    """The previous inline implementation from get_repository_tasks, minus logging."""
+    tasks = []
+    parent_tasks = []
+    child_tasks = []
+    for issue in issues:
+        is_parent = issue['is_broad_goal']
+        is_child = issue['is_specific_goal']
+        if not is_parent and not is_child:
+            is_parent = True
+        task = {'number': issue['id'], 'title': issue['title'], 'body': issue['description'], 'is_parent': is_parent, 'parent_id': None}
+        tasks.append(task)
+        (parent_tasks if is_parent else child_tasks).append(task)
+
+    for parent_task in parent_tasks:
+        parent_id = parent_task['number']
+        try:
+            sub_issues = get_sub_issues(parent_id)
+            for sub_issue in sub_issues:
+                sub_issue_id = sub_issue.get('number')
+                if sub_issue_id:
+                    child_task = next((t for t in tasks if t['number'] == sub_issue_id), None)
+                    if child_task:
+                        child_task['parent_id'] = parent_id
+                        child_task['is_parent'] = False
+        except Exception:
+            for child in child_tasks:
+                if child['parent_id'] is None:
+                    child_issue = next((i for i in issues if i['id'] == child['number']), None)
+                    if child_issue and child_issue['description'] and f"#{parent_id}" in child_issue['description']:
+                        child['parent_id'] = parent_id
+
+    for task in child_tasks:
+        if task['parent_id'] is None:
+            issue = next((i for i in issues if i['id'] == task['number']), None)
+            if issue and issue['description']:
+                parent_refs = set()
+                for match in re.finditer(r'#(\d+)', issue['description']):
+                    parent_id = int(match.group(1))
+                    if any(p['number'] == parent_id for p in parent_tasks):
+                        parent_refs.add(parent_id)
+                if parent_refs:
+                    task['parent_id'] = next(iter(parent_refs))
+
+    if not parent_tasks and tasks:
+        tasks[0]['is_parent'] = True
+    return tasks
+
+
+def time_call(func, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000,50000')
+    parser.add_argument('--legacy-max', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'issues':>8} {'build_task_tree':>16} {'legacy':>12} {'speedup':>9}")
+    for size in [int(value) for value in args.sizes.split(',')]:
+        issues, sub_issues = make_repository(size)
+        new_time, new_tasks = time_call(build_task_tree, issues, make_lookup(sub_issues))
+
+        if size <= args.legacy_max:
+            legacy_time, legacy_tasks = time_call(legacy_build_task_tree, issues, make_lookup(sub_issues), repeat=1)
+            if legacy_tasks != new_tasks:
+                raise SystemExit(f"Mismatch between implementations at {size} issues")
+            print(f"{size:>8} {new_time * 1000:>14.2f}ms {legacy_time * 1000:>10.2f}ms {legacy_time / new_time:>8.1f}x")
+        else:
+            print(f"{size:>8} {new_time * 1000:>14.2f}ms {'-':>12} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
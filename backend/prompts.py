@@ -1,8 +1,42 @@
 """
 This module contains all the prompts used in the application.
-Each prompt is a template that can be formatted with specific values.
+
+Azure OpenAI caches prompt prefixes: once 1024 or more leading tokens are
+identical to a recent request, they are billed at a discount and skipped
+during prefill. So every prompt puts its static part (instructions and
+JSON examples) first and the variable payload last. The payload is
+ordered from the most stable part (e.g. the plan being edited) to the
+least stable (the new voice input). Text prompts are PromptTemplates:
+the static part is compiled into a fixed system message once, at import
+time, and only the payload is assembled per call.
 """
 
+
+class PromptTemplate:
+    """Static instructions compiled into a system message, followed by labelled payload sections."""
+
+    def __init__(self, instructions, sections, system_prompt=None):
+        """
+        Args:
+            instructions (str): Static instructions and JSON examples (no placeholders)
+            sections (list): (field, label) pairs, in payload order from the most to
+                             the least stable field
+            system_prompt (str, optional): Role prompt placed before the instructions;
+                                           defaults to SYSTEM_PROMPT
+        """
+        self.system = f"{system_prompt or SYSTEM_PROMPT}\n\n{instructions.strip()}"
+        self.sections = [(field, f"{label}:\n") for field, label in sections]
+
+    def render(self, **values):
+        """
+        Fill in the payload.
+
+        Returns:
+            tuple: (system_prompt, user_prompt); the system prompt is the same object on every call
+        """
+        return self.system, "\n\n".join(header + str(values[field]) for field, header in self.sections)
+
+
 # System prompts
 SYSTEM_PROMPT = """You are a helpful assistant that specializes in project management and breaking down tasks. 
 Your responses should be in valid JSON format only, without any additional text, explanations, or markdown formatting. 
@@ -10,90 +44,133 @@ Always structure your response exactly as requested in the user's prompt."""
 
 AUDIO_TRANSCRIPTION_PROMPT = """You are an scrummaster that listens to a conversation and understands what the project is about and summarizes the key details talked about in that conversation. Be sure to include all the details and context of the conversation in the summary."""
 
-# User prompts
+# Instructions; the payload follows them in the user message
 GENERATE_GOALS_PROMPT = """
-Based on the following project description, generate broad project goals and their specific actionable sub-tasks.
+Based on the project description in the user's message, generate broad project goals and their specific actionable sub-tasks.
 Each broad goal should be broken down into specific, actionable sub-tasks.
 
 Create tasks in an time ordered manner. In a normal project, the tasks are completed in a linear manner. So this should be linear too. If there are any dependencies, they should be handled in the sub-tasks.
 
-PROJECT DESCRIPTION:
-{text}
-
 Provide the goals and their sub-tasks in the following JSON format:
-{{
+{
     "goals": [
-        {{
+        {
             "id": 1,
             "title": "Main goal title",
             "description": "Detailed description of the main goal",
             "sub_tasks": [
-                {{
+                {
                     "id": 101,
                     "title": "Sub-task title",
                     "description": "Detailed description of the sub-task"
-                }},
+                },
                 ...
             ]
-        }},
+        },
         ...
     ]
-}}
+}
 
 Include only the JSON in your response.
 """
 
 BREAK_DOWN_GOAL_PROMPT = """
-Break down the following broad goal into 3-5 specific, actionable goals.
+Break down the broad goal in the user's message into 3-5 specific, actionable goals.
 Each specific goal should be focused and achievable.
 
-BROAD GOAL: {goal_title}
-DESCRIPTION: {goal_description}
-
 Provide the specific goals in the following JSON format:
-{{
+{
     "specificGoals": [
-        {{
-            "id": {goal_id_start},
+        {
+            "id": 101,
             "title": "First specific goal title",
             "description": "Detailed description of the first specific goal"
-        }},
-        {{
-            "id": {goal_id_start_plus_one},
+        },
+        {
+            "id": 102,
             "title": "Second specific goal title",
             "description": "Detailed description of the second specific goal"
-        }},
+        },
         ... (and so on for 3-5 goals)
     ]
-}}
+}
 
-Start IDs from {goal_id_start} for tracking purposes. Include only the JSON in your response.
+Number the IDs consecutively from the FIRST ID given in the user's message, for tracking purposes. Include only the JSON in your response.
 """
 
 GENERATE_REPO_INFO_PROMPT = """
-Based on the following project description and its goals, generate a suitable GitHub repository name and description.
-
-PROJECT DESCRIPTION:
-{prompt}
-
-PROJECT GOALS:
-{goals}
+Based on the project description and its goals in the user's message, generate a suitable GitHub repository name and description.
 
 Provide your response in the following JSON format:
-{{
+{
     "repo_name": "repository-name-with-dashes",
     "description": "A concise description of the project in one sentence."
-}}
+}
 
 The repository name should be lowercase, use dashes instead of spaces, and be concise but descriptive.
 The description should briefly explain what the project does in one sentence.
 Include only the JSON in your response.
 """
 
+VOICE_CHAT_SYSTEM_PROMPT = """You are an AI assistant helping to update task information based on voice input. You have access to a task and its sub-tasks. The user may ask to modify, add, or remove tasks and sub-tasks. Your responses should be helpful, concise, and focused on the task."""
+
+VOICE_CHAT_PROMPT = """
+Answer the user's latest voice input about the task they are looking at, taking the conversation so far into account.
+Respond with a JSON object with a "message" for the user, plus "updatedTask" and "updatedSubTasks" when the input changes them.
+"""
+
+MODIFY_TASKS_TRANSCRIPT_SYSTEM_PROMPT = """You are an AI assistant helping to update tasks based on voice input. You have access to the list of tasks and sub-tasks (or, for a large plan, the part of it relevant to the voice input). Based on the user's voice input, you should determine if any changes are needed to any tasks in the list. Make changes only based on the voice input provided."""
+
+MODIFY_TASKS_TRANSCRIPT_PROMPT = """
+The user's message holds a set of tasks and sub-tasks for each task, as JSON, and the user's voice input.
+The user wants to modify the task list using their voice input.
+Figure out if any changes are needed to any tasks based on the voice input. MAKE ONLY CHANGES BASED ON THE VOICE INPUT.
+
+Return the modified tasks in the exact same JSON format. If no changes are needed, return the original tasks unchanged.
+
+If the message says the plan was pruned, only the tasks and sub-tasks the voice input most likely refers to are shown.
+Tasks and sub-tasks not shown are kept unchanged. A shown task or sub-task that you leave out of your answer is deleted.
+Give new tasks and sub-tasks the ids the message says to start from.
+"""
+
+# Compiled text prompts: static system message, then the payload sections
+GENERATE_GOALS_TEMPLATE = PromptTemplate(GENERATE_GOALS_PROMPT, [('text', 'PROJECT DESCRIPTION')])
+
+BREAK_DOWN_GOAL_TEMPLATE = PromptTemplate(BREAK_DOWN_GOAL_PROMPT, [
+    ('goal_title', 'BROAD GOAL'),
+    ('goal_description', 'DESCRIPTION'),
+    ('goal_id_start', 'FIRST ID')
+])
+
+GENERATE_REPO_INFO_TEMPLATE = PromptTemplate(GENERATE_REPO_INFO_PROMPT, [
+    ('prompt', 'PROJECT DESCRIPTION'),
+    ('goals', 'PROJECT GOALS')
+])
+
+# The conversation only grows, so it goes before the new input
+VOICE_CHAT_TEMPLATE = PromptTemplate(VOICE_CHAT_PROMPT, [
+    ('conversation', 'CONVERSATION SO FAR'),
+    ('task_id', 'TASK ID'),
+    ('transcription', 'LATEST VOICE INPUT')
+], system_prompt=VOICE_CHAT_SYSTEM_PROMPT)
+
+# The plan is the same across consecutive edits, so it goes before the voice input
+MODIFY_TASKS_TRANSCRIPT_TEMPLATE = PromptTemplate(MODIFY_TASKS_TRANSCRIPT_PROMPT, [
+    ('tasks', 'CURRENT JSON'),
+    ('scope', 'PLAN SCOPE'),
+    ('transcription', 'VOICE INPUT')
+], system_prompt=MODIFY_TASKS_TRANSCRIPT_SYSTEM_PROMPT)
+
+# Audio prompts: the system message is this text plus the current JSON, and the
+# recording follows in the user message
 MODIFY_TASKS_VOICE_PROMPT = """
-below is a set of tasks and sub-tasks for each task based on the conversation, figure out if any changes are needed to any task based on the conversation. MAKE ONLY CHANGES BASED ON THE CONVERSATION
+Below is a set of tasks and sub-tasks for each task. Listen to the audio and figure out if any changes are needed to any task based on it. MAKE ONLY CHANGES BASED ON THE AUDIO.
+
+Return ONLY a valid JSON array of tasks with the same structure as the input.
+Each task should have: id, title, description, and sub_tasks array.
+Each sub_task should have: id, title, description, and estimatedHours (if available).
 
-Below is the current JSON
+Below is the current JSON:
 """
 
 MODIFY_GANTT_VOICE_PROMPT = """
@@ -108,4 +185,37 @@ Below is a Gantt chart JSON structure containing task assignments with developer
 Make ONLY changes based on the voice input. Return the ENTIRE updated JSON structure, preserving the overall format.
 
 Below is the current JSON:
-"""
\ No newline at end of file
+"""
+# Patch mode for the voice edits: the model returns only the changes, as JSON Patch
+MODIFY_TASKS_VOICE_PATCH_PROMPT = """
+Below is a set of tasks and sub-tasks for each task. Figure out which changes the voice input asks for. MAKE ONLY CHANGES BASED ON THE VOICE INPUT.
+
+Do NOT return the tasks. Return a JSON object with exactly these fields:
+{
+    "transcription": "What the user asked for, in one sentence",
+    "patch": [JSON Patch (RFC 6902) operations]
+}
+
+Paths address tasks and sub-tasks by their id, never by their position:
+- "/12/title" is the title of the task with id 12
+- "/12/sub_tasks/1203/estimatedHours" is a field of sub-task 1203 of task 12
+- {"op": "add", "path": "/12/sub_tasks/-", "value": {"id": 1206, "title": "...", "description": "..."}} adds a sub-task
+- {"op": "remove", "path": "/12"} removes a task
+Give new tasks and sub-tasks ids that are not used yet. Return "patch": [] if nothing needs to change.
+
+Below is the current JSON:
+"""
+
+MODIFY_GANTT_VOICE_PATCH_PROMPT = """
+Below is a Gantt chart JSON structure containing task assignments with developer names, dates, and estimated hours. Figure out which changes the voice input asks for (dates, developers, estimated hours, dependencies, added or removed tasks). Make ONLY changes based on the voice input.
+
+Do NOT return the chart. Return a JSON object with exactly these fields:
+{
+    "transcription": "What the user asked for, in one sentence",
+    "patch": [JSON Patch (RFC 6902) operations]
+}
+
+Items of an array of objects that have an "id" are addressed by that id, never by their position: if "tasks" holds an object with "id": "t3", its start date is "/tasks/t3/start". Other arrays use positions as usual, with "-" to append. Give new items ids that are not used yet. Return "patch": [] if nothing needs to change.
+
+Below is the current JSON:
+"""
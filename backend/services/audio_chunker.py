@@ -0,0 +1,76 @@
+"""
+Splitting of normalized recordings into transcription windows at pauses.
+
+Windows are roughly CHUNK_SECONDS long. Each cut is moved back to the
+quietest short frame within the last SILENCE_SEARCH_SECONDS of the
+window, so sentences are rarely split mid-word.
+"""
+import os
+import sys
+from array import array
+from services.audio_normalizer import wav_pcm, pcm_to_wav, TARGET_RATE, TARGET_SAMPLE_WIDTH
+
+CHUNK_SECONDS = float(os.getenv('AUDIO_CHUNK_SECONDS', '30'))
+SILENCE_SEARCH_SECONDS = float(os.getenv('AUDIO_SILENCE_SEARCH_SECONDS', '5'))
+SILENCE_FRAME_MS = 50
+# A trailing piece shorter than this is merged into the previous window
+MIN_CHUNK_SECONDS = 2
+
+BYTES_PER_SECOND = TARGET_RATE * TARGET_SAMPLE_WIDTH
+
+
+def _mean_square(pcm):
+    """Mean square of s16le samples; ranks frames by loudness like their RMS would."""
+    samples = array('h', pcm[:len(pcm) - len(pcm) % TARGET_SAMPLE_WIDTH])
+    if not samples:
+        return 0
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return sum(sample * sample for sample in samples) / len(samples)
+
+
+def _quietest_offset(pcm, start, end):
+    """Return the byte offset of the lowest-RMS frame in pcm[start:end]."""
+    frame = BYTES_PER_SECOND * SILENCE_FRAME_MS // 1000
+    best_offset = end
+    best_loudness = None
+    # Walk backwards so ties prefer the latest pause, giving longer windows
+    offset = end - frame
+    while offset >= start:
+        loudness = _mean_square(pcm[offset:offset + frame])
+        if best_loudness is None or loudness < best_loudness:
+            best_loudness = loudness
+            best_offset = offset + frame // 2
+        offset -= frame
+    # Keep cuts on sample boundaries
+    return best_offset - best_offset % TARGET_SAMPLE_WIDTH
+
+
+def split_at_silence(wav_bytes, chunk_seconds=CHUNK_SECONDS, search_seconds=SILENCE_SEARCH_SECONDS):
+    """
+    Split a normalized (16 kHz mono s16le) WAV into windows cut at pauses.
+
+    Args:
+        wav_bytes (bytes): Output of audio_normalizer.normalize_audio
+        chunk_seconds (float): Target window length
+        search_seconds (float): How far back from the target length to look for a pause
+
+    Returns:
+        list: (start_seconds, end_seconds, wav_bytes) per window, in order
+    """
+    pcm = wav_pcm(wav_bytes)
+    window = int(chunk_seconds * BYTES_PER_SECOND)
+    window -= window % TARGET_SAMPLE_WIDTH
+    search = int(min(search_seconds, chunk_seconds / 2) * BYTES_PER_SECOND)
+    min_tail = MIN_CHUNK_SECONDS * BYTES_PER_SECOND
+
+    cuts = [0]
+    while len(pcm) - cuts[-1] > window + min_tail:
+        target = cuts[-1] + window
+        cuts.append(_quietest_offset(pcm, target - search, target))
+    cuts.append(len(pcm))
+
+    return [
+        (start / BYTES_PER_SECOND, end / BYTES_PER_SECOND, pcm_to_wav(pcm[start:end]))
+        for start, end in zip(cuts, cuts[1:])
+    ]
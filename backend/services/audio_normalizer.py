@@ -0,0 +1,193 @@
+"""
+In-memory normalization of uploaded recordings to 16 kHz mono 16-bit WAV.
+
+Both the audio chat deployment and Azure Speech expect this format.
+Uploads that already match it are passed through untouched. Other WAV
+files are converted in-process with audioop (from the standard library
+before Python 3.13, from the audioop-lts backport after). Anything else
+(webm/ogg from browsers, mp3, ...) is decoded by a single ffmpeg process
+over stdin/stdout, so no temporary files are written.
+"""
+import io
+import os
+import wave
+import base64
+import audioop
+import subprocess
+import threading
+import time
+
+TARGET_RATE = 16000
+TARGET_CHANNELS = 1
+TARGET_SAMPLE_WIDTH = 2  # bytes, i.e. s16le
+
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFMPEG_TIMEOUT = float(os.getenv('FFMPEG_TIMEOUT', '60'))
+
+_stats_lock = threading.Lock()
+_stats = {
+    'passthrough': 0,
+    'wav_converted': 0,
+    'ffmpeg_decoded': 0,
+    'failures': 0,
+    'input_bytes': 0,
+    'seconds': 0.0
+}
+
+
+class AudioNormalizationError(Exception):
+    """Raised when an upload cannot be decoded as audio."""
+
+
+def read_upload(audio_file):
+    """
+    Read an uploaded file (werkzeug FileStorage or any file object) into memory.
+
+    Returns:
+        bytes: The raw upload
+    """
+    stream = getattr(audio_file, 'stream', audio_file)
+    # A request body stream has seek() but raises on it; read it from where it is
+    if getattr(stream, 'seekable', lambda: False)():
+        stream.seek(0)
+    return stream.read()
+
+
+def _wav_params(data):
+    """Return (channels, sample_width, frame_rate) for a PCM WAV, or None if data is not one."""
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return None
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as reader:
+            return reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+    except (wave.Error, EOFError):
+        # Not plain PCM (e.g. float or compressed WAV); let ffmpeg handle it
+        return None
+
+
+def pcm_to_wav(pcm):
+    """Wrap 16 kHz mono s16le samples in a WAV container."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as writer:
+        writer.setnchannels(TARGET_CHANNELS)
+        writer.setsampwidth(TARGET_SAMPLE_WIDTH)
+        writer.setframerate(TARGET_RATE)
+        writer.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def _convert_wav(data):
+    """Downmix, requantize and resample a PCM WAV in-process."""
+    with wave.open(io.BytesIO(data), 'rb') as reader:
+        channels = reader.getnchannels()
+        width = reader.getsampwidth()
+        rate = reader.getframerate()
+        pcm = reader.readframes(reader.getnframes())
+
+    if width == 1:
+        # 8-bit WAV samples are unsigned
+        pcm = audioop.bias(pcm, 1, -128)
+    if width != TARGET_SAMPLE_WIDTH:
+        pcm = audioop.lin2lin(pcm, width, TARGET_SAMPLE_WIDTH)
+    if channels == 2:
+        pcm = audioop.tomono(pcm, TARGET_SAMPLE_WIDTH, 0.5, 0.5)
+    elif channels > 2:
+        # Keep the first channel of multi-channel recordings
+        frame = TARGET_SAMPLE_WIDTH * channels
+        pcm = b''.join(pcm[i:i + TARGET_SAMPLE_WIDTH] for i in range(0, len(pcm), frame))
+    if rate != TARGET_RATE:
+        pcm, _ = audioop.ratecv(pcm, TARGET_SAMPLE_WIDTH, TARGET_CHANNELS, rate, TARGET_RATE, None)
+    return pcm_to_wav(pcm)
+
+
+def _decode_with_ffmpeg(data):
+    """Decode any container ffmpeg understands to 16 kHz mono s16le, through pipes."""
+    command = [
+        FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+        '-i', 'pipe:0',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ac', str(TARGET_CHANNELS), '-ar', str(TARGET_RATE),
+        'pipe:1'
+    ]
+    try:
+        result = subprocess.run(command, input=data, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    except FileNotFoundError:
+        raise AudioNormalizationError(f"ffmpeg not found ({FFMPEG_BINARY}); it is required to decode non-WAV audio")
+    except subprocess.TimeoutExpired:
+        raise AudioNormalizationError(f"ffmpeg did not finish decoding within {FFMPEG_TIMEOUT:g}s")
+    if result.returncode != 0:
+        raise AudioNormalizationError(f"Could not decode audio: {result.stderr.decode('utf-8', 'replace').strip()}")
+    # ffmpeg cannot seek back to fix WAV sizes on a pipe, so it outputs raw samples and we add the header
+    return pcm_to_wav(result.stdout)
+
+
+def decode_audio(data):
+    """
+    Convert an upload to the target format without recording stats.
+
+    This is the unit of work the audio decode pool runs in its worker
+    processes; the parent records the result with record_decode.
+
+    Returns:
+        tuple: (path, wav_bytes, seconds) where path is 'passthrough',
+               'wav_converted' or 'ffmpeg_decoded'
+    """
+    if not data:
+        raise AudioNormalizationError("Audio upload is empty")
+
+    start = time.perf_counter()
+    params = _wav_params(data)
+    if params == (TARGET_CHANNELS, TARGET_SAMPLE_WIDTH, TARGET_RATE):
+        kind, wav = 'passthrough', data
+    elif params is not None:
+        kind, wav = 'wav_converted', _convert_wav(data)
+    else:
+        kind, wav = 'ffmpeg_decoded', _decode_with_ffmpeg(data)
+    return kind, wav, time.perf_counter() - start
+
+
+def record_decode(kind, input_bytes, seconds):
+    """Count one decode (kind None marks a failure)."""
+    with _stats_lock:
+        if kind is None:
+            _stats['failures'] += 1
+            return
+        _stats[kind] += 1
+        _stats['input_bytes'] += input_bytes
+        _stats['seconds'] += seconds
+
+
+def normalize_audio(data):
+    """
+    Convert an uploaded recording to 16 kHz mono 16-bit WAV.
+
+    Args:
+        data (bytes): The raw upload
+
+    Returns:
+        bytes: A WAV file in the target format
+    """
+    try:
+        kind, wav, seconds = decode_audio(data)
+    except Exception:
+        record_decode(None, len(data or b''), 0)
+        raise
+    record_decode(kind, len(data), seconds)
+    return wav
+
+
+def normalize_upload_to_base64(audio_file):
+    """Normalize an uploaded file and base64-encode it for an input_audio message part."""
+    return base64.b64encode(normalize_audio(read_upload(audio_file))).decode('utf-8')
+
+
+def wav_pcm(wav_bytes):
+    """Return the raw samples of a normalized WAV (e.g. for a speech push stream)."""
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as reader:
+        return reader.readframes(reader.getnframes())
+
+
+def get_stats():
+    """Return counts per normalization path and total decode time."""
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,131 @@
+"""
+Process pool for audio decoding, kept apart from the request threads.
+
+Resampling and ffmpeg decoding are CPU-bound. Run on request threads, a
+burst of voice uploads would starve the lightweight JSON endpoints. The
+pool admits at most AUDIO_DECODE_QUEUE decodes (running plus waiting).
+Past that it raises AudioPoolBusy, which the routes turn into a 503 with
+Retry-After.
+"""
+import os
+import time
+import base64
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from services.audio_normalizer import decode_audio, record_decode, read_upload
+
+# 0 decodes on the calling thread (still bounded by the queue)
+AUDIO_DECODE_WORKERS = int(os.getenv('AUDIO_DECODE_WORKERS', str(min(4, os.cpu_count() or 1))))
+AUDIO_DECODE_QUEUE = int(os.getenv('AUDIO_DECODE_QUEUE', '16'))
+AUDIO_RETRY_AFTER = int(os.getenv('AUDIO_DECODE_RETRY_AFTER', '5'))
+
+
+class AudioPoolBusy(Exception):
+    """Raised when the decode queue is full."""
+
+    def __init__(self, message, retry_after=AUDIO_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AudioDecodePool:
+    """Bounded, load-shedding front of a ProcessPoolExecutor running decode_audio."""
+
+    def __init__(self, workers=AUDIO_DECODE_WORKERS, queue_size=AUDIO_DECODE_QUEUE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.executor = None
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'peak_in_flight': 0,
+            'decode_seconds': 0.0,
+            'max_decode_seconds': 0.0,
+            'queue_wait_seconds': 0.0
+        }
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn: forking a multi-threaded server process is unsafe. A spawned
+                # worker unpickles decode_audio from audio_normalizer (stdlib only)
+                # and re-runs the main script, which therefore builds nothing on
+                # import (see app.create_app)
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self.executor
+
+    def normalize(self, data):
+        """
+        Normalize raw upload bytes in a worker process.
+
+        Returns:
+            bytes: A 16 kHz mono 16-bit WAV
+
+        Raises:
+            AudioPoolBusy: If AUDIO_DECODE_QUEUE decodes are already admitted
+        """
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.stats['rejected'] += 1
+            raise AudioPoolBusy(f"Audio decoding is at capacity ({self.queue_size} uploads in progress)")
+
+        with self.lock:
+            self.in_flight += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.in_flight)
+        start = time.perf_counter()
+        try:
+            if self.workers > 0:
+                kind, wav, seconds = self._get_executor().submit(decode_audio, data).result()
+            else:
+                kind, wav, seconds = decode_audio(data)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A worker died (e.g. killed for memory); start a fresh pool next time
+                with self.lock:
+                    self.executor = None
+            record_decode(None, len(data or b''), 0)
+            with self.lock:
+                self.stats['failed'] += 1
+            raise
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            self.slots.release()
+
+        record_decode(kind, len(data), seconds)
+        with self.lock:
+            self.stats['completed'] += 1
+            self.stats['decode_seconds'] += seconds
+            self.stats['max_decode_seconds'] = max(self.stats['max_decode_seconds'], seconds)
+            self.stats['queue_wait_seconds'] += max(0.0, time.perf_counter() - start - seconds)
+        return wav
+
+    def normalize_upload(self, audio_file):
+        """Read an uploaded file and normalize it in a worker process."""
+        return self.normalize(read_upload(audio_file))
+
+    def normalize_upload_to_base64(self, audio_file):
+        """Normalize an uploaded file and base64-encode it for an input_audio message part."""
+        return base64.b64encode(self.normalize_upload(audio_file)).decode('utf-8')
+
+    def get_stats(self):
+        """Return pool configuration, current queue depth and decode timings."""
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queue_depth': self.in_flight,
+                **self.stats
+            }
+
+
+audio_pool = AudioDecodePool()
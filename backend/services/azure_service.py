@@ -7,26 +7,42 @@ from typing import List, Dict, Any
 from dotenv import load_dotenv
 from prompts import (
     SYSTEM_PROMPT,
-    GENERATE_GOALS_PROMPT,
-    BREAK_DOWN_GOAL_PROMPT,
-    GENERATE_REPO_INFO_PROMPT,
-    MODIFY_TASKS_VOICE_PROMPT
+    GENERATE_GOALS_TEMPLATE,
+    BREAK_DOWN_GOAL_TEMPLATE,
+    GENERATE_REPO_INFO_TEMPLATE,
+    VOICE_CHAT_TEMPLATE,
+    MODIFY_TASKS_TRANSCRIPT_TEMPLATE
 )
-import tempfile
 import base64
-from pydub import AudioSegment
-from azure.cognitiveservices.speech import (
-    SpeechConfig, 
-    AudioConfig, 
-    SpeechRecognizer, 
-    ResultReason, 
-    CancellationDetails, 
-    CancellationReason
+from azure.cognitiveservices.speech import SpeechConfig
+from services.audio_normalizer import wav_pcm
+from services.audio_workers import audio_pool, AudioPoolBusy
+from services.speech_recognition import ContinuousTranscriber, SpeechRecognitionError
+from services.llm_cache import LLMResponseCache
+from services.json_stream import JSONArrayStreamParser
+from services.llm_gateway import llm_gateway
+from services.single_flight import SingleFlight
+from services.response_decoder import extract_json, task_list, decode_task_list
+from services.task_context import build_task_context
+from services.token_budget import (
+    count_message_tokens,
+    goals_budget,
+    break_down_budget,
+    repo_info_budget,
+    rewrite_budget,
+    token_usage
 )
-from openai import AzureOpenAI
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# max_tokens for calls without a sized budget
+DEFAULT_MAX_TOKENS = 4000
+
+# Batch breakdowns: most concurrent model calls per request, and seconds allowed per model attempt
+BREAKDOWN_CONCURRENCY = int(os.getenv('LLM_BREAKDOWN_CONCURRENCY', '10'))
+BREAKDOWN_TIMEOUT = float(os.getenv('LLM_BREAKDOWN_TIMEOUT', '60'))
 
 class AzureService:
-    def __init__(self):
+    def __init__(self, llm_cache=None, gateway=None):
         # Text Analytics credentials
         key = os.getenv('AZURE_KEY', 'YOUR_AZURE_KEY')
         endpoint = os.getenv('AZURE_ENDPOINT', 'YOUR_AZURE_ENDPOINT')
@@ -35,11 +51,10 @@ class AzureService:
         # Load environment variables
         load_dotenv()
         
-        # Initialize Azure OpenAI configuration
-        self.openai_key = os.getenv("AZURE_OPENAI_KEY")
-        self.openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        # Azure OpenAI calls go through the shared deployment pool; the
+        # deployment name identifies the model in cache keys
+        self.gateway = gateway if gateway is not None else llm_gateway
         self.openai_deployment = os.getenv("DEPLOYMENT_NAME", "gpt-4o")
-        self.openai_api_version = os.getenv("OPENAI_API_VERSION", "2024-02-15-preview")
         
         # Initialize Azure Speech config
         self.speech_key = os.getenv("AZURE_SPEECH_KEY")
@@ -48,13 +63,13 @@ class AzureService:
             subscription=self.speech_key,
             region=self.speech_region
         )
+        self.speech_transcriber = ContinuousTranscriber(self.speech_config)
         
-        # Initialize Azure OpenAI config
-        self.openai_client = AzureOpenAI(
-            api_key=self.openai_key,
-            api_version="2024-02-15-preview",
-            azure_endpoint=self.openai_endpoint
-        )
+        # Completion cache for the planning calls (goals, breakdowns, repo info)
+        self.llm_cache = llm_cache if llm_cache is not None else LLMResponseCache()
+        
+        # Merges identical completion requests that are in flight at the same time
+        self.single_flight = SingleFlight('llm')
     
     def _create_text_client(self, key, endpoint):
         """Create an Azure Text Analytics client."""
@@ -66,64 +81,166 @@ class AzureService:
             # Return None to allow the application to run with mock data
             return None
     
-    def _call_openai_api(self, prompt: str = None, max_tokens: int = 4000, temperature: float = 0.5, default_response=None, system_prompt: str = None, user_prompt: str = None, deployment_name: str = None) -> Dict[str, Any]:
-        """Call the OpenAI API using Azure endpoint."""
+    def _build_messages(self, prompt: str = None, system_prompt: str = None, user_prompt: str = None) -> List[Dict[str, str]]:
+        """Build the chat messages for an OpenAI call."""
+        messages = []
+        
+        # Add system prompt
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        else:
+            messages.append({"role": "system", "content": SYSTEM_PROMPT})
+        
+        # Add user prompt
+        if user_prompt:
+            messages.append({"role": "user", "content": user_prompt})
+        elif prompt:
+            messages.append({"role": "user", "content": prompt})
+        else:
+            raise Exception("No prompt provided to OpenAI API call")
+        
+        return messages
+    
+    def _parse_completion(self, content: str) -> Dict[str, Any]:
+        """Parse the JSON content of a completion, tolerating code fences and surrounding prose."""
+        parsed = extract_json(content)
+        if parsed is None:
+            print("JSON Parse Error: no JSON document in completion")
+            print(f"Raw content: {(content or '')[:500]}")
+            # If JSON parsing fails, return the raw content
+            return {"content": content}
+        return parsed
+    
+    def _check_openai_config(self):
+        if not self.gateway.has_pool('text'):
+            print("Azure OpenAI credentials not properly configured")
+            raise Exception("Azure OpenAI credentials not properly configured. Please set AZURE_OPENAI_KEY and AZURE_OPENAI_ENDPOINT (or AZURE_OPENAI_DEPLOYMENTS) environment variables.")
+    
+    def _request_key(self, messages, model_name, temperature, max_tokens):
+        """Identify a completion request, for the response cache and request coalescing."""
+        return self.llm_cache.make_key(model_name, messages[0]['content'], messages[1]['content'], temperature, max_tokens)
+    
+    def _cache_lookup(self, messages, model_name, temperature, max_tokens):
+        """Return (cache key, cached result or None) for a completion request."""
+        key = self._request_key(messages, model_name, temperature, max_tokens)
+        return key, self.llm_cache.get(key)
+    
+    def _cache_store(self, key, result):
+        # Unparseable completions come back as {"content": raw}; don't pin those
+        if isinstance(result, dict) and set(result) != {'content'}:
+            self.llm_cache.set(key, result)
+    
+    def _create_completion(self, messages, max_tokens, temperature, usage_kind, timeout=None):
+        """
+        Request a JSON completion and record its token usage.
+        
+        A completion cut off by a budget below DEFAULT_MAX_TOKENS is retried
+        once with DEFAULT_MAX_TOKENS, so a low estimate costs a retry rather
+        than a truncated answer.
+        """
+        estimated_prompt = count_message_tokens(messages)
+        while True:
+            response = self.gateway.create(
+                'text',
+                timeout=timeout,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                response_format={"type": "json_object"}
+            )
+            token_usage.record(usage_kind, estimated_prompt, max_tokens, response)
+            if response.choices[0].finish_reason != 'length' or max_tokens >= DEFAULT_MAX_TOKENS:
+                return response
+            print(f"Completion for {usage_kind} hit its {max_tokens}-token budget; retrying with {DEFAULT_MAX_TOKENS}")
+            max_tokens = DEFAULT_MAX_TOKENS
+    
+    async def _acreate_completion(self, messages, max_tokens, temperature, usage_kind):
+        """Async variant of _create_completion."""
+        estimated_prompt = count_message_tokens(messages)
+        while True:
+            response = await self.gateway.acreate(
+                'text',
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                response_format={"type": "json_object"}
+            )
+            token_usage.record(usage_kind, estimated_prompt, max_tokens, response)
+            if response.choices[0].finish_reason != 'length' or max_tokens >= DEFAULT_MAX_TOKENS:
+                return response
+            print(f"Completion for {usage_kind} hit its {max_tokens}-token budget; retrying with {DEFAULT_MAX_TOKENS}")
+            max_tokens = DEFAULT_MAX_TOKENS
+    
+    def _call_openai_api(self, prompt: str = None, max_tokens: int = DEFAULT_MAX_TOKENS, temperature: float = 0.5, default_response=None, system_prompt: str = None, user_prompt: str = None, cache: bool = False, timeout: float = None, usage_kind: str = 'completion') -> Dict[str, Any]:
+        """
+        Call the OpenAI API using Azure endpoint.
+        
+        Identical requests made while one is in flight wait for it and share its
+        result. With cache=True, identical requests are answered from the LLM
+        response cache.
+        With a timeout, each attempt is abandoned after that many seconds instead of
+        waiting for the client's default timeout. Token usage is recorded under
+        usage_kind.
+        """
         try:
-            if not self.openai_key or not self.openai_endpoint:
-                print("Azure OpenAI credentials not properly configured")
-                raise Exception("Azure OpenAI credentials not properly configured. Please set AZURE_OPENAI_KEY and AZURE_OPENAI_ENDPOINT environment variables.")
+            self._check_openai_config()
             
             # Use the OpenAI client instead of direct API calls
             try:
-                messages = []
+                messages = self._build_messages(prompt, system_prompt, user_prompt)
+                key = self._request_key(messages, self.openai_deployment, temperature, max_tokens)
                 
-                # Add system prompt
-                if system_prompt:
-                    messages.append({"role": "system", "content": system_prompt})
-                else:
-                    messages.append({"role": "system", "content": SYSTEM_PROMPT})
+                def complete():
+                    if cache:
+                        cached = self.llm_cache.get(key)
+                        if cached is not None:
+                            return cached
+                    
+                    response = self._create_completion(messages, max_tokens, temperature, usage_kind, timeout)
+                    
+                    # Extract the content from the response
+                    result = self._parse_completion(response.choices[0].message.content)
+                    if cache:
+                        self._cache_store(key, result)
+                    return result
                 
-                # Add user prompt
-                if user_prompt:
-                    messages.append({"role": "user", "content": user_prompt})
-                elif prompt:
-                    messages.append({"role": "user", "content": prompt})
-                else:
-                    raise Exception("No prompt provided to OpenAI API call")
+                # Identical requests already in flight share that call, ahead of the cache
+                return self.single_flight.do(key, complete)
                 
-                # Use specified deployment name or default
-                model_name = deployment_name if deployment_name else self.openai_deployment
+            except Exception as api_error:
+                print(f"API Call Error: {str(api_error)}")
+                raise Exception(f"Azure OpenAI API error: {str(api_error)}")
                 
-                response = self.openai_client.chat.completions.create(
-                    model=model_name,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    response_format={"type": "json_object"}
-                )
+        except Exception as e:
+            print(f"Error calling Azure OpenAI API: {str(e)}")
+            if default_response:
+                return default_response
+            raise
+    
+    async def _acall_openai_api(self, prompt: str = None, max_tokens: int = DEFAULT_MAX_TOKENS, temperature: float = 0.5, default_response=None, system_prompt: str = None, user_prompt: str = None, cache: bool = False, usage_kind: str = 'completion') -> Dict[str, Any]:
+        """Async variant of _call_openai_api using the gateway's async clients."""
+        try:
+            self._check_openai_config()
+            
+            try:
+                messages = self._build_messages(prompt, system_prompt, user_prompt)
+                key = self._request_key(messages, self.openai_deployment, temperature, max_tokens)
                 
-                # Extract the content from the response
-                content = response.choices[0].message.content
+                async def complete():
+                    if cache:
+                        # SQLite lookups are quick enough to run on the event loop
+                        cached = self.llm_cache.get(key)
+                        if cached is not None:
+                            return cached
+                    
+                    response = await self._acreate_completion(messages, max_tokens, temperature, usage_kind)
+                    
+                    result = self._parse_completion(response.choices[0].message.content)
+                    if cache:
+                        self._cache_store(key, result)
+                    return result
                 
-                try:
-                    # Try to parse the JSON content
-                    content_json = json.loads(content)
-                    return content_json
-                except json.JSONDecodeError as e:
-                    print(f"JSON Parse Error: {str(e)}")
-                    print(f"Raw content: {content}")
-                    # Try to clean the content before parsing
-                    cleaned_content = content.strip()
-                    if cleaned_content.startswith('```json'):
-                        cleaned_content = cleaned_content[7:]
-                    if cleaned_content.endswith('```'):
-                        cleaned_content = cleaned_content[:-3]
-                    cleaned_content = cleaned_content.strip()
-                    try:
-                        return json.loads(cleaned_content)
-                    except:
-                        # If JSON parsing fails, return the raw content
-                        return {"content": content}
+                return await self.single_flight.ado(key, complete)
                 
             except Exception as api_error:
                 print(f"API Call Error: {str(api_error)}")
@@ -224,58 +341,142 @@ class AzureService:
             dict: Dictionary containing both big goals and their sub-tasks
         """
         try:
-            prompt = GENERATE_GOALS_PROMPT.format(text=text)
-            response = self._call_openai_api(prompt)
-            
-            # Validate response structure
-            if not isinstance(response, dict):
-                raise ValueError(f"Expected dictionary response, got {type(response)}")
-            
-            # Extract goals array
-            goals = response.get("goals", [])
-            if not isinstance(goals, list):
-                raise ValueError(f"Expected goals to be a list, got {type(goals)}")
-            
-            # Validate and process each goal
-            processed_goals = []
-            for goal in goals:
-                if not isinstance(goal, dict):
-                    print(f"Skipping invalid goal: {goal}")
-                    continue
-                
-                # Ensure required fields exist
-                if "title" not in goal:
-                    print(f"Skipping goal without title: {goal}")
-                    continue
-                
-                # Process sub-tasks if they exist
-                sub_tasks = []
-                if "sub_tasks" in goal and isinstance(goal["sub_tasks"], list):
-                    for task in goal["sub_tasks"]:
-                        if isinstance(task, dict) and "title" in task:
-                            sub_tasks.append({
-                                "id": task.get("id", len(sub_tasks) + 1),
-                                "title": task["title"],
-                                "description": task.get("description", "")
-                            })
-                
-                # Add processed goal
-                processed_goals.append({
-                    "id": goal.get("id", len(processed_goals) + 1),
-                    "title": goal["title"],
-                    "description": goal.get("description", ""),
-                    "sub_tasks": sub_tasks
-                })
-            
-            if not processed_goals:
-                raise ValueError("No valid goals found in response")
-            
-            return {"goals": processed_goals}
+            system_prompt, user_prompt = GENERATE_GOALS_TEMPLATE.render(text=text)
+            response = self._call_openai_api(system_prompt=system_prompt, user_prompt=user_prompt, max_tokens=goals_budget(), cache=True, usage_kind='goals')
+            return self._process_goals(response)
         
         except Exception as e:
             print(f"Error generating goals: {str(e)}")
             raise Exception(f"Failed to generate goals: {str(e)}")
     
+    async def agenerate_goals(self, text: str) -> List[Dict[str, Any]]:
+        """Async variant of generate_goals."""
+        try:
+            system_prompt, user_prompt = GENERATE_GOALS_TEMPLATE.render(text=text)
+            response = await self._acall_openai_api(system_prompt=system_prompt, user_prompt=user_prompt, max_tokens=goals_budget(), cache=True, usage_kind='goals')
+            return self._process_goals(response)
+        
+        except Exception as e:
+            print(f"Error generating goals: {str(e)}")
+            raise Exception(f"Failed to generate goals: {str(e)}")
+    
+    def _process_goals(self, response) -> Dict[str, Any]:
+        """Validate the goals returned by the model and normalize their fields."""
+        # Validate response structure
+        if not isinstance(response, dict):
+            raise ValueError(f"Expected dictionary response, got {type(response)}")
+        
+        # Extract goals array
+        goals = response.get("goals", [])
+        if not isinstance(goals, list):
+            raise ValueError(f"Expected goals to be a list, got {type(goals)}")
+        
+        # Validate and process each goal
+        processed_goals = []
+        for goal in goals:
+            processed = self._process_goal(goal, len(processed_goals) + 1)
+            if processed:
+                processed_goals.append(processed)
+        
+        if not processed_goals:
+            raise ValueError("No valid goals found in response")
+        
+        return {"goals": processed_goals}
+    
+    def _process_goal(self, goal, default_id):
+        """
+        Validate one goal returned by the model and normalize its fields.
+        
+        Args:
+            goal: One element of the model's "goals" array
+            default_id (int): ID to use when the model left it out
+            
+        Returns:
+            dict or None: The normalized goal, or None if it is invalid
+        """
+        if not isinstance(goal, dict):
+            print(f"Skipping invalid goal: {goal}")
+            return None
+        
+        # Ensure required fields exist
+        if "title" not in goal:
+            print(f"Skipping goal without title: {goal}")
+            return None
+        
+        # Process sub-tasks if they exist
+        sub_tasks = []
+        if "sub_tasks" in goal and isinstance(goal["sub_tasks"], list):
+            for task in goal["sub_tasks"]:
+                if isinstance(task, dict) and "title" in task:
+                    sub_tasks.append({
+                        "id": task.get("id", len(sub_tasks) + 1),
+                        "title": task["title"],
+                        "description": task.get("description", "")
+                    })
+        
+        return {
+            "id": goal.get("id", default_id),
+            "title": goal["title"],
+            "description": goal.get("description", ""),
+            "sub_tasks": sub_tasks
+        }
+    
+    def stream_goals(self, text: str):
+        """
+        Generate goals like generate_goals, yielding each one as soon as the model finishes it.
+        
+        The completion is streamed and fed through an incremental JSON
+        parser, so the first goal is available long before the whole
+        document. Each goal gets the same validation as in generate_goals.
+        
+        Args:
+            text (str): Project description
+            
+        Yields:
+            dict: Normalized goals with their sub_tasks, in order
+        """
+        self._check_openai_config()
+        system_prompt, user_prompt = GENERATE_GOALS_TEMPLATE.render(text=text)
+        messages = self._build_messages(system_prompt=system_prompt, user_prompt=user_prompt)
+        max_tokens, temperature = goals_budget(), 0.5
+        
+        # Share cache entries with generate_goals
+        cache_key, cached = self._cache_lookup(messages, self.openai_deployment, temperature, max_tokens)
+        if cached is not None:
+            yield from self._process_goals(cached)["goals"]
+            return
+        
+        try:
+            stream = self.gateway.create(
+                'text',
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                response_format={"type": "json_object"},
+                stream=True
+            )
+        except Exception as api_error:
+            print(f"API Call Error: {str(api_error)}")
+            raise Exception(f"Azure OpenAI API error: {str(api_error)}")
+        
+        parser = JSONArrayStreamParser("goals")
+        count = 0
+        for chunk in stream:
+            # Azure sends prompt filter results in a chunk without choices
+            if not chunk.choices:
+                continue
+            for goal in parser.feed(chunk.choices[0].delta.content):
+                processed = self._process_goal(goal, count + 1)
+                if processed:
+                    count += 1
+                    yield processed
+        
+        # Streamed responses carry no usage, so only the reservation is recorded
+        token_usage.record('goals_stream', count_message_tokens(messages), max_tokens, None)
+        if not count:
+            raise ValueError("No valid goals found in response")
+        self._cache_store(cache_key, self._parse_completion(parser.text))
+    
     def _get_mock_goals(self):
         """Return mock goals if API fails"""
         return [
@@ -284,7 +485,7 @@ class AzureService:
             {"id": 3, "title": "Design user interface", "description": "Create responsive and intuitive UI for the application"}
         ]
     
-    def break_down_goal(self, goal_id, goal_title, goal_description):
+    def break_down_goal(self, goal_id, goal_title, goal_description, timeout=None):
         """
         Break down a big goal into smaller, more specific goals.
         
@@ -292,45 +493,99 @@ class AzureService:
             goal_id (int): The ID of the goal being broken down
             goal_title (str): The title of the goal to break down
             goal_description (str): The description of the goal
+            timeout (float, optional): Seconds to wait for each model attempt
             
         Returns:
             list: List of smaller goals
         """
-        goal_id_start = goal_id * 100 + 1
-        goal_id_start_plus_one = goal_id_start + 1
-        
-        prompt = BREAK_DOWN_GOAL_PROMPT.format(
-            goal_title=goal_title,
-            goal_description=goal_description,
-            goal_id_start=goal_id_start,
-            goal_id_start_plus_one=goal_id_start_plus_one
-        )
+        system_prompt, user_prompt = self._build_break_down_prompt(goal_id, goal_title, goal_description)
         
         try:
-            response = self._call_openai_api(prompt)
+            response = self._call_openai_api(system_prompt=system_prompt, user_prompt=user_prompt, max_tokens=break_down_budget(), cache=True, timeout=timeout, usage_kind='break_down')
             print(f"Response from break_down_goal API: {response}")
+            return self._extract_smaller_goals(response)
+        except Exception as e:
+            print(f"Error in break_down_goal: {str(e)}")
+            raise
+    
+    def break_down_goals(self, goals, max_workers=None, timeout=None):
+        """
+        Break down several big goals concurrently.
+        
+        Each goal is an independent break_down_goal call with its own ID, so
+        every result keeps that goal's goal_id * 100 + 1 numbering.
+        
+        Args:
+            goals (list): (goal_id, goal_title, goal_description) tuples
+            max_workers (int, optional): Concurrent model calls, at most BREAKDOWN_CONCURRENCY
+            timeout (float, optional): Seconds allowed per model attempt, at most
+                                       BREAKDOWN_TIMEOUT (the default)
             
-            # Check if response is already a list of goals
-            if isinstance(response, list) and len(response) > 0 and "title" in response[0]:
-                return response
-            
-            # If response is in a nested format like {"smaller_goals": [...]}
-            if isinstance(response, dict):
-                # Check for various possible keys the API might use
-                for key in ["smaller_goals", "goals", "specificGoals"]:
-                    if key in response and isinstance(response[key], list):
-                        return response[key]
-                
-                # Check if the response itself is a single goal object
-                if all(key in response for key in ["id", "title", "description"]):
-                    # Wrap the single goal in a list
-                    return [response]
-                
-            raise Exception(f"Unexpected response format: {response}")
+        Yields:
+            tuple: (goal_id, smaller_goals, error) in completion order; exactly one
+                   of smaller_goals and error is None
+        """
+        if not goals:
+            return
+        workers = max(1, min(int(max_workers or BREAKDOWN_CONCURRENCY), BREAKDOWN_CONCURRENCY, len(goals)))
+        timeout = min(float(timeout), BREAKDOWN_TIMEOUT) if timeout else BREAKDOWN_TIMEOUT
+        
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                executor.submit(self.break_down_goal, goal_id, goal_title, goal_description, timeout): goal_id
+                for goal_id, goal_title, goal_description in goals
+            }
+            for future in as_completed(futures):
+                goal_id = futures[future]
+                try:
+                    yield goal_id, future.result(), None
+                except Exception as e:
+                    yield goal_id, None, str(e)
+        finally:
+            # Drop queued goals if the consumer stops early (e.g. client disconnect)
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def abreak_down_goal(self, goal_id, goal_title, goal_description):
+        """Async variant of break_down_goal."""
+        system_prompt, user_prompt = self._build_break_down_prompt(goal_id, goal_title, goal_description)
+        
+        try:
+            response = await self._acall_openai_api(system_prompt=system_prompt, user_prompt=user_prompt, max_tokens=break_down_budget(), cache=True, usage_kind='break_down')
+            print(f"Response from break_down_goal API: {response}")
+            return self._extract_smaller_goals(response)
         except Exception as e:
             print(f"Error in break_down_goal: {str(e)}")
             raise
     
+    def _build_break_down_prompt(self, goal_id, goal_title, goal_description):
+        """Return the (system, user) prompts for breaking down one goal."""
+        return BREAK_DOWN_GOAL_TEMPLATE.render(
+            goal_title=goal_title,
+            goal_description=goal_description,
+            goal_id_start=goal_id * 100 + 1
+        )
+    
+    def _extract_smaller_goals(self, response):
+        """Find the list of smaller goals in the model response."""
+        # Check if response is already a list of goals
+        if isinstance(response, list) and len(response) > 0 and "title" in response[0]:
+            return response
+        
+        # If response is in a nested format like {"smaller_goals": [...]}
+        if isinstance(response, dict):
+            # Check for various possible keys the API might use
+            for key in ["smaller_goals", "goals", "specificGoals"]:
+                if key in response and isinstance(response[key], list):
+                    return response[key]
+            
+            # Check if the response itself is a single goal object
+            if all(key in response for key in ["id", "title", "description"]):
+                # Wrap the single goal in a list
+                return [response]
+            
+        raise Exception(f"Unexpected response format: {response}")
+    
     def generate_repo_info(self, prompt, goals):
         """
         Generate repository name and description based on prompt and goals.
@@ -342,50 +597,69 @@ class AzureService:
         Returns:
             dict: Repository information with name and description
         """
-        if not prompt and not goals:
-            raise Exception("Missing prompt and goals for repo info generation")
-            
-        print(f"Generating repository info with prompt: {prompt[:100]}... and goals: {goals[:100]}...")
-        
-        api_prompt = GENERATE_REPO_INFO_PROMPT.format(prompt=prompt, goals=goals)
+        system_prompt, user_prompt = self._build_repo_info_prompt(prompt, goals)
         
         try:
-            response = self._call_openai_api(api_prompt)
+            response = self._call_openai_api(system_prompt=system_prompt, user_prompt=user_prompt, max_tokens=repo_info_budget(), cache=True, usage_kind='repo_info')
             print(f"Raw LLM response for repo info: {response}")
-            
-            # Try to extract and parse the JSON
-            if isinstance(response, dict) and "repo_name" in response and "description" in response:
-                return response
-            elif isinstance(response, str):
-                # Try to extract JSON from the string
-                import re
-                import json
-                
-                # Look for JSON pattern in the response
-                json_match = re.search(r'({.*})', response.replace('\n', ' '), re.DOTALL)
-                if json_match:
-                    try:
-                        json_str = json_match.group(1)
-                        repo_info = json.loads(json_str)
-                        
-                        if "repo_name" in repo_info and "description" in repo_info:
-                            return repo_info
-                        elif "name" in repo_info and "description" in repo_info:
-                            # Fix property name to match expected format
-                            repo_info["repo_name"] = repo_info["name"]
-                            del repo_info["name"]
-                            return repo_info
-                        else:
-                            print(f"Response missing required fields: {repo_info}")
-                    except json.JSONDecodeError:
-                        print(f"Failed to parse JSON from: {json_str}")
-            
-            # Use fallback method if API fails to return correct format
+            return self._extract_repo_info(response, prompt, goals)
+        except Exception as e:
+            print(f"Error generating repository info: {str(e)}")
+            # Use fallback method if API fails
             return self._generate_fallback_repo_info(prompt, goals)
+    
+    async def agenerate_repo_info(self, prompt, goals):
+        """Async variant of generate_repo_info."""
+        system_prompt, user_prompt = self._build_repo_info_prompt(prompt, goals)
+        
+        try:
+            response = await self._acall_openai_api(system_prompt=system_prompt, user_prompt=user_prompt, max_tokens=repo_info_budget(), cache=True, usage_kind='repo_info')
+            print(f"Raw LLM response for repo info: {response}")
+            return self._extract_repo_info(response, prompt, goals)
         except Exception as e:
             print(f"Error generating repository info: {str(e)}")
             # Use fallback method if API fails
             return self._generate_fallback_repo_info(prompt, goals)
+    
+    def _build_repo_info_prompt(self, prompt, goals):
+        if not prompt and not goals:
+            raise Exception("Missing prompt and goals for repo info generation")
+            
+        print(f"Generating repository info with prompt: {prompt[:100]}... and goals: {goals[:100]}...")
+        
+        return GENERATE_REPO_INFO_TEMPLATE.render(prompt=prompt, goals=goals)
+    
+    def _extract_repo_info(self, response, prompt, goals):
+        """Pull the repository name and description out of the model response."""
+        # Try to extract and parse the JSON
+        if isinstance(response, dict) and "repo_name" in response and "description" in response:
+            return response
+        elif isinstance(response, str):
+            # Try to extract JSON from the string
+            import re
+            import json
+            
+            # Look for JSON pattern in the response
+            json_match = re.search(r'({.*})', response.replace('\n', ' '), re.DOTALL)
+            if json_match:
+                try:
+                    json_str = json_match.group(1)
+                    repo_info = json.loads(json_str)
+                    
+                    if "repo_name" in repo_info and "description" in repo_info:
+                        return repo_info
+                    elif "name" in repo_info and "description" in repo_info:
+                        # Fix property name to match expected format
+                        repo_info["repo_name"] = repo_info["name"]
+                        del repo_info["name"]
+                        return repo_info
+                    else:
+                        print(f"Response missing required fields: {repo_info}")
+                except json.JSONDecodeError:
+                    print(f"Failed to parse JSON from: {json_str}")
+        
+        # Use fallback method if API fails to return correct format
+        return self._generate_fallback_repo_info(prompt, goals)
         
     def _generate_fallback_repo_info(self, prompt, goals):
         """Generate fallback repository info when the API fails."""
@@ -438,61 +712,42 @@ class AzureService:
         """
         Transcribe audio file to text using Azure Speech Services.
         """
+        return self.transcribe_audio_with_segments(audio_file)[0]
+
+    def transcribe_audio_with_segments(self, audio_file):
+        """
+        Transcribe a whole recording with continuous recognition.
+        
+        Args:
+            audio_file: The uploaded recording
+            
+        Returns:
+            tuple: (text, segments) where segments are {"text", "offset", "duration"}
+                   with times in seconds; on failure text is a user-facing message
+                   and segments is empty
+        """
         try:
-            # Save the file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
-                audio_file.save(temp_audio.name)
-                
-                try:
-                    # Convert to proper WAV format using pydub
-                    audio = AudioSegment.from_file(temp_audio.name)
-                    
-                    # Export as proper WAV file with correct parameters
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as proper_wav:
-                        audio.export(proper_wav.name, format='wav', 
-                                   parameters=[
-                                       "-acodec", "pcm_s16le",  # 16-bit PCM
-                                       "-ac", "1",              # mono
-                                       "-ar", "16000"           # 16kHz sample rate
-                                   ])
-                        
-                        # Configure audio input
-                        audio_config = AudioConfig(filename=proper_wav.name)
-                        speech_recognizer = SpeechRecognizer(
-                            speech_config=self.speech_config,
-                            audio_config=audio_config
-                        )
-                        
-                        # Perform transcription
-                        result = speech_recognizer.recognize_once_async().get()
-                        
-                        # Clean up temporary files
-                        os.unlink(proper_wav.name)
-                        os.unlink(temp_audio.name)
-                        
-                        # Check the result and return the transcribed text
-                        if result.reason == ResultReason.RecognizedSpeech:
-                            return result.text
-                        elif result.reason == ResultReason.NoMatch:
-                            error_details = CancellationDetails.from_result(result)
-                            if error_details.reason == CancellationReason.Error:
-                                return f"Speech recognition error: {error_details.error_details}"
-                            else:
-                                return "Could not recognize any speech in the audio"
-                        elif result.reason == ResultReason.Canceled:
-                            error_details = CancellationDetails.from_result(result)
-                            return f"Speech recognition canceled: {error_details.reason}"
-                        
-                except Exception as e:
-                    # Clean up temporary files in case of error
-                    if os.path.exists(temp_audio.name):
-                        os.unlink(temp_audio.name)
-                    print(f"Error in speech recognition: {str(e)}")
-                    return "There was an error processing your speech. Please try again."
-                
+            # Decode and resample the upload in the audio process pool
+            pcm = wav_pcm(audio_pool.normalize_upload(audio_file))
+        except AudioPoolBusy:
+            # Let the route shed the request with a 503
+            raise
         except Exception as e:
             print(f"Error transcribing audio: {str(e)}")
-            return "Failed to process audio. Please try again."
+            return "Failed to process audio. Please try again.", []
+        
+        try:
+            segments = self.speech_transcriber.transcribe(pcm)
+        except SpeechRecognitionError as e:
+            print(f"Speech recognition error: {str(e)}")
+            return f"Speech recognition error: {str(e)}", []
+        except Exception as e:
+            print(f"Error in speech recognition: {str(e)}")
+            return "There was an error processing your speech. Please try again.", []
+        
+        if not segments:
+            return "Could not recognize any speech in the audio", []
+        return " ".join(segment['text'] for segment in segments), segments
 
     def process_voice_chat(self, transcription, task_id, conversation):
         """
@@ -507,21 +762,18 @@ class AzureService:
             dict: Response containing message and updated task information
         """
         try:
-            # Prepare the prompt for the OpenAI API
-            system_prompt = "You are an AI assistant helping to update task information based on voice input. " \
-                          "You have access to a task and its sub-tasks. The user may ask to modify, add, or remove " \
-                          "tasks and sub-tasks. Your responses should be helpful, concise, and focused on the task."
-            
-            # Include the task ID and existing conversation
-            user_prompt = f"I'm currently looking at task #{task_id}. " \
-                         f"The user said: \"{transcription}\"\n\n" \
-                         f"Here is our conversation so far: {json.dumps(conversation)}"
+            # The conversation so far, then the task ID, then the new input
+            system_prompt, user_prompt = VOICE_CHAT_TEMPLATE.render(
+                conversation=json.dumps(conversation),
+                task_id=task_id,
+                transcription=transcription
+            )
             
             # Make the API call
             response = self._call_openai_api(
                 system_prompt=system_prompt,
                 user_prompt=user_prompt,
-                deployment_name=self.openai_deployment
+                usage_kind='voice_chat'
             )
             
             # Process the response
@@ -535,6 +787,14 @@ class AzureService:
             print(f"Error processing voice chat: {str(e)}")
             raise Exception(f"Failed to process voice chat: {str(e)}")
     
+    def _build_modify_tasks_prompt(self, transcription, task_json, context):
+        """Return the (system, user) prompts for a voice edit of task_json."""
+        if context.pruned:
+            scope = f"Pruned to the tasks relevant to the voice input. New ids start from {context.next_id}."
+        else:
+            scope = "The whole plan is shown."
+        return MODIFY_TASKS_TRANSCRIPT_TEMPLATE.render(tasks=task_json, scope=scope, transcription=transcription)
+    
     def modify_tasks_voice(self, transcription, current_tasks):
         """
         Modify tasks based on voice input using Azure OpenAI.
@@ -552,56 +812,30 @@ class AzureService:
                 print(f"Transcription error: {transcription}")
                 return current_tasks
                 
-            # Prepare the prompt for the OpenAI API
-            system_prompt = "You are an AI assistant helping to update tasks based on voice input. " \
-                           "You have access to the complete list of tasks and sub-tasks. Based on the user's voice input, " \
-                           "you should determine if any changes are needed to any tasks in the list. " \
-                           "Make changes only based on the voice input provided."
-            
-            # Format current tasks for the prompt
-            task_json = json.dumps(current_tasks, indent=2)
-            
-            user_prompt = f"""
-            Below is a set of tasks and sub-tasks for each task. 
-            The user wants to modify the task list using their voice input.
-            Figure out if any changes are needed to any tasks based on the voice input.
-            MAKE ONLY CHANGES BASED ON THE VOICE INPUT: "{transcription}"
-
-            Below is the current JSON:
-            {task_json}
-            
-            Return the modified tasks in the exact same JSON format. If no changes are needed, 
-            return the original tasks unchanged.
-            """
+            # Compact JSON of the plan, or of the tasks the transcription refers to
+            # when the whole plan is over the context budget
+            context = build_task_context(current_tasks, transcription)
+            task_json = context.to_json()
+            system_prompt, user_prompt = self._build_modify_tasks_prompt(transcription, task_json, context)
             
             # Make the API call
             response = self._call_openai_api(
                 system_prompt=system_prompt,
                 user_prompt=user_prompt,
-                max_tokens=4000,
-                deployment_name=self.openai_deployment
+                max_tokens=rewrite_budget(task_json),
+                usage_kind='modify_tasks_voice'
             )
             
-            # Process the response to extract the updated tasks JSON
-            message = response.get("content", "")
-            
-            try:
-                # Try to extract JSON from the message
-                import re
-                json_match = re.search(r'```json\s*([\s\S]*?)\s*```', message)
-                if json_match:
-                    json_str = json_match.group(1).strip()
-                    updated_tasks = json.loads(json_str)
-                else:
-                    # If no JSON code block, try to parse the entire message as JSON
-                    updated_tasks = json.loads(message)
-                
-                return updated_tasks
-            except Exception as json_error:
-                print(f"Error parsing updated tasks JSON: {str(json_error)}")
-                print(f"Original message: {message}")
+            # The completion is already decoded; look for the tasks in it, or in
+            # the raw text when it was not a JSON document
+            updated_tasks = task_list(response)
+            if updated_tasks is None and isinstance(response, dict) and 'content' in response:
+                updated_tasks = decode_task_list(response['content'])
+            if updated_tasks is None:
+                print(f"No task array found in response: {str(response)[:500]}")
                 # If parsing fails, return the original tasks
                 return current_tasks
+            return context.merge(updated_tasks)
             
         except Exception as e:
             print(f"Error modifying tasks with voice: {str(e)}")
@@ -1,11 +1,145 @@
 import os
+import time
+import asyncio
+import hashlib
+import threading
 import requests
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from github import Github, GithubException
+from services.http_transport import get_session, get_async_client, get_pool_stats, REQUEST_TIMEOUT
+from services.rate_limiter import RateLimitScheduler, GitHubRateLimitError
+from services.response_cache import ETagCache, CachedResponse
+from services.single_flight import SingleFlight
 
 # Ensure environment variables are loaded
 load_dotenv()
 
+# Methods that count against GitHub's secondary (content-creation) rate limits
+WRITE_METHODS = frozenset(['POST', 'PATCH', 'PUT', 'DELETE'])
+RATE_LIMIT_RETRIES = int(os.getenv('GITHUB_RATE_LIMIT_RETRIES', '2'))
+
+# Issues, labels and sub-issue links for a repository, one page of issues at a time
+TASK_GRAPH_QUERY = """
+query($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    issues(first: 100, after: $cursor, states: [OPEN, CLOSED], orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      nodes {
+        number
+        title
+        body
+        url
+        state
+        labels(first: 50) {
+          nodes {
+            name
+          }
+        }
+        subIssues(first: 100) {
+          nodes {
+            number
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# Shared by all GitHubService instances, since the limits apply per token
+write_scheduler = RateLimitScheduler()
+
+# Conditional-request cache for GET responses, shared across instances (keys include the token)
+response_cache = ETagCache()
+
+# Default and largest worker count for create_issues_parallel
+ISSUE_WORKERS = int(os.getenv('GITHUB_ISSUE_WORKERS', '8'))
+
+# Process-wide cache of the login behind each token, shared by every
+# GitHubService instance so the /user round trip is paid once per TTL.
+IDENTITY_CACHE_TTL = int(os.getenv('GITHUB_IDENTITY_CACHE_TTL', '300'))
+
+_identity_cache = {}  # token fingerprint -> (login, expires_at)
+_identity_lock = threading.Lock()
+_identity_stats = {
+    'hits': 0,
+    'misses': 0,
+    'invalidations': 0
+}
+
+# Merges identical repository reads in flight at once (several tabs opening one repo)
+github_flights = SingleFlight('github')
+
+
+def _issue_workers(max_workers):
+    """Clamp a requested worker count to 1..ISSUE_WORKERS (ISSUE_WORKERS when unset or not a number)."""
+    try:
+        workers = int(max_workers) if max_workers else ISSUE_WORKERS
+    except (TypeError, ValueError):
+        workers = ISSUE_WORKERS
+    return max(1, min(workers, ISSUE_WORKERS))
+
+
+def _token_key(token):
+    """Fingerprint a token so raw credentials are never used as cache keys."""
+    return hashlib.sha256((token or '').encode('utf-8')).hexdigest()
+
+
+def _group_goals(goals):
+    """
+    Split goals for parallel issue creation.
+    
+    Returns:
+        tuple: (broad goals as (index, goal) pairs, the set of broad goal IDs,
+                specific goals as (index, goal) pairs grouped by parent goal ID)
+    """
+    broad_goals = [(index, goal) for index, goal in enumerate(goals) if goal.get('is_broad_goal', False)]
+    broad_goal_ids = {goal.get('id') for _, goal in broad_goals}
+    
+    children_by_parent = {}
+    for index, goal in enumerate(goals):
+        if goal.get('is_specific_goal', False):
+            children_by_parent.setdefault(goal.get('parent_issue_number'), []).append((index, goal))
+    
+    return broad_goals, broad_goal_ids, children_by_parent
+
+
+def _issue_summary(issue):
+    """Summarize a created issue the way create_issues reports it."""
+    return {
+        "id": issue['number'],
+        "title": issue['title'],
+        "description": issue['body'],
+        "url": issue['html_url']
+    }
+
+
+def _goal_failure(goal, error, issue=None):
+    """Describe a goal whose issue could not be created or linked."""
+    failure = {
+        "goal_id": goal.get('id'),
+        "title": goal.get('title'),
+        "error": error
+    }
+    if issue:
+        failure["issue"] = issue['number']
+    return failure
+
+
+def get_identity_cache_stats():
+    """Return identity cache counters; every hit is a saved GET /user round trip."""
+    with _identity_lock:
+        return {
+            'entries': len(_identity_cache),
+            'ttl_seconds': IDENTITY_CACHE_TTL,
+            'round_trips_saved': _identity_stats['hits'],
+            **_identity_stats
+        }
+
 class GitHubService:
     def __init__(self):
         self.api_base_url = 'https://api.github.com'
@@ -16,6 +150,9 @@ class GitHubService:
         else:
             # Print first 4 chars of token for debugging
             print(f"GitHub token configured: {self.token[:4]}...")
+        
+        # Shared keep-alive session; connections are reused across requests and threads
+        self.session = get_session()
     
     def get_headers(self):
         """Get the standard authorization headers."""
@@ -25,6 +162,60 @@ class GitHubService:
             'Content-Type': 'application/json'
         }
     
+    def _request(self, method, url, is_write=None, **kwargs):
+        """
+        Send a request, revalidating cached GET responses with If-None-Match.
+        
+        A 304 Not Modified (which does not count against the rate limit) is
+        answered from the response cache. Cacheable responses are returned as
+        CachedResponse objects so the body is only parsed once.
+        """
+        if method.upper() != 'GET' or not response_cache.enabled:
+            return self._send(method, url, is_write=is_write, **kwargs)
+        
+        headers = dict(kwargs.pop('headers', None) or {})
+        key = response_cache.make_key(self.token, url, kwargs.get('params'), headers.get('Accept'))
+        entry = response_cache.lookup(key)
+        if entry:
+            headers['If-None-Match'] = entry['etag']
+        
+        response = self._send(method, url, is_write=is_write, headers=headers, **kwargs)
+        
+        if response.status_code == 304 and entry:
+            response_cache.record_not_modified()
+            return CachedResponse(entry, headers=response.headers)
+        
+        etag = response.headers.get('ETag')
+        if response.status_code == 200 and etag:
+            entry = response_cache.store(key, etag, response.json(), response.links, response.headers, len(response.content))
+            return CachedResponse(entry, from_cache=False)
+        
+        return response
+    
+    def _send(self, method, url, is_write=None, **kwargs):
+        """
+        Send a request through the pooled session, paced by the write scheduler.
+        
+        Requests rejected by a GitHub rate limit are retried after the
+        advertised delay, up to GITHUB_RATE_LIMIT_RETRIES times. is_write
+        overrides the method-based guess (GraphQL reads are POSTs).
+        """
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        if is_write is None:
+            is_write = method.upper() in WRITE_METHODS
+        
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            write_scheduler.acquire(write=is_write)
+            response = self.session.request(method, url, **kwargs)
+            retry_after = write_scheduler.observe(response, write=is_write)
+            if retry_after is None:
+                return response
+        
+        raise GitHubRateLimitError(
+            f"GitHub rate limit exceeded for {method} {url}: {response.status_code} - {response.text}",
+            retry_after=retry_after
+        )
+    
     def create_repository(self, name, description=None, is_private=False):
         """
         Create a new GitHub repository.
@@ -49,20 +240,22 @@ class GitHubService:
         
         print(f"Creating repository: {name}")
         
-        response = requests.post(
+        response = self._request(
+            'POST',
             endpoint,
             headers=self.get_headers(),
             json=data
         )
         
         if response.status_code != 201:
+            self._check_unauthorized(response)
             error_msg = f"Failed to create repository: {response.status_code} - {response.text}"
             print(error_msg)
             raise Exception(error_msg)
         
         return response.json()
     
-    def create_issue(self, repo_name, title, body=None, is_broad_goal=False, is_specific_goal=False, parent_issue_number=None):
+    def create_issue(self, repo_name, title, body=None, is_broad_goal=False, is_specific_goal=False, parent_issue_number=None, link_sub_issue=True):
         """
         Create a new issue in the specified repository.
         
@@ -73,56 +266,35 @@ class GitHubService:
             is_broad_goal (bool): Whether this is a high-level task
             is_specific_goal (bool): Whether this is a sub-task
             parent_issue_number (int, optional): The issue number of the parent task
+            link_sub_issue (bool): Whether to link the issue to its parent via the sub-issues API
             
         Returns:
             dict: The created issue data
         """
         username = self._get_username()
         url = f"{self.api_base_url}/repos/{username}/{repo_name}/issues"
-        
-        # Prepare labels
-        labels = []
-        if is_broad_goal:
-            labels.append("broad-goal")
-        if is_specific_goal:
-            labels.append("specific-goal")
-        
-        # Add parent reference to body if provided (for backward compatibility)
-        if parent_issue_number:
-            parent_ref = f"\n\nParent Task: #{parent_issue_number}"
-            body = f"{body or ''}{parent_ref}"
-        
-        data = {
-            "title": title,
-            "body": body or "",
-            "labels": labels
-        }
+        data = self._issue_payload(title, body, is_broad_goal, is_specific_goal, parent_issue_number)
         
         print(f"Creating issue '{title}' in repo {repo_name}")
         print(f"URL: {url}")
         print(f"Data: {data}")
         
-        response = requests.post(
+        response = self._request(
+            'POST',
             url,
             headers=self.get_headers(),
             json=data
         )
         
         if response.status_code != 201:
-            error_message = response.text
-            try:
-                error_json = response.json()
-                if 'message' in error_json:
-                    error_message = error_json['message']
-            except:
-                pass
-            raise Exception(f"Failed to create issue: {error_message}")
+            self._check_unauthorized(response)
+            raise Exception(f"Failed to create issue: {self._error_message(response)}")
         
         created_issue = response.json()
         print(f"Created issue #{created_issue['number']}: {created_issue['title']}")
         
         # If this is a sub-task and parent_issue_number is provided, add it as a sub-issue
-        if parent_issue_number and is_specific_goal:
+        if parent_issue_number and is_specific_goal and link_sub_issue:
             try:
                 print(f"Adding issue #{created_issue['number']} as sub-issue to parent #{parent_issue_number}")
                 # Make sure parent_issue_number and created_issue['number'] are integers
@@ -135,21 +307,106 @@ class GitHubService:
         
         return created_issue
     
+    def _issue_payload(self, title, body, is_broad_goal, is_specific_goal, parent_issue_number):
+        """Build the request body for a new issue."""
+        # Prepare labels
+        labels = []
+        if is_broad_goal:
+            labels.append("broad-goal")
+        if is_specific_goal:
+            labels.append("specific-goal")
+        
+        # Add parent reference to body if provided (for backward compatibility)
+        if parent_issue_number:
+            parent_ref = f"\n\nParent Task: #{parent_issue_number}"
+            body = f"{body or ''}{parent_ref}"
+        
+        return {
+            "title": title,
+            "body": body or "",
+            "labels": labels
+        }
+    
+    def _error_message(self, response):
+        """Get GitHub's error message from a failed response, falling back to the raw body."""
+        error_message = response.text
+        try:
+            error_json = response.json()
+            if 'message' in error_json:
+                error_message = error_json['message']
+        except:
+            pass
+        return error_message
+    
+    def _cached_username(self):
+        """Return the cached login for this token, or None if it must be fetched."""
+        now = time.monotonic()
+        with _identity_lock:
+            cached = _identity_cache.get(_token_key(self.token))
+            if cached and cached[1] > now:
+                _identity_stats['hits'] += 1
+                return cached[0]
+            _identity_stats['misses'] += 1
+            return None
+    
+    def _remember_username(self, login):
+        with _identity_lock:
+            _identity_cache[_token_key(self.token)] = (login, time.monotonic() + IDENTITY_CACHE_TTL)
+    
     def _get_username(self):
-        """Get the authenticated user's username."""
+        """Get the authenticated user's username, served from the identity cache when fresh."""
+        login = self._cached_username()
+        if login:
+            return login
+        
         endpoint = f'{self.api_base_url}/user'
         
-        response = requests.get(
+        response = self._request(
+            'GET',
             endpoint,
             headers=self.get_headers()
         )
         
         if response.status_code != 200:
+            self._check_unauthorized(response)
             error_msg = f"Failed to get user info: {response.status_code} - {response.text}"
             print(error_msg)
             raise Exception(error_msg)
         
-        return response.json()['login']
+        login = response.json()['login']
+        self._remember_username(login)
+        return login
+    
+    def get_username(self):
+        """
+        Get the login of the authenticated user.
+
+        Returns:
+            str: The GitHub login, from the identity cache when fresh
+        """
+        return self._get_username()
+    
+    def _invalidate_identity(self):
+        """Drop the cached login for this token (e.g. after it was revoked or rotated)."""
+        with _identity_lock:
+            if _identity_cache.pop(_token_key(self.token), None) is not None:
+                _identity_stats['invalidations'] += 1
+    
+    def _check_unauthorized(self, response):
+        """Invalidate the cached identity when GitHub rejects the token."""
+        if response.status_code == 401:
+            print("GitHub returned 401, invalidating cached identity")
+            self._invalidate_identity()
+    
+    def get_stats(self):
+        """Get runtime counters for the GitHub integration."""
+        return {
+            'identity_cache': get_identity_cache_stats(),
+            'http_pool': get_pool_stats(),
+            'write_scheduler': write_scheduler.get_stats(),
+            'response_cache': response_cache.get_stats(),
+            'single_flight': github_flights.get_stats()
+        }
     
     def create_issues(self, repo_name, goals):
         """
@@ -219,29 +476,344 @@ class GitHubService:
             print(f"Error creating issues: {str(e)}")
             raise 
 
-    def get_user_repositories(self):
-        """Get list of repositories for the authenticated user."""
-        endpoint = f'{self.api_base_url}/user/repos'
+    def create_issues_parallel(self, repo_name, goals, max_workers=None):
+        """
+        Create GitHub issues from goals concurrently.
         
-        response = requests.get(
-            endpoint,
-            headers=self.get_headers(),
-            params={'sort': 'updated', 'direction': 'desc'}
+        Broad goals are created in parallel. As soon as a broad goal's issue
+        number is known, its specific goals are created and linked as
+        sub-issues, without waiting for the remaining broad goals.
+        
+        Args:
+            repo_name (str): The name of the repository
+            goals (list): List of goal objects with title, description, etc.
+            max_workers (int, optional): Maximum number of concurrent requests, at most ISSUE_WORKERS
+            
+        Returns:
+            dict: 'issues' in the same order create_issues would return them,
+                  and 'failures' with one entry per goal that could not be
+                  created or linked
+        """
+        if not self.token:
+            raise Exception("GitHub token is not configured. Please set GITHUB_TOKEN environment variable.")
+        
+        # Resolve the owner once up front so the workers all hit the identity cache
+        self._get_username()
+        
+        broad_goals, broad_goal_ids, children_by_parent = _group_goals(goals)
+        
+        created = {}  # (phase, goal index) -> created issue summary
+        failures = {}  # goal index -> failure details
+        
+        def record_failure(index, goal, error, issue=None):
+            failures[index] = _goal_failure(goal, error, issue)
+        
+        def create_child(goal, parent_number):
+            issue = self.create_issue(
+                repo_name,
+                goal['title'],
+                goal['description'],
+                is_broad_goal=False,
+                is_specific_goal=True,
+                parent_issue_number=parent_number,
+                link_sub_issue=False
+            )
+            link_error = None
+            if parent_number:
+                try:
+                    self.add_sub_issue(repo_name, int(parent_number), int(issue['number']))
+                except Exception as e:
+                    link_error = f"Created issue #{issue['number']} but failed to link it to parent #{parent_number}: {str(e)}"
+            return issue, link_error
+        
+        workers = _issue_workers(max_workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+            
+            def submit_children(parent_goal_id, parent_number):
+                for index, goal in children_by_parent.pop(parent_goal_id, []):
+                    pending[executor.submit(create_child, goal, parent_number)] = (1, index, goal)
+            
+            for index, goal in broad_goals:
+                future = executor.submit(
+                    self.create_issue,
+                    repo_name,
+                    goal['title'],
+                    goal['description'],
+                    is_broad_goal=True,
+                    is_specific_goal=False
+                )
+                pending[future] = (0, index, goal)
+            
+            # Specific goals without a matching broad goal don't need to wait for anything
+            for parent_goal_id in [key for key in children_by_parent if key not in broad_goal_ids]:
+                submit_children(parent_goal_id, None)
+            
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    phase, index, goal = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Error creating issue for goal {goal.get('id')}: {str(e)}")
+                        record_failure(index, goal, str(e))
+                        if phase == 0:
+                            for child_index, child in children_by_parent.pop(goal.get('id'), []):
+                                record_failure(child_index, child, f"Parent goal {goal.get('id')} could not be created: {str(e)}")
+                        continue
+                    
+                    if phase == 0:
+                        issue = result
+                        submit_children(goal.get('id'), issue['number'])
+                    else:
+                        issue, link_error = result
+                        if link_error:
+                            print(f"Warning: {link_error}")
+                            record_failure(index, goal, link_error, issue)
+                    
+                    created[(phase, index)] = _issue_summary(issue)
+        
+        return {
+            "issues": [created[key] for key in sorted(created)],
+            "failures": [failures[index] for index in sorted(failures)]
+        }
+
+    async def _asend(self, method, url, is_write=None, **kwargs):
+        """Async variant of _send, using the pooled httpx client of the running event loop."""
+        client = get_async_client()
+        if is_write is None:
+            is_write = method.upper() in WRITE_METHODS
+        
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await write_scheduler.aacquire(write=is_write)
+            response = await client.request(method, url, **kwargs)
+            retry_after = write_scheduler.observe(response, write=is_write)
+            if retry_after is None:
+                return response
+        
+        raise GitHubRateLimitError(
+            f"GitHub rate limit exceeded for {method} {url}: {response.status_code} - {response.text}",
+            retry_after=retry_after
         )
+    
+    async def _aget_username(self):
+        """Async variant of _get_username."""
+        login = self._cached_username()
+        if login:
+            return login
+        
+        response = await self._asend('GET', f'{self.api_base_url}/user', headers=self.get_headers())
         
         if response.status_code != 200:
-            error_msg = f"Failed to get repositories: {response.status_code} - {response.text}"
+            self._check_unauthorized(response)
+            error_msg = f"Failed to get user info: {response.status_code} - {response.text}"
             print(error_msg)
             raise Exception(error_msg)
         
-        repos = response.json()
-        return [{
-            'name': repo['name'],
-            'description': repo['description'],
-            'url': repo['html_url'],
-            'updated_at': repo['updated_at']
-        } for repo in repos]
+        login = response.json()['login']
+        self._remember_username(login)
+        return login
+    
+    async def acreate_issue(self, repo_name, title, body=None, is_broad_goal=False, is_specific_goal=False, parent_issue_number=None):
+        """
+        Async variant of create_issue.
+        
+        Unlike create_issue this never links the sub-issue; call aadd_sub_issue for that.
+        """
+        username = await self._aget_username()
+        url = f"{self.api_base_url}/repos/{username}/{repo_name}/issues"
+        data = self._issue_payload(title, body, is_broad_goal, is_specific_goal, parent_issue_number)
+        
+        print(f"Creating issue '{title}' in repo {repo_name}")
+        response = await self._asend('POST', url, headers=self.get_headers(), json=data)
+        
+        if response.status_code != 201:
+            self._check_unauthorized(response)
+            raise Exception(f"Failed to create issue: {self._error_message(response)}")
+        
+        created_issue = response.json()
+        print(f"Created issue #{created_issue['number']}: {created_issue['title']}")
+        return created_issue
+    
+    async def aadd_sub_issue(self, repo_name, parent_issue_number, sub_issue_id):
+        """Async variant of add_sub_issue."""
+        username = await self._aget_username()
+        url = f"{self.api_base_url}/repos/{username}/{repo_name}/issues/{parent_issue_number}/sub_issues"
+        
+        headers = self.get_headers()
+        headers['Accept'] = 'application/vnd.github+json'
+        headers['X-GitHub-Api-Version'] = '2022-11-28'
+        
+        response = await self._asend('POST', url, headers=headers, json={"sub_issue_id": sub_issue_id})
+        
+        if response.status_code != 201:
+            self._check_unauthorized(response)
+            raise Exception(f"Failed to add sub-issue: {self._error_message(response)}")
+        
+        return response.json()
+    
+    async def acreate_issues_parallel(self, repo_name, goals, max_workers=None):
+        """
+        Async variant of create_issues_parallel.
+        
+        Concurrency is bounded by a semaphore instead of a thread pool, so a
+        bulk run does not hold any worker threads while waiting on GitHub.
+        """
+        if not self.token:
+            raise Exception("GitHub token is not configured. Please set GITHUB_TOKEN environment variable.")
+        
+        await self._aget_username()
+        
+        broad_goals, broad_goal_ids, children_by_parent = _group_goals(goals)
+        semaphore = asyncio.Semaphore(_issue_workers(max_workers))
+        created = {}
+        failures = {}
+        
+        async def create_child(index, goal, parent_number):
+            try:
+                async with semaphore:
+                    issue = await self.acreate_issue(
+                        repo_name,
+                        goal['title'],
+                        goal['description'],
+                        is_specific_goal=True,
+                        parent_issue_number=parent_number
+                    )
+            except Exception as e:
+                print(f"Error creating issue for goal {goal.get('id')}: {str(e)}")
+                failures[index] = _goal_failure(goal, str(e))
+                return
+            
+            created[(1, index)] = _issue_summary(issue)
+            if parent_number:
+                try:
+                    async with semaphore:
+                        await self.aadd_sub_issue(repo_name, int(parent_number), int(issue['number']))
+                except Exception as e:
+                    link_error = f"Created issue #{issue['number']} but failed to link it to parent #{parent_number}: {str(e)}"
+                    print(f"Warning: {link_error}")
+                    failures[index] = _goal_failure(goal, link_error, issue)
+        
+        async def create_parent(index, goal):
+            try:
+                async with semaphore:
+                    issue = await self.acreate_issue(repo_name, goal['title'], goal['description'], is_broad_goal=True)
+            except Exception as e:
+                print(f"Error creating issue for goal {goal.get('id')}: {str(e)}")
+                failures[index] = _goal_failure(goal, str(e))
+                for child_index, child in children_by_parent.pop(goal.get('id'), []):
+                    failures[child_index] = _goal_failure(child, f"Parent goal {goal.get('id')} could not be created: {str(e)}")
+                return
+            
+            created[(0, index)] = _issue_summary(issue)
+            children = children_by_parent.pop(goal.get('id'), [])
+            await asyncio.gather(*(create_child(child_index, child, issue['number']) for child_index, child in children))
+        
+        # Specific goals without a matching broad goal don't need to wait for anything
+        orphans = []
+        for parent_goal_id in [key for key in children_by_parent if key not in broad_goal_ids]:
+            orphans.extend(children_by_parent.pop(parent_goal_id))
+        
+        await asyncio.gather(
+            *(create_parent(index, goal) for index, goal in broad_goals),
+            *(create_child(index, goal, None) for index, goal in orphans)
+        )
+        
+        return {
+            "issues": [created[key] for key in sorted(created)],
+            "failures": [failures[index] for index in sorted(failures)]
+        }
 
+    def _paginate(self, url, params=None, headers=None, error_label='items'):
+        """
+        Iterate over every item of a paginated REST listing.
+        
+        Follows the Link rel="next" header. The next page is requested on a
+        background thread while the caller is still consuming the current one.
+        
+        Args:
+            url (str): The first page URL
+            params (dict, optional): Query parameters for the first page
+            headers (dict, optional): Request headers (defaults to get_headers())
+            error_label (str): Used in the error message when a page fails
+            
+        Yields:
+            dict: Each item of each page, in order
+        """
+        headers = headers or self.get_headers()
+        
+        def fetch(page_url, page_params):
+            response = self._request(
+                'GET',
+                page_url,
+                headers=headers,
+                params=page_params
+            )
+            
+            if response.status_code != 200:
+                self._check_unauthorized(response)
+                error_msg = f"Failed to get {error_label}: {response.status_code} - {response.text}"
+                print(error_msg)
+                raise Exception(error_msg)
+            
+            return response
+        
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            future = prefetcher.submit(fetch, url, params)
+            while future is not None:
+                response = future.result()
+                # The next link already carries the query string of the first request
+                next_url = response.links.get('next', {}).get('url')
+                future = prefetcher.submit(fetch, next_url, None) if next_url else None
+                for item in response.json():
+                    yield item
+    
+    def iter_user_repositories(self):
+        """Iterate over all repositories of the authenticated user, most recently updated first."""
+        endpoint = f'{self.api_base_url}/user/repos'
+        params = {'sort': 'updated', 'direction': 'desc', 'per_page': 100}
+        
+        for repo in self._paginate(endpoint, params=params, error_label='repositories'):
+            yield {
+                'name': repo['name'],
+                'description': repo['description'],
+                'url': repo['html_url'],
+                'updated_at': repo['updated_at']
+            }
+    
+    def get_user_repositories(self):
+        """Get list of repositories for the authenticated user."""
+        return list(self.iter_user_repositories())
+    
+    def iter_repository_issues(self, repo_name, state='all'):
+        """
+        Iterate over all issues of a repository, one page at a time.
+        
+        Args:
+            repo_name (str): The name of the repository
+            state (str): State of issues to fetch ('open', 'closed', or 'all')
+            
+        Yields:
+            dict: Each issue with its details
+        """
+        username = self._get_username()
+        endpoint = f'{self.api_base_url}/repos/{username}/{repo_name}/issues'
+        params = {'state': state, 'per_page': 100}
+        
+        for issue in self._paginate(endpoint, params=params, error_label='issues'):
+            labels = [label['name'] for label in issue['labels']]
+            yield {
+                'id': issue['number'],
+                'title': issue['title'],
+                'description': issue['body'],
+                'url': issue['html_url'],
+                'state': issue['state'],
+                'labels': labels,
+                'is_broad_goal': 'broad-goal' in labels,
+                'is_specific_goal': 'specific-goal' in labels
+            }
+    
     def get_repository_issues(self, repo_name, state='all'):
         """
         Get all issues for a repository.
@@ -253,31 +825,80 @@ class GitHubService:
         Returns:
             list: List of issues with their details
         """
+        key = (_token_key(self.token), 'issues', repo_name, state)
+        return github_flights.do(key, lambda: list(self.iter_repository_issues(repo_name, state)))
+
+    def get_repository_task_graph(self, repo_name):
+        """
+        Get all issues and their sub-issue relationships with the GraphQL API.
+        
+        Args:
+            repo_name (str): The name of the repository
+            
+        Returns:
+            tuple: (issues, sub_issues) where issues has the same format as
+                   get_repository_issues and sub_issues maps each parent issue
+                   number to a list of {'number': n} entries
+        """
+        key = (_token_key(self.token), 'task_graph', repo_name)
+        return github_flights.do(key, lambda: self._fetch_repository_task_graph(repo_name))
+
+    def _fetch_repository_task_graph(self, repo_name):
         username = self._get_username()
-        endpoint = f'{self.api_base_url}/repos/{username}/{repo_name}/issues'
+        endpoint = f'{self.api_base_url}/graphql'
         
-        response = requests.get(
-            endpoint,
-            headers=self.get_headers(),
-            params={'state': state, 'per_page': 100}
-        )
+        issues = []
+        sub_issues = {}
+        cursor = None
         
-        if response.status_code != 200:
-            error_msg = f"Failed to get issues: {response.status_code} - {response.text}"
-            print(error_msg)
-            raise Exception(error_msg)
+        while True:
+            response = self._request(
+                'POST',
+                endpoint,
+                is_write=False,
+                headers=self.get_headers(),
+                json={
+                    'query': TASK_GRAPH_QUERY,
+                    'variables': {'owner': username, 'name': repo_name, 'cursor': cursor}
+                }
+            )
+            
+            if response.status_code != 200:
+                self._check_unauthorized(response)
+                error_msg = f"Failed to query issues via GraphQL: {response.status_code} - {response.text}"
+                print(error_msg)
+                raise Exception(error_msg)
+            
+            payload = response.json()
+            if payload.get('errors'):
+                error_msg = f"GraphQL query failed: {payload['errors'][0].get('message', payload['errors'])}"
+                print(error_msg)
+                raise Exception(error_msg)
+            
+            repository = (payload.get('data') or {}).get('repository')
+            if repository is None:
+                raise Exception(f"Repository '{repo_name}' not found")
+            
+            page = repository['issues']
+            for node in page['nodes']:
+                labels = [label['name'] for label in node['labels']['nodes']]
+                issues.append({
+                    'id': node['number'],
+                    'title': node['title'],
+                    'description': node['body'],
+                    'url': node['url'],
+                    'state': node['state'].lower(),
+                    'labels': labels,
+                    'is_broad_goal': 'broad-goal' in labels,
+                    'is_specific_goal': 'specific-goal' in labels
+                })
+                sub_issues[node['number']] = [{'number': child['number']} for child in node['subIssues']['nodes']]
+            
+            if not page['pageInfo']['hasNextPage']:
+                break
+            cursor = page['pageInfo']['endCursor']
         
-        issues = response.json()
-        return [{
-            'id': issue['number'],
-            'title': issue['title'],
-            'description': issue['body'],
-            'url': issue['html_url'],
-            'state': issue['state'],
-            'labels': [label['name'] for label in issue['labels']],
-            'is_broad_goal': any(label['name'] == 'broad-goal' for label in issue['labels']),
-            'is_specific_goal': any(label['name'] == 'specific-goal' for label in issue['labels'])
-        } for issue in issues]
+        return issues, sub_issues
 
     def add_sub_issue(self, repo_name, parent_issue_number, sub_issue_id):
         """
@@ -308,7 +929,8 @@ class GitHubService:
         print(f"Headers: {headers}")
         print(f"Data: {data}")
         
-        response = requests.post(
+        response = self._request(
+            'POST',
             url,
             headers=headers,
             json=data
@@ -318,14 +940,8 @@ class GitHubService:
         print(f"Response body: {response.text}")
         
         if response.status_code != 201:
-            error_message = response.text
-            try:
-                error_json = response.json()
-                if 'message' in error_json:
-                    error_message = error_json['message']
-            except:
-                pass
-            raise Exception(f"Failed to add sub-issue: {error_message}")
+            self._check_unauthorized(response)
+            raise Exception(f"Failed to add sub-issue: {self._error_message(response)}")
         
         return response.json()
     
@@ -348,12 +964,14 @@ class GitHubService:
         headers['Accept'] = 'application/vnd.github+json'
         headers['X-GitHub-Api-Version'] = '2022-11-28'
         
-        response = requests.get(
+        response = self._request(
+            'GET',
             url,
             headers=headers
         )
         
         if response.status_code != 200:
+            self._check_unauthorized(response)
             error_message = response.json().get('message', 'Unknown error')
             raise Exception(f"Failed to list sub-issues: {error_message}")
         
@@ -379,13 +997,15 @@ class GitHubService:
             'labels': ['deleted']
         }
         
-        response = requests.patch(
+        response = self._request(
+            'PATCH',
             endpoint,
             headers=self.get_headers(),
             json=data
         )
         
         if response.status_code != 200:
+            self._check_unauthorized(response)
             error_msg = f"Failed to delete issue: {response.status_code} - {response.text}"
             print(error_msg)
             raise Exception(error_msg)
@@ -412,12 +1032,14 @@ class GitHubService:
         endpoint = f'{self.api_base_url}/repos/{username}/{repo_name}/issues/{issue_number}'
         
         # First, get the current issue to preserve existing labels
-        current_issue_response = requests.get(
+        current_issue_response = self._request(
+            'GET',
             endpoint,
             headers=self.get_headers()
         )
         
         if current_issue_response.status_code != 200:
+            self._check_unauthorized(current_issue_response)
             error_msg = f"Failed to get current issue: {current_issue_response.status_code} - {current_issue_response.text}"
             print(error_msg)
             raise Exception(error_msg)
@@ -453,13 +1075,15 @@ class GitHubService:
         if set(labels) != set(current_labels):
             data['labels'] = labels
         
-        response = requests.patch(
+        response = self._request(
+            'PATCH',
             endpoint,
             headers=self.get_headers(),
             json=data
         )
         
         if response.status_code != 200:
+            self._check_unauthorized(response)
             error_msg = f"Failed to update issue: {response.status_code} - {response.text}"
             print(error_msg)
             raise Exception(error_msg)
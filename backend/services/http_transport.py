@@ -0,0 +1,111 @@
+import os
+import asyncio
+import weakref
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Transport tuning, shared by every GitHubService instance in the process
+POOL_CONNECTIONS = int(os.getenv('GITHUB_POOL_CONNECTIONS', '4'))  # number of per-host pools kept
+POOL_MAXSIZE = int(os.getenv('GITHUB_POOL_MAXSIZE', '16'))  # keep-alive connections per host
+MAX_RETRIES = int(os.getenv('GITHUB_MAX_RETRIES', '3'))
+RETRY_BACKOFF = float(os.getenv('GITHUB_RETRY_BACKOFF', '0.5'))
+REQUEST_TIMEOUT = float(os.getenv('GITHUB_REQUEST_TIMEOUT', '30'))
+
+# POST is deliberately not retried: a 502 after GitHub accepted the write
+# would otherwise create duplicate issues or repositories.
+RETRY_METHODS = frozenset(['HEAD', 'GET', 'OPTIONS', 'PUT', 'PATCH', 'DELETE'])
+RETRY_STATUSES = (502, 503)
+
+_session = None
+_adapter = None
+_session_lock = threading.Lock()
+
+# One async client per event loop; httpx clients cannot be shared across loops
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _build_session():
+    """Create a keep-alive session with a bounded connection pool and retries."""
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry,
+        pool_block=False
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session, adapter
+
+
+def get_session():
+    """Get the process-wide pooled session, creating it on first use."""
+    global _session, _adapter
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session, _adapter = _build_session()
+    return _session
+
+
+def get_async_client():
+    """
+    Get the pooled httpx.AsyncClient for the running event loop.
+
+    Used by the async GitHubService methods in the ASGI serving mode. httpx
+    only retries failed connection attempts; 502/503 retries stay with the
+    synchronous session, whose only async callers are non-retried POSTs.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        limits = httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE)
+        client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(retries=MAX_RETRIES, limits=limits),
+            timeout=REQUEST_TIMEOUT
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def get_pool_stats():
+    """
+    Report connection pool usage for the shared session.
+
+    Returns:
+        dict: Pool configuration plus per-host connection and request counts
+    """
+    stats = {
+        'pool_connections': POOL_CONNECTIONS,
+        'pool_maxsize': POOL_MAXSIZE,
+        'max_retries': MAX_RETRIES,
+        'hosts': []
+    }
+    if _adapter is None:
+        return stats
+
+    pools = _adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        try:
+            pool = pools[key]
+        except KeyError:
+            continue
+        idle = [conn for conn in list(pool.pool.queue) if conn is not None] if pool.pool else []
+        stats['hosts'].append({
+            'host': f"{pool.scheme}://{pool.host}:{pool.port}",
+            'connections_opened': getattr(pool, 'num_connections', 0),
+            'requests': getattr(pool, 'num_requests', 0),
+            'idle_connections': len(idle)
+        })
+    return stats
@@ -0,0 +1,221 @@
+"""
+JSON Patch (RFC 6902) over ID-keyed documents, for small model edits.
+
+Asking the model for the whole edited plan makes every voice edit cost
+output tokens in proportion to the plan. In patch mode, the model
+returns only the operations. The server validates them and applies them
+here.
+
+Positions shift as soon as one item is added or removed, so a model
+cannot address array items by index reliably. Before a patch is applied,
+every array whose items are all objects with distinct "id"s becomes an
+object keyed by str(id). "/12/sub_tasks/1203/title" then means "the
+title of sub-task 1203 of task 12", wherever they sit. Order is kept,
+and a new id is added at the end. Arrays without ids (or empty ones)
+keep normal RFC 6901 indexing, including "-" to append. Afterwards the
+keyed objects are turned back into arrays. As on a plain array, "add"
+never overwrites an existing item: adding an id that is already there is
+an error, and "replace" is the way to change it.
+
+A patch applies completely or not at all.
+"""
+import copy
+
+OPERATIONS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+
+class JSONPatchError(Exception):
+    """Raised when a patch is malformed or does not apply to the document."""
+
+
+class _IdArray(dict):
+    """An array of identified objects, keyed by str(id) while a patch is applied."""
+
+
+def _has_scalar_id(item):
+    return isinstance(item, dict) and isinstance(item.get('id'), (str, int, float)) and not isinstance(item['id'], bool)
+
+
+def _keyed(value):
+    if isinstance(value, list):
+        items = [_keyed(item) for item in value]
+        ids = [str(item['id']) for item in items if _has_scalar_id(item)]
+        if items and len(ids) == len(items) and len(set(ids)) == len(ids):
+            return _IdArray(zip(ids, items))
+        return items
+    if isinstance(value, dict):
+        return {key: _keyed(item) for key, item in value.items()}
+    return value
+
+
+def _unkeyed(value):
+    if isinstance(value, _IdArray):
+        items = []
+        for key, item in value.items():
+            item = _unkeyed(item)
+            if isinstance(item, dict) and 'id' not in item:
+                # An item added without an id takes the one in its path
+                item = {'id': int(key) if key.isdigit() else key, **item}
+            items.append(item)
+        return items
+    if isinstance(value, list):
+        return [_unkeyed(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _unkeyed(item) for key, item in value.items()}
+    return value
+
+
+def _parse_pointer(pointer):
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise JSONPatchError(f"Invalid JSON pointer: {pointer!r}")
+    if pointer == '':
+        return []
+    return [part.replace('~1', '/').replace('~0', '~') for part in pointer[1:].split('/')]
+
+
+def _list_index(container, part, pointer, allow_end=False):
+    if allow_end and part == '-':
+        return len(container)
+    if not part.isdigit() or (len(part) > 1 and part.startswith('0')):
+        raise JSONPatchError(f"Invalid array index {part!r} in {pointer}")
+    index = int(part)
+    limit = len(container) + (1 if allow_end else 0)
+    if index >= limit:
+        raise JSONPatchError(f"Array index {index} out of range in {pointer}")
+    return index
+
+
+def _resolve(document, parts, pointer):
+    """Return the value the parts point at."""
+    value = document
+    for part in parts:
+        if isinstance(value, dict):
+            if part not in value:
+                raise JSONPatchError(f"Path not found: {pointer}")
+            value = value[part]
+        elif isinstance(value, list):
+            value = value[_list_index(value, part, pointer)]
+        else:
+            raise JSONPatchError(f"Path not found: {pointer}")
+    return value
+
+
+def _parent(document, pointer):
+    parts = _parse_pointer(pointer)
+    if not parts:
+        return None, None, parts
+    return _resolve(document, parts[:-1], pointer), parts[-1], parts
+
+
+def _add(document, pointer, value):
+    container, part, _ = _parent(document, pointer)
+    if container is None:
+        return value
+    if isinstance(container, _IdArray):
+        if part == '-':
+            if not _has_scalar_id(value):
+                raise JSONPatchError(f"Appending to {pointer} needs an object with a string or number id")
+            part = str(value['id'])
+        # add inserts into an array and never overwrites an item; that is what replace is for
+        if part in container:
+            raise JSONPatchError(f"An item with id {part} already exists at {pointer}; use replace to change it")
+        container[part] = value
+    elif isinstance(container, dict):
+        container[part] = value
+    elif isinstance(container, list):
+        container.insert(_list_index(container, part, pointer, allow_end=True), value)
+    else:
+        raise JSONPatchError(f"Cannot add to a scalar at {pointer}")
+    return document
+
+
+def _remove(document, pointer):
+    container, part, _ = _parent(document, pointer)
+    if container is None:
+        raise JSONPatchError("Cannot remove the whole document")
+    if isinstance(container, dict):
+        if part not in container:
+            raise JSONPatchError(f"Path not found: {pointer}")
+        return container.pop(part)
+    if isinstance(container, list):
+        return container.pop(_list_index(container, part, pointer))
+    raise JSONPatchError(f"Path not found: {pointer}")
+
+
+def _require(operation, field):
+    if field not in operation:
+        raise JSONPatchError(f"'{operation.get('op')}' operation needs '{field}'")
+    return operation[field]
+
+
+def _require_pointer(operation, field):
+    pointer = _require(operation, field)
+    if not isinstance(pointer, str):
+        raise JSONPatchError(f"'{field}' must be a string JSON pointer, not {pointer!r}")
+    return pointer
+
+
+def _apply_operation(document, operation):
+    if not isinstance(operation, dict):
+        raise JSONPatchError(f"Operation must be an object: {operation!r}")
+    op = operation.get('op')
+    if op not in OPERATIONS:
+        raise JSONPatchError(f"Unknown operation {op!r}")
+    path = _require_pointer(operation, 'path')
+
+    if op == 'add':
+        return _add(document, path, copy.deepcopy(_keyed(_require(operation, 'value'))))
+    if op == 'remove':
+        _remove(document, path)
+        return document
+    if op == 'replace':
+        value = copy.deepcopy(_keyed(_require(operation, 'value')))
+        if path == '':
+            return value
+        # replace = remove + add, but the target must exist and keeps its position
+        container, part, _ = _parent(document, path)
+        _resolve(document, _parse_pointer(path), path)
+        if isinstance(container, list):
+            container[_list_index(container, part, path)] = value
+        else:
+            container[part] = value
+        return document
+    if op == 'test':
+        expected = _keyed(_require(operation, 'value'))
+        if _resolve(document, _parse_pointer(path), path) != expected:
+            raise JSONPatchError(f"Test failed at {path}")
+        return document
+
+    source = _require_pointer(operation, 'from')
+    if op == 'move':
+        if path != source and path.startswith(source + '/'):
+            raise JSONPatchError(f"Cannot move {source} into its own child {path}")
+        value = _remove(document, source)
+    else:
+        value = copy.deepcopy(_resolve(document, _parse_pointer(source), source))
+    return _add(document, path, value)
+
+
+def apply_patch(document, patch):
+    """
+    Apply an RFC 6902 patch, addressing identified array items by id.
+
+    Args:
+        document: The parsed JSON document (left unmodified)
+        patch (list): The operations
+
+    Returns:
+        The patched document
+
+    Raises:
+        JSONPatchError: If the patch is malformed or any operation fails
+    """
+    if not isinstance(patch, list):
+        raise JSONPatchError("A patch must be a list of operations")
+    result = _keyed(document)
+    for index, operation in enumerate(patch):
+        try:
+            result = _apply_operation(result, operation)
+        except JSONPatchError as e:
+            raise JSONPatchError(f"Operation {index}: {str(e)}")
+    return _unkeyed(result)
@@ -0,0 +1,89 @@
+"""
+Incremental extraction of array items from a streamed JSON document.
+
+Model output arrives a few characters at a time. JSONArrayStreamParser
+scans each chunk once, tracking strings, escapes and nesting, and hands
+back every element of a chosen top-level array as soon as its closing
+bracket arrives. For example, it yields each goal of {"goals": [...]}
+well before the model has finished the rest of the document.
+"""
+import json
+
+
+class JSONArrayStreamParser:
+    """Yield the elements of `{"<key>": [ ... ]}` while the document is still streaming."""
+
+    def __init__(self, key):
+        self.key = key
+        self.buffer = []
+        self.length = 0
+        self.stack = []  # '{' / '[' of the enclosing containers
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.last_string = None
+        self.current_key = None
+        self.array_depth = None  # stack depth inside the target array, once found
+        self.item_start = None
+        self.done = False
+
+    @property
+    def text(self):
+        """Everything fed so far."""
+        return ''.join(self.buffer)
+
+    def feed(self, chunk):
+        """
+        Consume the next piece of output.
+
+        Returns:
+            list: Elements of the target array completed by this chunk
+        """
+        if not chunk:
+            return []
+        offset = self.length
+        self.buffer.append(chunk)
+        self.length += len(chunk)
+        text = None
+        items = []
+
+        for position, char in enumerate(chunk, offset):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1:
+                        # Only top-level keys matter; keep the raw slice for the key check
+                        text = text or self.text
+                        self.last_string = text[self.string_start:position + 1]
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = position
+            elif char == ':' and len(self.stack) == 1:
+                self.current_key = json.loads(self.last_string) if self.last_string else None
+            elif char in '{[':
+                if self.array_depth is not None and len(self.stack) == self.array_depth and self.item_start is None:
+                    self.item_start = position
+                self.stack.append(char)
+                if (char == '[' and self.array_depth is None and not self.done
+                        and len(self.stack) == 2 and self.current_key == self.key):
+                    self.array_depth = 2
+            elif char in '}]':
+                if not self.stack:
+                    continue
+                self.stack.pop()
+                if self.array_depth is not None:
+                    if len(self.stack) == self.array_depth and self.item_start is not None:
+                        text = text or self.text
+                        items.append(json.loads(text[self.item_start:position + 1]))
+                        self.item_start = None
+                    elif len(self.stack) < self.array_depth:
+                        # The target array itself closed
+                        self.array_depth = None
+                        self.done = True
+        return items
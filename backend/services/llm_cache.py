@@ -0,0 +1,229 @@
+"""
+Response cache for Azure OpenAI completions.
+
+Entries are keyed by a hash of the deployment, system prompt, user prompt,
+temperature and max_tokens. They live in an LRU memory tier and,
+optionally, in an SQLite file shared across restarts and worker
+processes. In near-duplicate mode, prompts are compared after collapsing
+whitespace and case, so a resubmitted description that differs only in
+formatting is still a hit.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', str(24 * 3600)))  # seconds; 0 = no expiry
+LLM_CACHE_MEMORY_BYTES = int(os.getenv('LLM_CACHE_MEMORY_BYTES', str(16 * 1024 * 1024)))
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH')  # SQLite file for the disk tier; unset disables it
+LLM_CACHE_DISK_BYTES = int(os.getenv('LLM_CACHE_DISK_BYTES', str(256 * 1024 * 1024)))
+LLM_CACHE_NEAR_DUPLICATES = os.getenv('LLM_CACHE_NEAR_DUPLICATES', 'false').lower() == 'true'
+
+
+def normalize_prompt(text):
+    """Collapse runs of whitespace and lowercase, for near-duplicate matching."""
+    return ' '.join((text or '').split()).lower()
+
+
+class MemoryTier:
+    """LRU of serialized responses bounded by their summed size."""
+
+    name = 'memory'
+
+    def __init__(self, max_bytes=LLM_CACHE_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at <= now:
+                del self.entries[key]
+                self.size -= len(value)
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self.entries[key] = (value, expires_at)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
+
+
+class SQLiteTier:
+    """Disk tier in one SQLite table, pruned least-recently-used past max_bytes."""
+
+    name = 'disk'
+
+    def __init__(self, path, max_bytes=LLM_CACHE_DISK_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS llm_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+            'expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)')
+
+    def get(self, key, now):
+        with self.lock:
+            row = self.connection.execute('SELECT value, expires_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at and expires_at <= now:
+                self.connection.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                return None
+            self.connection.execute('UPDATE llm_cache SET last_used = ? WHERE key = ?', (now, key))
+            return value, expires_at
+
+    def set(self, key, value, expires_at):
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), expires_at, now)
+            )
+            self.connection.execute('DELETE FROM llm_cache WHERE expires_at > 0 AND expires_at <= ?', (now,))
+            total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM llm_cache').fetchone()[0]
+            while total > self.max_bytes:
+                oldest = self.connection.execute(
+                    'SELECT key, size FROM llm_cache ORDER BY last_used LIMIT 1'
+                ).fetchone()
+                self.connection.execute('DELETE FROM llm_cache WHERE key = ?', (oldest[0],))
+                total -= oldest[1]
+                self.evictions += 1
+
+    def get_stats(self):
+        with self.lock:
+            entries, size = self.connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache').fetchone()
+        return {
+            'path': self.path,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions
+        }
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of parsed completion results.
+
+    Values are stored as JSON, so every hit returns a fresh copy that
+    callers may modify.
+    """
+
+    def __init__(self, tiers=None, ttl=LLM_CACHE_TTL, near_duplicates=LLM_CACHE_NEAR_DUPLICATES, enabled=LLM_CACHE_ENABLED):
+        """
+        Args:
+            tiers (list, optional): Tiers to consult in order; defaults to a memory
+                                    tier plus an SQLite tier when LLM_CACHE_PATH is set
+            ttl (float): Entry lifetime in seconds (0 = no expiry)
+            near_duplicates (bool): Match prompts after whitespace and case normalization
+            enabled (bool): False turns every lookup into a miss and every store into a no-op
+        """
+        if tiers is None:
+            tiers = [MemoryTier()]
+            if LLM_CACHE_PATH:
+                tiers.append(SQLiteTier(LLM_CACHE_PATH))
+        self.tiers = tiers
+        self.ttl = ttl
+        self.near_duplicates = near_duplicates
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0}
+        for tier in tiers:
+            self.stats[f'{tier.name}_hits'] = 0
+
+    def make_key(self, deployment, system_prompt, user_prompt, temperature, max_tokens):
+        """Hash the request parameters that determine a completion."""
+        if self.near_duplicates:
+            system_prompt = normalize_prompt(system_prompt)
+            user_prompt = normalize_prompt(user_prompt)
+        raw = json.dumps([deployment, system_prompt, user_prompt, temperature, max_tokens])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached result.
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        for index, tier in enumerate(self.tiers):
+            entry = tier.get(key, now)
+            if entry is None:
+                continue
+            # Promote into the faster tiers, keeping the original expiry
+            value, expires_at = entry
+            for faster in self.tiers[:index]:
+                faster.set(key, value, expires_at)
+            with self.lock:
+                self.stats['hits'] += 1
+                self.stats[f'{tier.name}_hits'] += 1
+            return json.loads(value)
+
+        with self.lock:
+            self.stats['misses'] += 1
+        return None
+
+    def set(self, key, value):
+        """Store a JSON-serializable result in every tier."""
+        if not self.enabled:
+            return
+        serialized = json.dumps(value)
+        expires_at = time.time() + self.ttl if self.ttl else 0
+        for tier in self.tiers:
+            tier.set(key, serialized, expires_at)
+        with self.lock:
+            self.stats['stores'] += 1
+
+    def get_stats(self):
+        """Return hit/miss counters, the hit rate and per-tier occupancy."""
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['enabled'] = self.enabled
+        stats['near_duplicates'] = self.near_duplicates
+        stats['ttl_seconds'] = self.ttl
+        stats['tiers'] = {tier.name: tier.get_stats() for tier in self.tiers}
+        return stats
@@ -0,0 +1,367 @@
+"""
+Shared gateway to the Azure OpenAI deployments.
+
+Deployments are grouped into pools ("text" for the planning calls,
+"audio" for the audio-input model). Every call goes to the deployment in
+its pool with the most quota headroom. Headroom comes from the
+x-ratelimit-remaining-* headers of that deployment's last response, less
+the tokens reserved by its calls still in flight. A 429, a 5xx or a
+connection failure puts the deployment in a cooldown, for as long as its
+retry-after hint asks, and the call fails over to the next deployment.
+When every deployment in the pool is cooling down, the call waits for
+the first one to come back, up to LLM_GATEWAY_MAX_WAIT seconds.
+
+AZURE_OPENAI_DEPLOYMENTS holds the pool as a JSON list, e.g.
+
+    [{"name": "eastus", "pool": "text", "endpoint": "https://eastus.openai.azure.com/",
+      "deployment": "gpt-4o", "key": "..."},
+     {"name": "swedencentral", "pool": "text", "endpoint": "https://sweden.openai.azure.com/",
+      "deployment": "gpt-4o", "key": "..."}]
+
+Without it, the pools are built from AZURE_OPENAI_ENDPOINT (or
+ENDPOINT_URL), DEPLOYMENT_NAME and AZURE_OPENAI_KEY as before, with the
+audio model on AZURE_OPENAI_AUDIO_ENDPOINT. Deployments in one pool
+are expected to serve the same model.
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+from openai import AzureOpenAI, AsyncAzureOpenAI, APIStatusError, APIConnectionError
+from services.token_budget import count_message_tokens
+
+AZURE_OPENAI_DEPLOYMENTS = os.getenv('AZURE_OPENAI_DEPLOYMENTS')
+OPENAI_API_VERSION = os.getenv('OPENAI_API_VERSION') or os.getenv('AZURE_OPENAI_API_VERSION', '2024-10-01-preview')
+AUDIO_ENDPOINT = os.getenv('AZURE_OPENAI_AUDIO_ENDPOINT', 'https://general-github-manager.openai.azure.com/')
+AUDIO_DEPLOYMENT_NAME = os.getenv('AUDIO_DEPLOYMENT_NAME', 'gpt-4o-mini-audio-preview')
+# Attempts per call across all deployments, and the longest wait for a deployment to cool down
+LLM_GATEWAY_MAX_ATTEMPTS = int(os.getenv('LLM_GATEWAY_MAX_ATTEMPTS', '4'))
+LLM_GATEWAY_MAX_WAIT = float(os.getenv('LLM_GATEWAY_MAX_WAIT', '30'))
+# Cooldown after a failure that carries no retry-after hint, in seconds
+LLM_GATEWAY_ERROR_COOLDOWN = float(os.getenv('LLM_GATEWAY_ERROR_COOLDOWN', '5'))
+
+# Azure OpenAI quotas are per minute; older header readings say nothing about now
+QUOTA_WINDOW_SECONDS = 60
+
+
+def _header_number(headers, name):
+    value = headers.get(name) if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(headers):
+    """Seconds asked for by retry-after-ms or retry-after, or None."""
+    milliseconds = _header_number(headers, 'retry-after-ms')
+    if milliseconds is not None:
+        return milliseconds / 1000
+    return _header_number(headers, 'retry-after')
+
+
+def _failover_cooldown(error):
+    """
+    Return how long to bench a deployment after error, or None when the
+    error is the caller's (a 4xx other than 429) and should not fail over.
+    """
+    if isinstance(error, APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        hint = _retry_after(error.response.headers)
+        return hint if hint is not None else LLM_GATEWAY_ERROR_COOLDOWN
+    if isinstance(error, APIConnectionError):
+        return LLM_GATEWAY_ERROR_COOLDOWN
+    return None
+
+
+class Deployment:
+    """One Azure OpenAI deployment and what its last responses said about its quota."""
+
+    def __init__(self, name, pool, endpoint, deployment, key, api_version=OPENAI_API_VERSION):
+        self.name = name
+        self.pool = pool
+        self.endpoint = endpoint
+        self.deployment = deployment
+        self.key = key
+        self.api_version = api_version
+        self.client = None
+        self.async_client = None
+        self.remaining_tokens = None
+        self.remaining_requests = None
+        self.updated_at = None
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.reserved_tokens = 0
+        self.stats = {
+            'requests': 0,
+            'succeeded': 0,
+            'throttled': 0,
+            'server_errors': 0,
+            'connection_errors': 0,
+            'client_errors': 0
+        }
+        self.last_error = None
+
+    def get_client(self):
+        if self.client is None:
+            # The gateway does the retrying, across deployments
+            self.client = AzureOpenAI(
+                api_key=self.key,
+                api_version=self.api_version,
+                azure_endpoint=self.endpoint,
+                max_retries=0
+            )
+        return self.client
+
+    def get_async_client(self):
+        if self.async_client is None:
+            self.async_client = AsyncAzureOpenAI(
+                api_key=self.key,
+                api_version=self.api_version,
+                azure_endpoint=self.endpoint,
+                max_retries=0
+            )
+        return self.async_client
+
+    def headroom(self, now):
+        """Tokens this deployment can still take this minute; None when unknown."""
+        if self.updated_at is None or now - self.updated_at >= QUOTA_WINDOW_SECONDS:
+            return None
+        if self.remaining_requests is not None and self.remaining_requests - self.in_flight <= 0:
+            return 0
+        if self.remaining_tokens is None:
+            return None
+        return self.remaining_tokens - self.reserved_tokens
+
+    def observe(self, headers, now):
+        """Take the quota readings from a response's headers."""
+        remaining_tokens = _header_number(headers, 'x-ratelimit-remaining-tokens')
+        remaining_requests = _header_number(headers, 'x-ratelimit-remaining-requests')
+        if remaining_tokens is None and remaining_requests is None:
+            return
+        self.remaining_tokens = remaining_tokens
+        self.remaining_requests = remaining_requests
+        self.updated_at = now
+
+    def get_stats(self, now):
+        return {
+            'pool': self.pool,
+            'endpoint': self.endpoint,
+            'deployment': self.deployment,
+            'remaining_tokens': self.remaining_tokens,
+            'remaining_requests': self.remaining_requests,
+            'reading_age_seconds': round(now - self.updated_at, 1) if self.updated_at is not None else None,
+            'cooldown_seconds': round(max(0.0, self.cooldown_until - now), 1),
+            'in_flight': self.in_flight,
+            'last_error': self.last_error,
+            **self.stats
+        }
+
+
+class LLMGateway:
+    """Routes chat completions across pools of deployments by quota headroom."""
+
+    def __init__(self, deployments, max_attempts=LLM_GATEWAY_MAX_ATTEMPTS, max_wait=LLM_GATEWAY_MAX_WAIT):
+        """
+        Args:
+            deployments (list): Deployment entries; each belongs to one pool
+            max_attempts (int): Attempts per call across the pool
+            max_wait (float): Longest wait, in seconds, for a cooling-down deployment
+        """
+        self.deployments = deployments
+        self.max_attempts = max_attempts
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.failovers = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build the pools from AZURE_OPENAI_DEPLOYMENTS, or from the single-deployment settings."""
+        if AZURE_OPENAI_DEPLOYMENTS:
+            entries = json.loads(AZURE_OPENAI_DEPLOYMENTS)
+        else:
+            key = os.getenv('AZURE_OPENAI_KEY')
+            entries = [
+                {'name': 'text', 'pool': 'text',
+                 'endpoint': os.getenv('AZURE_OPENAI_ENDPOINT') or os.getenv('ENDPOINT_URL'),
+                 'deployment': os.getenv('DEPLOYMENT_NAME', 'gpt-4o'), 'key': key},
+                {'name': 'audio', 'pool': 'audio', 'endpoint': AUDIO_ENDPOINT,
+                 'deployment': AUDIO_DEPLOYMENT_NAME, 'key': key}
+            ]
+
+        deployments = []
+        for index, entry in enumerate(entries):
+            if not entry.get('endpoint') or not entry.get('key'):
+                continue
+            deployments.append(Deployment(
+                name=entry.get('name') or f"deployment-{index}",
+                pool=entry.get('pool', 'text'),
+                endpoint=entry['endpoint'],
+                deployment=entry['deployment'],
+                key=entry['key'],
+                api_version=entry.get('api_version', OPENAI_API_VERSION)
+            ))
+        return cls(deployments)
+
+    def has_pool(self, pool):
+        """Whether any deployment is configured for pool."""
+        return any(deployment.pool == pool for deployment in self.deployments)
+
+    def _acquire(self, pool, tried, reserve):
+        """
+        Pick the deployment for the next attempt and reserve its share of quota.
+
+        Returns:
+            tuple: (deployment, seconds to wait before calling it)
+        """
+        now = time.monotonic()
+        with self.lock:
+            candidates = [d for d in self.deployments if d.pool == pool and d not in tried]
+            if not candidates:
+                return None, 0.0
+            ready = [d for d in candidates if d.cooldown_until <= now]
+            if ready:
+                # Unread quotas first (so every deployment gets measured), then most headroom, then least busy
+                def rank(d):
+                    headroom = d.headroom(now)
+                    return (headroom is None, headroom or 0, -d.in_flight)
+                deployment, wait = max(ready, key=rank), 0.0
+            else:
+                deployment = min(candidates, key=lambda d: d.cooldown_until)
+                wait = deployment.cooldown_until - now
+            if wait <= self.max_wait:
+                deployment.in_flight += 1
+                deployment.reserved_tokens += reserve
+                deployment.stats['requests'] += 1
+            return deployment, wait
+
+    def _release(self, deployment, reserve, headers=None, error=None, cooldown=None):
+        now = time.monotonic()
+        with self.lock:
+            deployment.in_flight -= 1
+            deployment.reserved_tokens -= reserve
+            if headers is not None:
+                deployment.observe(headers, now)
+            if error is None:
+                deployment.stats['succeeded'] += 1
+                return
+            deployment.last_error = str(error)[:200]
+            status = getattr(error, 'status_code', None)
+            if status == 429:
+                deployment.stats['throttled'] += 1
+            elif status is not None and status >= 500:
+                deployment.stats['server_errors'] += 1
+            elif status is None and isinstance(error, APIConnectionError):
+                deployment.stats['connection_errors'] += 1
+            else:
+                deployment.stats['client_errors'] += 1
+            if cooldown is not None:
+                deployment.cooldown_until = max(deployment.cooldown_until, now + cooldown)
+                self.failovers += 1
+
+    def _check_pool(self, pool):
+        if not self.has_pool(pool):
+            raise Exception(f"No Azure OpenAI deployment configured for the {pool} pool. Set AZURE_OPENAI_DEPLOYMENTS, or AZURE_OPENAI_KEY and AZURE_OPENAI_ENDPOINT.")
+
+    @staticmethod
+    def _reserve(kwargs):
+        return count_message_tokens(kwargs.get('messages', [])) + (kwargs.get('max_tokens') or 0)
+
+    def create(self, pool='text', timeout=None, **kwargs):
+        """
+        Create a chat completion on the pool's deployment with the most headroom.
+
+        Args:
+            pool (str): "text" or "audio"
+            timeout (float, optional): Seconds allowed per attempt
+            **kwargs: chat.completions.create arguments other than model
+
+        Returns:
+            The parsed completion (or stream, with stream=True)
+
+        Raises:
+            The last API error once attempts run out, or the first error that
+            is not worth failing over (e.g. a 400 for a bad request)
+        """
+        self._check_pool(pool)
+        reserve = self._reserve(kwargs)
+        tried = set()
+        last_error = None
+        attempts = 0
+        while attempts < self.max_attempts:
+            deployment, wait = self._acquire(pool, tried, reserve)
+            if deployment is None:
+                # Every deployment failed once; go round again (now waiting on cooldowns)
+                tried.clear()
+                continue
+            if wait > self.max_wait:
+                break
+            if wait > 0:
+                time.sleep(wait)
+            attempts += 1
+            client = deployment.get_client()
+            if timeout is not None:
+                client = client.with_options(timeout=timeout)
+            try:
+                raw = client.chat.completions.with_raw_response.create(model=deployment.deployment, **kwargs)
+            except Exception as e:
+                cooldown = _failover_cooldown(e)
+                self._release(deployment, reserve, getattr(getattr(e, 'response', None), 'headers', None), e, cooldown)
+                if cooldown is None:
+                    raise
+                print(f"Azure OpenAI deployment {deployment.name} failed ({str(e)[:120]}); failing over")
+                tried.add(deployment)
+                last_error = e
+                continue
+            self._release(deployment, reserve, raw.headers)
+            return raw.parse()
+        raise last_error or Exception(f"All {pool} deployments are cooling down for longer than {self.max_wait:g}s")
+
+    async def acreate(self, pool='text', timeout=None, **kwargs):
+        """Async variant of create, using each deployment's AsyncAzureOpenAI client."""
+        self._check_pool(pool)
+        reserve = self._reserve(kwargs)
+        tried = set()
+        last_error = None
+        attempts = 0
+        while attempts < self.max_attempts:
+            deployment, wait = self._acquire(pool, tried, reserve)
+            if deployment is None:
+                tried.clear()
+                continue
+            if wait > self.max_wait:
+                break
+            if wait > 0:
+                await asyncio.sleep(wait)
+            attempts += 1
+            client = deployment.get_async_client()
+            if timeout is not None:
+                client = client.with_options(timeout=timeout)
+            try:
+                raw = await client.chat.completions.with_raw_response.create(model=deployment.deployment, **kwargs)
+            except Exception as e:
+                cooldown = _failover_cooldown(e)
+                self._release(deployment, reserve, getattr(getattr(e, 'response', None), 'headers', None), e, cooldown)
+                if cooldown is None:
+                    raise
+                print(f"Azure OpenAI deployment {deployment.name} failed ({str(e)[:120]}); failing over")
+                tried.add(deployment)
+                last_error = e
+                continue
+            self._release(deployment, reserve, raw.headers)
+            return raw.parse()
+        raise last_error or Exception(f"All {pool} deployments are cooling down for longer than {self.max_wait:g}s")
+
+    def get_stats(self):
+        """Return per-deployment quota readings and counters."""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                'failovers': self.failovers,
+                'deployments': {d.name: d.get_stats(now) for d in self.deployments}
+            }
+
+
+llm_gateway = LLMGateway.from_env()
@@ -0,0 +1,318 @@
+"""
+Server-side store of generated plans, so goals survive a page reload.
+
+A plan is a JSON document: the project prompt, the goals from
+generate_goals (each with its sub_tasks), and, per goal, the
+smaller_goals from break_down_goal. Every save writes a new immutable
+version under the plan's ID, so the endpoints can take a plan_id instead
+of re-posting the goals, and an older version can still be read back.
+
+The store is one SQLite file in WAL mode. Readers never block the writer,
+and all worker processes share the same file. An update is a
+read-modify-write inside one BEGIN IMMEDIATE transaction. Concurrent
+break-downs of the same plan therefore each add their goal's results
+without losing the others'.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+PLAN_STORE_PATH = os.getenv('PLAN_STORE_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'plans.db'))
+# Versions kept per plan; older ones are pruned on save (0 = keep all)
+PLAN_STORE_MAX_VERSIONS = int(os.getenv('PLAN_STORE_MAX_VERSIONS', '20'))
+# Every /api/analyze creates a plan, so whole plans are pruned on create too:
+# those not saved for this many days, and the least recently saved beyond the count (0 = keep all)
+PLAN_STORE_MAX_AGE_DAYS = float(os.getenv('PLAN_STORE_MAX_AGE_DAYS', '30'))
+PLAN_STORE_MAX_PLANS = int(os.getenv('PLAN_STORE_MAX_PLANS', '1000'))
+
+
+class PlanNotFoundError(Exception):
+    """Raised when a plan ID (or one of its versions) is not in the store."""
+
+
+class PlanConflictError(Exception):
+    """Raised when a save expected a version that is no longer the latest."""
+
+
+class InvalidPlanError(Exception):
+    """Raised when a stored plan document does not have the expected shape."""
+
+
+def _goal_list(items, what):
+    if items is None:
+        return []
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise InvalidPlanError(f"Stored plan is malformed: {what} must be a list of objects")
+    return items
+
+
+def plan_goals(plan):
+    """
+    Return the goals of a plan document.
+
+    Raises:
+        InvalidPlanError: If the document or its goals are not shaped like a plan
+    """
+    if not isinstance(plan, dict):
+        raise InvalidPlanError("Stored plan is malformed: expected an object")
+    return _goal_list(plan.get('goals'), 'goals')
+
+
+def plan_goal(plan, goal_id):
+    """Return the goal of a plan document with the given ID, or None."""
+    for goal in plan_goals(plan):
+        if str(goal.get('id')) == str(goal_id):
+            return goal
+    return None
+
+
+def plan_goal_titles(plan):
+    """The goals as the newline-separated titles /api/generate-repo-info takes."""
+    return '\n'.join(str(goal.get('title', '')) for goal in plan_goals(plan))
+
+
+def plan_issue_goals(plan):
+    """
+    Flatten a plan into the goal list GitHubService.create_issues takes.
+
+    Each goal becomes a broad goal. Its smaller_goals (or, if it was never
+    broken down, its sub_tasks) become specific goals linked to it.
+
+    Raises:
+        InvalidPlanError: If the goals or their children are not lists of objects
+    """
+    issue_goals = []
+    for goal in plan_goals(plan):
+        issue_goals.append({
+            'id': goal.get('id'),
+            'title': goal.get('title', ''),
+            'description': goal.get('description', ''),
+            'is_broad_goal': True,
+            'is_specific_goal': False
+        })
+        children = goal.get('smaller_goals') or goal.get('sub_tasks')
+        for child in _goal_list(children, f"the children of goal {goal.get('id')}"):
+            issue_goals.append({
+                'id': child.get('id'),
+                'title': child.get('title', ''),
+                'description': child.get('description', ''),
+                'is_broad_goal': False,
+                'is_specific_goal': True,
+                'parent_issue_number': goal.get('id')
+            })
+    return issue_goals
+
+
+class PlanStore:
+    """Versioned plan documents in an SQLite file."""
+
+    def __init__(self, path=PLAN_STORE_PATH, max_versions=PLAN_STORE_MAX_VERSIONS,
+                 max_age_days=PLAN_STORE_MAX_AGE_DAYS, max_plans=PLAN_STORE_MAX_PLANS):
+        self.path = path
+        self.max_versions = max_versions
+        self.max_age_days = max_age_days
+        self.max_plans = max_plans
+        self.lock = threading.Lock()
+        self.stats = {'created': 0, 'saved': 0, 'loaded': 0, 'not_found': 0, 'conflicts': 0, 'pruned_plans': 0}
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # With WAL, NORMAL only syncs at checkpoints; a crash can lose the last saves, not corrupt the file
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA busy_timeout=5000')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS plans ('
+            'plan_id TEXT PRIMARY KEY, version INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS plan_versions ('
+            'plan_id TEXT NOT NULL, version INTEGER NOT NULL, document TEXT NOT NULL, '
+            'source TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (plan_id, version))'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS plans_updated_at ON plans (updated_at)')
+
+    def _write_version(self, plan_id, version, document, source, now):
+        self.connection.execute(
+            'INSERT INTO plan_versions (plan_id, version, document, source, created_at) VALUES (?, ?, ?, ?, ?)',
+            (plan_id, version, json.dumps(document), source, now)
+        )
+        if self.max_versions:
+            self.connection.execute(
+                'DELETE FROM plan_versions WHERE plan_id = ? AND version <= ?',
+                (plan_id, version - self.max_versions)
+            )
+
+    def _prune_plans(self, now, keep):
+        """Delete plans past max_age_days and all but the keep most recently saved, with their versions."""
+        stale = []
+        if self.max_age_days:
+            stale += [row[0] for row in self.connection.execute(
+                'SELECT plan_id FROM plans WHERE updated_at < ?',
+                (now - self.max_age_days * 86400,)
+            )]
+        if self.max_plans:
+            stale += [row[0] for row in self.connection.execute(
+                'SELECT plan_id FROM plans ORDER BY updated_at DESC LIMIT -1 OFFSET ?',
+                (keep,)
+            )]
+        stale = set(stale)
+        for plan_id in stale:
+            self.connection.execute('DELETE FROM plan_versions WHERE plan_id = ?', (plan_id,))
+            self.connection.execute('DELETE FROM plans WHERE plan_id = ?', (plan_id,))
+        return len(stale)
+
+    def create(self, document, source):
+        """
+        Store a new plan, pruning old plans first.
+
+        Args:
+            document (dict): The plan ({"prompt": ..., "goals": [...]})
+            source (str): What produced it, e.g. "generate_goals"
+
+        Returns:
+            tuple: (plan_id, version)
+        """
+        plan_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                # Leave room for the new plan within max_plans
+                pruned = self._prune_plans(now, self.max_plans - 1)
+                self.connection.execute(
+                    'INSERT INTO plans (plan_id, version, created_at, updated_at) VALUES (?, 1, ?, ?)',
+                    (plan_id, now, now)
+                )
+                self._write_version(plan_id, 1, document, source, now)
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+            self.stats['created'] += 1
+            self.stats['pruned_plans'] += pruned
+        return plan_id, 1
+
+    def get(self, plan_id, version=None):
+        """
+        Load a plan.
+
+        Args:
+            plan_id (str): The plan ID
+            version (int, optional): A specific version; defaults to the latest
+
+        Returns:
+            dict: plan_id, version, source, created_at and the "plan" document
+
+        Raises:
+            PlanNotFoundError: If the plan or the version does not exist
+        """
+        with self.lock:
+            if version is None:
+                row = self.connection.execute(
+                    'SELECT v.version, v.document, v.source, v.created_at FROM plans p '
+                    'JOIN plan_versions v ON v.plan_id = p.plan_id AND v.version = p.version WHERE p.plan_id = ?',
+                    (plan_id,)
+                ).fetchone()
+            else:
+                row = self.connection.execute(
+                    'SELECT version, document, source, created_at FROM plan_versions WHERE plan_id = ? AND version = ?',
+                    (plan_id, version)
+                ).fetchone()
+            if row is None:
+                self.stats['not_found'] += 1
+                raise PlanNotFoundError(f"Plan '{plan_id}'" + (f" version {version}" if version is not None else "") + " not found")
+            self.stats['loaded'] += 1
+        return {
+            'plan_id': plan_id,
+            'version': row[0],
+            'source': row[2],
+            'created_at': row[3],
+            'plan': json.loads(row[1])
+        }
+
+    def update(self, plan_id, modify, source, expected_version=None):
+        """
+        Save a new version of a plan computed from the latest one.
+
+        Args:
+            plan_id (str): The plan ID
+            modify (callable): Takes the latest document (a fresh copy) and returns
+                               the new one; runs inside the write transaction, so
+                               keep it quick
+            source (str): What produced the new version, e.g. "break_down_goal"
+            expected_version (int, optional): Fail unless this is still the latest version
+
+        Returns:
+            tuple: (new version, new document)
+
+        Raises:
+            PlanNotFoundError: If the plan does not exist
+            PlanConflictError: If expected_version is not the latest version
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.connection.execute(
+                    'SELECT v.version, v.document FROM plans p '
+                    'JOIN plan_versions v ON v.plan_id = p.plan_id AND v.version = p.version WHERE p.plan_id = ?',
+                    (plan_id,)
+                ).fetchone()
+                if row is None:
+                    self.stats['not_found'] += 1
+                    raise PlanNotFoundError(f"Plan '{plan_id}' not found")
+                latest, document = row
+                if expected_version is not None and int(expected_version) != latest:
+                    self.stats['conflicts'] += 1
+                    raise PlanConflictError(f"Plan '{plan_id}' is at version {latest}, not {expected_version}")
+                document = modify(json.loads(document))
+                version = latest + 1
+                self.connection.execute(
+                    'UPDATE plans SET version = ?, updated_at = ? WHERE plan_id = ?',
+                    (version, now, plan_id)
+                )
+                self._write_version(plan_id, version, document, source, now)
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+            self.stats['saved'] += 1
+        return version, document
+
+    def save(self, plan_id, document, source, expected_version=None):
+        """Replace a plan's document with a new version; see update."""
+        return self.update(plan_id, lambda latest: document, source, expected_version)[0]
+
+    def set_smaller_goals(self, plan_id, goal_id, smaller_goals):
+        """
+        Record a goal's break-down in a new plan version.
+
+        Returns:
+            int: The new version
+
+        Raises:
+            PlanNotFoundError: If the plan or the goal does not exist
+        """
+        def modify(plan):
+            goal = plan_goal(plan, goal_id)
+            if goal is None:
+                raise PlanNotFoundError(f"Goal {goal_id} not found in plan '{plan_id}'")
+            goal['smaller_goals'] = smaller_goals
+            return plan
+
+        return self.update(plan_id, modify, 'break_down_goal')[0]
+
+    def get_stats(self):
+        """Return operation counters and the number of stored plans and versions."""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['plans'] = self.connection.execute('SELECT COUNT(*) FROM plans').fetchone()[0]
+            stats['versions'] = self.connection.execute('SELECT COUNT(*) FROM plan_versions').fetchone()[0]
+        stats['path'] = self.path
+        stats['max_versions'] = self.max_versions
+        stats['max_age_days'] = self.max_age_days
+        stats['max_plans'] = self.max_plans
+        return stats
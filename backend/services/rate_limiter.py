@@ -0,0 +1,205 @@
+import os
+import time
+import email.utils
+import asyncio
+import threading
+
+# GitHub allows roughly 80 content-creating requests per minute before the
+# secondary rate limit kicks in; stay below that by default.
+WRITE_RATE_PER_MINUTE = float(os.getenv('GITHUB_WRITE_RATE_PER_MINUTE', '60'))
+WRITE_MIN_RATE_PER_MINUTE = float(os.getenv('GITHUB_WRITE_MIN_RATE_PER_MINUTE', '6'))
+WRITE_BURST = int(os.getenv('GITHUB_WRITE_BURST', '10'))
+# Fallback pause when GitHub signals a secondary limit without a Retry-After header
+DEFAULT_RETRY_AFTER = 60
+# Longest GitHub-imposed pause a request sleeps through; longer pauses (e.g. an
+# exhausted hourly limit) fail fast with GitHubRateLimitError so routes answer 429
+MAX_WAIT = float(os.getenv('GITHUB_RATE_LIMIT_MAX_WAIT', '5'))
+
+
+class GitHubRateLimitError(Exception):
+    """Raised when GitHub keeps rejecting a request because of rate limiting."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """
+    Convert a Retry-After header to seconds.
+
+    Args:
+        value (str): Delay in seconds, or an HTTP date
+
+    Returns:
+        float: Seconds to wait (DEFAULT_RETRY_AFTER if the value is unreadable)
+    """
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return float(DEFAULT_RETRY_AFTER)
+
+
+class RateLimitScheduler:
+    """
+    Adaptive token bucket that paces content-creating GitHub requests.
+
+    Writes draw one token each; tokens refill at the current rate. The rate
+    is halved whenever GitHub reports a secondary rate limit and creeps back
+    up by one request per minute after every accepted write. Rate limit
+    headers seen on any response (reads included) can pause all traffic
+    until the advertised reset time; a request facing more than max_wait
+    seconds of such a pause is rejected instead of sleeping.
+    """
+
+    def __init__(self, rate_per_minute=WRITE_RATE_PER_MINUTE, burst=WRITE_BURST, min_rate_per_minute=WRITE_MIN_RATE_PER_MINUTE, max_wait=MAX_WAIT):
+        self.max_rate = rate_per_minute / 60.0
+        self.min_rate = min(min_rate_per_minute, rate_per_minute) / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.max_wait = max_wait
+        self.remaining = None
+        self.limit = None
+        self.reset_at = None
+        self.lock = threading.Lock()
+        self.stats = {
+            'writes': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'secondary_limit_hits': 0,
+            'primary_limit_exhausted': 0,
+            'rejected_while_paused': 0
+        }
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, write=True):
+        """
+        Reserve a slot and return how many seconds the caller must wait.
+
+        Args:
+            write (bool): Whether the request consumes a write token; reads only
+                          honour a pause imposed by GitHub
+
+        Returns:
+            float: Seconds to sleep before sending the request
+
+        Raises:
+            GitHubRateLimitError: If GitHub has paused traffic for longer than max_wait
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = max(0.0, self.blocked_until - now)
+            if wait > self.max_wait:
+                self.stats['rejected_while_paused'] += 1
+                raise GitHubRateLimitError(
+                    f"GitHub rate limit reached; requests are paused for another {wait:.0f}s",
+                    retry_after=wait
+                )
+            if write:
+                self._refill(now)
+                self.tokens -= 1
+                self.stats['writes'] += 1
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / self.rate)
+            if wait > 0:
+                self.stats['waits'] += 1
+                self.stats['wait_seconds'] += wait
+            return wait
+
+    def acquire(self, write=True):
+        """Block until the request may be sent."""
+        wait = self.reserve(write)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, write=True):
+        """Wait without blocking the event loop until the request may be sent."""
+        wait = self.reserve(write)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observe(self, response, write=True):
+        """
+        Update the schedule from a GitHub response.
+
+        Args:
+            response: The HTTP response (anything with status_code, headers and text)
+            write (bool): Whether the request was a write
+
+        Returns:
+            float or None: Seconds to wait before retrying if the request was
+                           rejected by a rate limit, otherwise None
+        """
+        headers = response.headers
+        status = response.status_code
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        retry_after = headers.get('Retry-After')
+
+        with self.lock:
+            now = time.monotonic()
+            if remaining is not None:
+                self.remaining = int(remaining)
+                limit = headers.get('X-RateLimit-Limit')
+                self.limit = int(limit) if limit is not None else self.limit
+            if reset is not None:
+                self.reset_at = int(reset)
+
+            limited = status == 429 or (status == 403 and (
+                retry_after is not None
+                or remaining == '0'
+                or 'rate limit' in response.text.lower()
+            ))
+
+            if not limited:
+                if write and 200 <= status < 300:
+                    self.rate = min(self.max_rate, self.rate + 1 / 60.0)
+                return None
+
+            if retry_after is not None:
+                delay = parse_retry_after(retry_after)
+            elif remaining == '0' and self.reset_at:
+                delay = max(0.0, self.reset_at - time.time())
+            else:
+                delay = DEFAULT_RETRY_AFTER
+
+            if remaining == '0' and retry_after is None:
+                self.stats['primary_limit_exhausted'] += 1
+            else:
+                self.stats['secondary_limit_hits'] += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                # Drop any saved-up burst so the next writes follow the reduced rate
+                self.tokens = min(self.tokens, 0.0)
+                self.updated_at = now
+
+            self.blocked_until = max(self.blocked_until, now + delay)
+            print(f"GitHub rate limit hit (status {status}), pausing for {delay:.1f}s")
+            return delay
+
+    def get_stats(self):
+        """Return the current write budget and scheduler counters."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate_per_minute': round(self.rate * 60, 2),
+                'max_rate_per_minute': round(self.max_rate * 60, 2),
+                'tokens_available': round(max(self.tokens, 0.0), 2),
+                'burst': self.capacity,
+                'paused_for_seconds': round(max(0.0, self.blocked_until - now), 2),
+                'core_remaining': self.remaining,
+                'core_limit': self.limit,
+                'core_reset_at': self.reset_at,
+                **self.stats,
+                'wait_seconds': round(self.stats['wait_seconds'], 2)
+            }
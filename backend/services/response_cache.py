@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Upper bound for cached GitHub response bodies; 0 disables the cache
+RESPONSE_CACHE_BYTES = int(os.getenv('GITHUB_RESPONSE_CACHE_BYTES', str(32 * 1024 * 1024)))
+
+
+class CachedResponse:
+    """
+    Stand-in for requests.Response backed by a cache entry.
+
+    Exposes the attributes GitHubService reads from a successful response
+    (status_code, headers, links, text and json()).
+    """
+
+    def __init__(self, entry, headers=None, from_cache=True):
+        self.status_code = 200
+        self.headers = headers if headers is not None else entry['headers']
+        self.links = entry['links']
+        self.from_cache = from_cache
+        self._data = entry['data']
+
+    def json(self, **kwargs):
+        return self._data
+
+    @property
+    def text(self):
+        return json.dumps(self._data)
+
+
+class ETagCache:
+    """
+    LRU cache of parsed GitHub responses keyed by request, revalidated with ETags.
+
+    Entries are evicted least-recently-used first once the summed body
+    sizes exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'not_modified': 0,
+            'refreshed': 0,
+            'evictions': 0
+        }
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(token, url, params=None, accept=None):
+        """Build a cache key; the token is hashed so responses never leak across credentials."""
+        raw = json.dumps([token or '', url, sorted((params or {}).items()), accept], default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        """Return the entry for key (marking it recently used), or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def record_not_modified(self):
+        with self.lock:
+            self.stats['not_modified'] += 1
+
+    def store(self, key, etag, data, links, headers, size):
+        """
+        Store a parsed response body under key.
+
+        Returns:
+            dict: The stored entry (also returned when it was too large to keep)
+        """
+        entry = {
+            'etag': etag,
+            'data': data,
+            'links': links,
+            'headers': headers,
+            'size': size
+        }
+        if size > self.max_bytes:
+            return entry
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous['size']
+                self.stats['refreshed'] += 1
+            self.entries[key] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted['size']
+                self.stats['evictions'] += 1
+        return entry
+
+    def get_stats(self):
+        """Return cache occupancy and hit/miss/304 counters."""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                **self.stats
+            }
@@ -0,0 +1,76 @@
+"""
+Recovery of JSON documents from model responses.
+
+Most responses are pure JSON. The rest wrap the document in prose or a
+markdown code fence. extract_json handles both in one left-to-right
+pass. At each opening bracket, the C JSON decoder reads the candidate
+value in place, with no slicing or regex match first. A decoded value is
+offered to the caller, and the scan resumes after it. On a decoding
+error, the scan resumes at the point of failure. Anything between the
+bracket and that point was nested inside the failed candidate, so it is
+never a top-level document and never decoded twice.
+
+A pure-JSON response therefore costs exactly one parse. A 1 MB response
+wrapped in prose costs one parse plus a few failed attempts at the
+prose's own brackets. The greedy regex scans and repeated json.loads
+calls this replaces cost far more.
+"""
+import re
+import json
+
+_OPENING = re.compile(r'[{\[]')
+_decoder = json.JSONDecoder()
+
+
+def _is_document(value):
+    return isinstance(value, (dict, list))
+
+
+def extract_json(text, accept=None):
+    """
+    Return the first top-level JSON object or array in text that accept() takes.
+
+    Args:
+        text (str): Model output, possibly with prose or code fences around the JSON
+        accept (callable, optional): Predicate for decoded values; defaults to
+                                     accepting any object or array
+
+    Returns:
+        The decoded value, or None if the text holds no acceptable JSON
+    """
+    if not text:
+        return None
+    accept = accept or _is_document
+
+    position = 0
+    while True:
+        match = _OPENING.search(text, position)
+        if match is None:
+            return None
+        start = match.start()
+        try:
+            value, position = _decoder.raw_decode(text, start)
+        except json.JSONDecodeError as e:
+            position = max(e.pos, start + 1)
+            continue
+        if accept(value):
+            return value
+
+
+def task_list(value):
+    """Return value as a task array (a list of objects, bare or under "tasks"), or None."""
+    if isinstance(value, dict):
+        value = value.get('tasks')
+    if isinstance(value, list) and all(isinstance(task, dict) for task in value):
+        return value
+    return None
+
+
+def decode_task_list(text):
+    """
+    Find the updated task array in a model response.
+
+    Returns:
+        list: The tasks, or None if the response holds none
+    """
+    return task_list(extract_json(text, accept=lambda value: task_list(value) is not None))
@@ -0,0 +1,136 @@
+"""
+Request coalescing ("single flight") for identical calls in progress.
+
+A double-clicked Generate button or several tabs opening the same
+repository start identical calls at nearly the same moment. SingleFlight
+lets only the first of them (the leader) run. The others wait for the
+leader and share its result, or its exception. Only concurrent calls are
+merged; once a call finishes, the next identical one runs again, so
+SingleFlight sits in front of the response caches and does not replace
+them.
+
+Results are deep-copied for the callers that joined, so no caller can
+mutate another's data.
+"""
+import copy
+import asyncio
+import threading
+
+
+class _Call:
+    """One call in progress and the outcome its joined callers wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.task = None  # async calls only
+
+
+class SingleFlight:
+    """Merge identical concurrent calls, for threads (do) and for the event loop (ado)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.async_calls = {}  # (event loop, key) -> _Call with its task
+        self.stats = {
+            'calls': 0,
+            'executed': 0,
+            'coalesced': 0,
+            'errors': 0
+        }
+
+    def do(self, key, fn):
+        """
+        Run fn(), unless an identical call is already in progress on another thread.
+
+        Args:
+            key: Hashable identity of the call
+            fn (callable): Takes no arguments and performs the call
+
+        Returns:
+            fn's result (a copy of the leader's, for callers that joined)
+        """
+        with self.lock:
+            self.stats['calls'] += 1
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.stats['executed'] += 1
+            else:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self.lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+                shared = call.waiters
+            if shared:
+                # Copy for the joined callers before the leader's caller can modify it
+                call.result = copy.deepcopy(call.result)
+            call.done.set()
+
+    async def ado(self, key, coro_fn):
+        """
+        Await coro_fn(), unless an identical call is already in progress on this event loop.
+
+        The call runs as a task, so a caller that is cancelled leaves it
+        running for the others.
+
+        Args:
+            key: Hashable identity of the call
+            coro_fn (callable): Takes no arguments and returns a coroutine
+
+        Returns:
+            The coroutine's result (a copy, for callers that joined)
+        """
+        task_key = (asyncio.get_running_loop(), key)
+        with self.lock:
+            self.stats['calls'] += 1
+            call = self.async_calls.get(task_key)
+            leader = call is None
+            if leader:
+                call = self.async_calls[task_key] = _Call()
+                call.task = asyncio.ensure_future(coro_fn())
+                self.stats['executed'] += 1
+                # Runs before any awaiting caller resumes, so nobody joins a finished call
+                call.task.add_done_callback(lambda finished: self._finish_async(task_key, finished))
+            else:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+
+        result = await asyncio.shield(call.task)
+        # Everyone gets a copy once anyone joined, whoever resumes first
+        return copy.deepcopy(result) if call.waiters else result
+
+    def _finish_async(self, task_key, task):
+        with self.lock:
+            self.async_calls.pop(task_key, None)
+            if not task.cancelled() and task.exception() is not None:
+                self.stats['errors'] += 1
+
+    def get_stats(self):
+        """Return call counters; coalesced counts the calls that did not run themselves."""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self.calls) + len(self.async_calls)
+        stats['coalesced_rate'] = round(stats['coalesced'] / stats['calls'], 4) if stats['calls'] else 0.0
+        return stats
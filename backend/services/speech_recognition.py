@@ -0,0 +1,146 @@
+"""
+Continuous speech recognition over in-memory audio.
+
+recognize_once stops after the first utterance (about 15 seconds of
+speech). ContinuousTranscriber instead runs continuous recognition over
+a push stream holding the whole recording and gathers every recognized
+segment with its timing. Recognizers are bound to their audio stream, so
+each recording gets a new one built from the shared SpeechConfig. A
+bounded pool of slots caps how many run at once.
+"""
+import os
+import time
+import threading
+from azure.cognitiveservices.speech import (
+    AudioConfig,
+    SpeechRecognizer,
+    ResultReason,
+    CancellationReason
+)
+from azure.cognitiveservices.speech.audio import AudioStreamFormat, PushAudioInputStream
+from services.audio_normalizer import TARGET_RATE, TARGET_CHANNELS, TARGET_SAMPLE_WIDTH
+
+RECOGNIZER_POOL_SIZE = int(os.getenv('SPEECH_RECOGNIZER_POOL_SIZE', '4'))
+# Upper bound on one recognition, in seconds; recognition runs faster than real time
+RECOGNITION_TIMEOUT = float(os.getenv('SPEECH_RECOGNITION_TIMEOUT', '300'))
+
+# Speech SDK offsets and durations are in 100-nanosecond ticks
+TICKS_PER_SECOND = 10_000_000
+
+
+class SpeechRecognitionError(Exception):
+    """Raised when the Speech service cancels recognition with an error or times out."""
+
+
+class ContinuousTranscriber:
+    """Bounded pool of continuous speech recognizers sharing one SpeechConfig."""
+
+    def __init__(self, speech_config, pool_size=RECOGNIZER_POOL_SIZE, recognizer_factory=None, timeout=RECOGNITION_TIMEOUT):
+        """
+        Args:
+            speech_config (SpeechConfig): The already-built service configuration
+            pool_size (int): Maximum number of recognitions running at once
+            recognizer_factory (callable, optional): Takes raw 16 kHz mono s16le samples
+                and returns a recognizer; defaults to a SpeechRecognizer over a push
+                stream
+            timeout (float): Seconds to wait for a recognition session to finish
+        """
+        self.speech_config = speech_config
+        self.pool_size = pool_size
+        self.slots = threading.BoundedSemaphore(pool_size)
+        self.recognizer_factory = recognizer_factory or self._create_recognizer
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.stats = {
+            'active': 0,
+            'completed': 0,
+            'failed': 0,
+            'segments': 0,
+            'audio_seconds': 0.0,
+            'slot_wait_seconds': 0.0
+        }
+
+    def _create_recognizer(self, pcm):
+        """Build a recognizer reading pcm from a push stream."""
+        stream_format = AudioStreamFormat(
+            samples_per_second=TARGET_RATE,
+            bits_per_sample=TARGET_SAMPLE_WIDTH * 8,
+            channels=TARGET_CHANNELS
+        )
+        push_stream = PushAudioInputStream(stream_format)
+        push_stream.write(pcm)
+        # Closing marks the end of the audio, which ends the session once it has been recognized
+        push_stream.close()
+        return SpeechRecognizer(speech_config=self.speech_config, audio_config=AudioConfig(stream=push_stream))
+
+    def transcribe(self, pcm):
+        """
+        Recognize all speech in a recording.
+
+        Args:
+            pcm (bytes): Raw 16 kHz mono s16le samples
+
+        Returns:
+            list: Segments as {"text", "offset", "duration"}, with times in seconds
+        """
+        wait_start = time.perf_counter()
+        with self.slots:
+            with self.lock:
+                self.stats['slot_wait_seconds'] += time.perf_counter() - wait_start
+                self.stats['active'] += 1
+            try:
+                segments = self._run(pcm)
+            except Exception:
+                with self.lock:
+                    self.stats['failed'] += 1
+                raise
+            finally:
+                with self.lock:
+                    self.stats['active'] -= 1
+
+        with self.lock:
+            self.stats['completed'] += 1
+            self.stats['segments'] += len(segments)
+            self.stats['audio_seconds'] += len(pcm) / (TARGET_RATE * TARGET_SAMPLE_WIDTH * TARGET_CHANNELS)
+        return segments
+
+    def _run(self, pcm):
+        recognizer = self.recognizer_factory(pcm)
+        segments = []
+        errors = []
+        done = threading.Event()
+
+        def on_recognized(evt):
+            result = evt.result
+            if result.reason == ResultReason.RecognizedSpeech and result.text:
+                segments.append({
+                    'text': result.text,
+                    'offset': result.offset / TICKS_PER_SECOND,
+                    'duration': result.duration / TICKS_PER_SECOND
+                })
+
+        def on_canceled(evt):
+            # End of the push stream also arrives as a cancellation (EndOfStream)
+            details = evt.cancellation_details
+            if details.reason == CancellationReason.Error:
+                errors.append(details.error_details)
+            done.set()
+
+        recognizer.recognized.connect(on_recognized)
+        recognizer.canceled.connect(on_canceled)
+        recognizer.session_stopped.connect(lambda evt: done.set())
+
+        recognizer.start_continuous_recognition_async().get()
+        finished = done.wait(self.timeout)
+        recognizer.stop_continuous_recognition_async().get()
+
+        if errors:
+            raise SpeechRecognitionError(errors[0])
+        if not finished:
+            raise SpeechRecognitionError(f"Recognition did not finish within {self.timeout:g}s")
+        return sorted(segments, key=lambda segment: segment['offset'])
+
+    def get_stats(self):
+        """Return pool size, in-flight recognitions and totals."""
+        with self.lock:
+            return {'pool_size': self.pool_size, **self.stats}
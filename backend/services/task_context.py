@@ -0,0 +1,274 @@
+"""
+Pruned task context for voice edits on large plans.
+
+A voice edit usually touches a few tasks, yet the prompt used to carry
+the whole plan pretty-printed. The indentation alone added 30-40%, and
+a plan with hundreds of tasks would not fit in the context window.
+
+build_task_context serializes compactly. When the plan still exceeds
+the budget, it indexes every task and sub-task title and description
+with BM25 and keeps the items that best match the transcription. A
+matched task is sent whole. A matched sub-task is sent under a copy of
+its parent that lists only the matched sub-tasks. TaskContext.merge
+then puts the model's answer back into the full plan:
+- A shown item the model returns replaces the original.
+- A shown item the model leaves out is deleted.
+- An item the model was not shown is kept as it was.
+- New items are appended. An id that collides with an existing one is
+  replaced by a fresh id.
+"""
+import os
+import re
+import json
+import math
+from collections import Counter
+
+from services.token_budget import count_tokens
+
+# Plans whose compact JSON fits in this many tokens are sent whole
+TASK_CONTEXT_MAX_TOKENS = int(os.getenv('TASK_CONTEXT_MAX_TOKENS', '4000'))
+# Most matched tasks/sub-tasks sent for one edit
+TASK_CONTEXT_TOP_K = int(os.getenv('TASK_CONTEXT_TOP_K', '8'))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Matches scoring below this fraction of the best match are only noise from common words
+MIN_RELATIVE_SCORE = 0.25
+
+_WORD = re.compile(r'[a-z0-9]+')
+_STOPWORDS = frozenset(
+    'a an and are as at be by can do for from in into is it its me my of on or '
+    'our please so that the their them then there these this to up us was we '
+    'will with you your task tasks sub subtask subtasks'.split()
+)
+
+
+def compact_json(value):
+    """Serialize value without indentation or spaces after separators."""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def tokenize(text):
+    """Lowercase search terms of text, without stopwords."""
+    return [word for word in _WORD.findall((text or '').lower()) if word not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents, each a list of terms."""
+
+    def __init__(self, documents, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.frequencies = [Counter(terms) for terms in documents]
+        self.lengths = [len(terms) for terms in documents]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        document_frequency = Counter()
+        for frequency in self.frequencies:
+            document_frequency.update(frequency.keys())
+        count = len(documents)
+        self.idf = {
+            term: math.log(1 + (count - seen + 0.5) / (seen + 0.5))
+            for term, seen in document_frequency.items()
+        }
+
+    def scores(self, query_terms):
+        """Return the BM25 score of every document for the query terms."""
+        terms = [term for term in set(query_terms) if term in self.idf]
+        scores = []
+        for frequency, length in zip(self.frequencies, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.average_length) if self.average_length else self.k1
+            for term in terms:
+                tf = frequency.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+
+def _key(item_id):
+    return str(item_id)
+
+
+def _next_id(tasks):
+    """One more than the largest integer id among tasks and sub-tasks."""
+    largest = 0
+    for task in tasks:
+        for item in [task] + list(task.get('sub_tasks') or []):
+            item_id = item.get('id') if isinstance(item, dict) else None
+            if isinstance(item_id, int) or (isinstance(item_id, str) and item_id.isdigit()):
+                largest = max(largest, int(item_id))
+    return largest + 1
+
+
+def _merge_items(originals, returned, shown, next_id, merge_item=None):
+    """
+    Merge returned items into originals, where shown maps the keys of the items the model saw.
+
+    Returns:
+        tuple: (merged items, next free id)
+    """
+    by_key = {}
+    extra = []
+    for item in returned:
+        if isinstance(item, dict) and 'id' in item and _key(item['id']) in shown and _key(item['id']) not in by_key:
+            by_key[_key(item['id'])] = item
+        elif isinstance(item, dict):
+            extra.append(item)
+
+    merged = []
+    for item in originals:
+        key = _key(item['id'])
+        if key not in shown:
+            merged.append(item)
+        elif key in by_key:
+            updated = by_key[key]
+            merged.append(merge_item(item, updated, shown[key]) if merge_item else updated)
+
+    used = {_key(item['id']) for item in merged}
+    for item in extra:
+        if 'id' not in item or _key(item['id']) in used:
+            item = {**item, 'id': next_id}
+            next_id += 1
+        used.add(_key(item['id']))
+        merged.append(item)
+    return merged, next_id
+
+
+class TaskContext:
+    """The tasks sent with one voice edit, and the way back into the full plan."""
+
+    def __init__(self, tasks, shown=None):
+        """
+        Args:
+            tasks (list): The full plan
+            shown (dict, optional): Task key -> None (sent whole) or the set of sent
+                                    sub-task keys; None when the whole plan is sent
+        """
+        self.tasks = tasks
+        self.shown = shown
+        self.pruned = shown is not None
+        self.next_id = _next_id(tasks)
+        if self.pruned:
+            self.subset = []
+            for task in tasks:
+                sub_keys = shown.get(_key(task['id']), False)
+                if sub_keys is None:
+                    self.subset.append(task)
+                elif sub_keys is not False:
+                    sub_tasks = [sub for sub in task.get('sub_tasks') or [] if _key(sub['id']) in sub_keys]
+                    self.subset.append({**task, 'sub_tasks': sub_tasks})
+        else:
+            self.subset = tasks
+
+    def to_json(self):
+        """The compact JSON sent to the model."""
+        return compact_json(self.subset)
+
+    def merge(self, updated_tasks):
+        """
+        Apply the model's answer for the sent subset to the full plan.
+
+        Args:
+            updated_tasks (list): The tasks the model returned
+
+        Returns:
+            list: The full updated plan
+        """
+        if not self.pruned:
+            return updated_tasks
+
+        def merge_task(original, updated, sub_keys):
+            if sub_keys is None:
+                return updated
+            if 'sub_tasks' not in updated:
+                return {**updated, 'sub_tasks': original.get('sub_tasks') or []}
+            sub_tasks, self.next_id = _merge_items(
+                original.get('sub_tasks') or [],
+                updated.get('sub_tasks') or [],
+                dict.fromkeys(sub_keys),
+                self.next_id
+            )
+            return {**updated, 'sub_tasks': sub_tasks}
+
+        merged, self.next_id = _merge_items(self.tasks, updated_tasks, self.shown, self.next_id, merge_task)
+        return merged
+
+
+def _has_ids(tasks):
+    """Pruning needs every task and sub-task to carry a unique id within its list."""
+    task_keys = set()
+    for task in tasks:
+        if not isinstance(task, dict) or 'id' not in task:
+            return False
+        task_keys.add(_key(task['id']))
+        sub_tasks = task.get('sub_tasks') or []
+        if not isinstance(sub_tasks, list) or not all(isinstance(sub, dict) and 'id' in sub for sub in sub_tasks):
+            return False
+        if len({_key(sub['id']) for sub in sub_tasks}) != len(sub_tasks):
+            return False
+    return len(task_keys) == len(tasks)
+
+
+def build_task_context(tasks, query, max_tokens=None, top_k=None):
+    """
+    Choose the part of a plan to send with a voice edit.
+
+    Args:
+        tasks (list): The full plan (tasks with sub_tasks)
+        query (str): The transcription of the voice edit
+        max_tokens (int, optional): Token budget for the sent JSON
+        top_k (int, optional): Most matched tasks and sub-tasks to send
+
+    Returns:
+        TaskContext: The whole plan if it fits the budget (or cannot be pruned
+                     safely), otherwise the best matches and their parents
+    """
+    max_tokens = TASK_CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+    top_k = TASK_CONTEXT_TOP_K if top_k is None else top_k
+
+    if not isinstance(tasks, list) or count_tokens(compact_json(tasks)) <= max_tokens or not _has_ids(tasks):
+        return TaskContext(tasks)
+
+    # One document per task and per sub-task; the owner is (task index, sub-task index or None)
+    owners = []
+    documents = []
+    for task_index, task in enumerate(tasks):
+        owners.append((task_index, None))
+        documents.append(tokenize(f"{task.get('title', '')} {task.get('description', '')}"))
+        for sub_index, sub in enumerate(task.get('sub_tasks') or []):
+            owners.append((task_index, sub_index))
+            documents.append(tokenize(f"{sub.get('title', '')} {sub.get('description', '')}"))
+
+    scores = BM25Index(documents).scores(tokenize(query))
+    best = max(scores, default=0.0)
+    ranked = sorted(
+        (index for index, score in enumerate(scores) if score > 0 and score >= best * MIN_RELATIVE_SCORE),
+        key=lambda index: -scores[index]
+    )
+
+    shown = {}
+    used = 0
+    for index in ranked[:top_k]:
+        task_index, sub_index = owners[index]
+        task = tasks[task_index]
+        task_key = _key(task['id'])
+        if sub_index is None:
+            if shown.get(task_key, False) is None:
+                continue
+            cost = count_tokens(compact_json(task))
+            candidate = None
+        else:
+            sub_keys = shown.get(task_key, False)
+            if sub_keys is None:
+                continue  # its whole parent is already sent
+            sub = task['sub_tasks'][sub_index]
+            cost = count_tokens(compact_json(sub))
+            if sub_keys is False:
+                cost += count_tokens(compact_json({k: v for k, v in task.items() if k != 'sub_tasks'}))
+            candidate = (sub_keys or set()) | {_key(sub['id'])}
+        if used + cost > max_tokens:
+            continue
+        used += cost
+        shown[task_key] = candidate
+    return TaskContext(tasks, shown)
@@ -0,0 +1,282 @@
+"""
+In-memory snapshots of repository task trees, kept fresh by GitHub webhooks.
+
+A snapshot holds the raw issues and sub-issue links of a repository next
+to the assembled task tree and its serialized JSON, so the tasks endpoint
+can answer without calling GitHub. `issues` and `sub_issues` webhook
+events patch the raw data and re-assemble the tree in memory.
+"""
+import os
+import json
+import hmac
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from services.task_tree import build_task_tree
+
+WEBHOOK_SECRET = os.getenv('GITHUB_WEBHOOK_SECRET')
+# Without webhooks nothing keeps a snapshot current, so let it expire quickly;
+# with webhooks configured snapshots live until invalidated (0 = no expiry).
+SNAPSHOT_TTL = float(os.getenv('GITHUB_TASK_SNAPSHOT_TTL', '0' if WEBHOOK_SECRET else '60'))
+# Most repositories kept; the least recently used snapshot is dropped first (0 = unbounded)
+SNAPSHOT_MAX_REPOS = int(os.getenv('GITHUB_TASK_SNAPSHOT_MAX_REPOS', '100'))
+
+# Webhook actions that remove an issue from the repository
+ISSUE_REMOVED_ACTIONS = ('deleted', 'transferred')
+
+
+def verify_webhook_signature(body, signature, secret=WEBHOOK_SECRET):
+    """
+    Check the X-Hub-Signature-256 header of a webhook delivery.
+
+    Args:
+        body (bytes): The raw request body
+        signature (str): The header value, e.g. "sha256=<hex digest>"
+        secret (str): The webhook secret configured on GitHub
+
+    Returns:
+        bool: True if the signature matches
+    """
+    if not secret or not signature or not signature.startswith('sha256='):
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len('sha256='):])
+
+
+def _issue_from_payload(issue):
+    """Convert a webhook issue object to the format of GitHubService.iter_repository_issues."""
+    labels = [label['name'] for label in issue.get('labels', [])]
+    return {
+        'id': issue['number'],
+        'title': issue['title'],
+        'description': issue.get('body'),
+        'url': issue.get('html_url'),
+        'state': issue.get('state'),
+        'labels': labels,
+        'is_broad_goal': 'broad-goal' in labels,
+        'is_specific_goal': 'specific-goal' in labels
+    }
+
+
+class TaskSnapshotStore:
+    """Per-repository task tree snapshots with webhook-driven updates."""
+
+    def __init__(self, ttl=SNAPSHOT_TTL, max_repos=SNAPSHOT_MAX_REPOS):
+        self.ttl = ttl
+        self.max_repos = max_repos
+        self.snapshots = OrderedDict()
+        # Generation of each repository, bumped on every invalidation. A build that
+        # started before an invalidation read pre-write data and is not kept.
+        # Values come from one store-wide counter, so a dropped entry never comes back
+        # with a value an older build saw.
+        self.generations = OrderedDict()
+        self.generation_counter = 0
+        self.lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'builds': 0,
+            'stale_builds': 0,
+            'evictions': 0,
+            'webhook_updates': 0,
+            'webhook_ignored': 0,
+            'invalidations': 0
+        }
+
+    def get_payload(self, repo_name):
+        """
+        Get the serialized tasks response for a repository.
+
+        Returns:
+            str or None: The JSON document, or None if there is no fresh snapshot
+        """
+        with self.lock:
+            snapshot = self.snapshots.get(repo_name)
+            if snapshot and (not self.ttl or time.monotonic() - snapshot['built_at'] < self.ttl):
+                self.snapshots.move_to_end(repo_name)
+                self.stats['hits'] += 1
+                return snapshot['payload']
+            self.stats['misses'] += 1
+            return None
+
+    def build(self, repo_name, issues, get_sub_issues, owner=None):
+        """
+        Build the task tree for a repository and keep a snapshot of it.
+
+        Args:
+            repo_name (str): The name of the repository
+            issues (iterable): Issues as returned by GitHubService.iter_repository_issues
+            get_sub_issues (callable): Sub-issue lookup as accepted by build_task_tree
+            owner (str, optional): Repository owner, used to match webhook deliveries
+
+        Returns:
+            str: The serialized tasks response (not kept if the repository was
+                 invalidated while it was being built)
+        """
+        with self.lock:
+            generation = self.generations.get(repo_name, 0)
+        raw_issues = OrderedDict()
+        sub_issues = {}
+
+        def collect(source):
+            for issue in source:
+                raw_issues.setdefault(issue['id'], issue)
+                yield issue
+
+        def recording_lookup(parent_id):
+            try:
+                result = get_sub_issues(parent_id)
+            except Exception:
+                # Remember the failure so rebuilds keep using the description fallback
+                sub_issues[parent_id] = None
+                raise
+            sub_issues[parent_id] = [{'number': item.get('number')} for item in result]
+            return result
+
+        tasks = build_task_tree(collect(issues), recording_lookup)
+        snapshot = {
+            'owner': owner,
+            'issues': raw_issues,
+            'sub_issues': sub_issues,
+            'built_at': time.monotonic()
+        }
+        snapshot['payload'] = self._serialize(tasks)
+
+        with self.lock:
+            self.stats['builds'] += 1
+            if self.generations.get(repo_name, 0) != generation:
+                self.stats['stale_builds'] += 1
+                return snapshot['payload']
+            self.snapshots[repo_name] = snapshot
+            self.snapshots.move_to_end(repo_name)
+            while self.max_repos and len(self.snapshots) > self.max_repos:
+                self.snapshots.popitem(last=False)
+                self.stats['evictions'] += 1
+        return snapshot['payload']
+
+    def invalidate(self, repo_name):
+        """Drop the snapshot of a repository (e.g. after a write made through this server)."""
+        with self.lock:
+            self._invalidate(repo_name)
+
+    def _invalidate(self, repo_name):
+        self.generation_counter += 1
+        self.generations[repo_name] = self.generation_counter
+        self.generations.move_to_end(repo_name)
+        # Only builds in flight need an old generation; a dropped entry just discards them
+        while self.max_repos and len(self.generations) > self.max_repos:
+            self.generations.popitem(last=False)
+        if self.snapshots.pop(repo_name, None) is not None:
+            self.stats['invalidations'] += 1
+
+    def apply_webhook(self, event, payload):
+        """
+        Apply an `issues` or `sub_issues` webhook delivery to the matching snapshot.
+
+        Returns:
+            bool: True if a snapshot was updated (or dropped because the change
+                  cannot be applied to it)
+        """
+        repository = payload.get('repository') or {}
+        repo_name = repository.get('name')
+        owner = (repository.get('owner') or {}).get('login')
+
+        with self.lock:
+            snapshot = self.snapshots.get(repo_name)
+            if snapshot is None:
+                if repo_name and event in ('issues', 'sub_issues'):
+                    # A build of this repository may be in flight; it read the
+                    # repository before this change, so it must not be kept
+                    self._invalidate(repo_name)
+                self.stats['webhook_ignored'] += 1
+                return False
+            if snapshot['owner'] and owner and snapshot['owner'].lower() != owner.lower():
+                self.stats['webhook_ignored'] += 1
+                return False
+
+            if event == 'issues':
+                applied = self._apply_issue_event(snapshot, payload)
+            elif event == 'sub_issues':
+                applied = self._apply_sub_issue_event(snapshot, payload)
+            else:
+                applied = False
+
+            if applied is None:
+                # The next request rebuilds the repository from GitHub
+                self._invalidate(repo_name)
+                return True
+            if not applied:
+                self.stats['webhook_ignored'] += 1
+                return False
+
+            self._rebuild(snapshot)
+            self.stats['webhook_updates'] += 1
+            return True
+
+    def _apply_issue_event(self, snapshot, payload):
+        issue = payload.get('issue')
+        if not issue or 'number' not in issue:
+            return False
+
+        issues = snapshot['issues']
+        number = issue['number']
+        if payload.get('action') in ISSUE_REMOVED_ACTIONS:
+            issues.pop(number, None)
+            snapshot['sub_issues'].pop(number, None)
+            for children in snapshot['sub_issues'].values():
+                if children:
+                    children[:] = [child for child in children if child['number'] != number]
+            return True
+
+        is_new = number not in issues
+        issues[number] = _issue_from_payload(issue)
+        if is_new:
+            # GitHub lists issues newest first
+            issues.move_to_end(number, last=False)
+        return True
+
+    def _apply_sub_issue_event(self, snapshot, payload):
+        parent = payload.get('parent_issue')
+        child = payload.get('sub_issue')
+        if not parent or not child:
+            return False
+
+        sub_issues = snapshot['sub_issues']
+        if parent['number'] in sub_issues and sub_issues[parent['number']] is None:
+            # The parent's children came from its description because the lookup
+            # failed; one link says nothing about the others, so drop the snapshot
+            return None
+        children = sub_issues.setdefault(parent['number'], [])
+        # GitHub delivers both the sub_issue_* and parent_issue_* view of each change
+        children[:] = [item for item in children if item['number'] != child['number']]
+        if payload.get('action') in ('sub_issue_added', 'parent_issue_added'):
+            children.append({'number': child['number']})
+        return True
+
+    def _rebuild(self, snapshot):
+        sub_issues = snapshot['sub_issues']
+
+        def lookup(parent_id):
+            children = sub_issues.get(parent_id, [])
+            if children is None:
+                raise Exception("Sub-issues were unavailable when the snapshot was built")
+            return children
+
+        tasks = build_task_tree(snapshot['issues'].values(), lookup)
+        snapshot['payload'] = self._serialize(tasks)
+
+    @staticmethod
+    def _serialize(tasks):
+        return json.dumps({"success": True, "tasks": tasks})
+
+    def get_stats(self):
+        """Return snapshot counts and hit/miss/update counters."""
+        with self.lock:
+            return {
+                'repositories': len(self.snapshots),
+                'ttl_seconds': self.ttl,
+                'max_repositories': self.max_repos,
+                'webhook_secret_configured': bool(WEBHOOK_SECRET),
+                **self.stats
+            }
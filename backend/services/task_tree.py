@@ -0,0 +1,124 @@
+"""
+Assembly of the parent/child task tree shown for a repository.
+
+Issues are indexed by number once, and every description is scanned a
+single time for "#123" references, so building the tree is linear in the
+number of issues plus sub-issue links.
+"""
+import re
+
+ISSUE_REFERENCE_RE = re.compile(r'#(\d+)')
+
+
+def _scan_references(description):
+    """
+    Scan a description once for issue references.
+
+    Returns:
+        tuple: (refs, prefixes) where refs are the referenced issue numbers in
+               order of appearance, and prefixes are every number n for which
+               the substring "#n" occurs (e.g. "#123" also contains "#1" and
+               "#12"), matching a plain substring test
+    """
+    refs = []
+    prefixes = set()
+    for match in ISSUE_REFERENCE_RE.finditer(description):
+        digits = match.group(1)
+        refs.append(int(digits))
+        if digits[0] != '0':
+            for end in range(1, len(digits) + 1):
+                prefixes.add(int(digits[:end]))
+    return refs, prefixes
+
+
+def build_task_tree(issues, get_sub_issues):
+    """
+    Build the task list for a repository from its issues.
+
+    Args:
+        issues (iterable): Issues in the format returned by
+                           GitHubService.iter_repository_issues
+        get_sub_issues (callable): Takes a parent issue number and returns its
+                                   sub-issues (dicts with a 'number' key). If it
+                                   raises, children are matched to that parent by
+                                   "#<number>" references in their descriptions.
+
+    Returns:
+        list: Task dicts with number, title, body, is_parent and parent_id
+    """
+    tasks = []
+    parent_tasks = []
+    child_tasks = []
+    task_by_number = {}
+    description_by_number = {}
+
+    # First pass: create task objects; labels decide parent vs child, unlabeled issues are parents
+    for issue in issues:
+        is_parent = issue['is_broad_goal'] or not issue['is_specific_goal']
+        task = {
+            'number': issue['id'],
+            'title': issue['title'],
+            'body': issue['description'],
+            'is_parent': is_parent,
+            'parent_id': None
+        }
+        tasks.append(task)
+        task_by_number.setdefault(task['number'], task)
+        description_by_number.setdefault(issue['id'], issue['description'])
+
+        if is_parent:
+            parent_tasks.append(task)
+        else:
+            child_tasks.append(task)
+
+    # Description references of every child, scanned at most once
+    references = {}
+
+    def child_references(child):
+        number = child['number']
+        if number not in references:
+            references[number] = _scan_references(description_by_number.get(number) or '')
+        return references[number]
+
+    # Children indexed by every parent number their description mentions, built on first use
+    children_by_reference = None
+
+    # Second pass: link sub-issues to their parents
+    for parent_task in parent_tasks:
+        parent_id = parent_task['number']
+        try:
+            sub_issues = get_sub_issues(parent_id)
+        except Exception as sub_err:
+            # The sub-issues API failed (e.g. not enabled for this repo); fall back to description references
+            print(f"Failed to get sub-issues for parent #{parent_id}, using description references: {str(sub_err)}")
+            if children_by_reference is None:
+                children_by_reference = {}
+                for child in child_tasks:
+                    for number in child_references(child)[1]:
+                        children_by_reference.setdefault(number, []).append(child)
+            for child in children_by_reference.get(parent_id, []):
+                if child['parent_id'] is None:
+                    child['parent_id'] = parent_id
+            continue
+
+        for sub_issue in sub_issues:
+            child_task = task_by_number.get(sub_issue.get('number'))
+            if child_task:
+                child_task['parent_id'] = parent_id
+                child_task['is_parent'] = False
+
+    # Third pass: remaining children take the parent task their description references
+    parent_numbers = {task['number'] for task in parent_tasks}
+    for task in child_tasks:
+        if task['parent_id'] is None:
+            parent_refs = {number for number in child_references(task)[0] if number in parent_numbers}
+            if parent_refs:
+                task['parent_id'] = next(iter(parent_refs))
+
+    print(f"Processed {len(parent_tasks)} parent tasks and {len(child_tasks)} child tasks")
+
+    # Ensure we have at least one parent task
+    if not parent_tasks and tasks:
+        tasks[0]['is_parent'] = True
+
+    return tasks
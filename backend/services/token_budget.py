@@ -0,0 +1,196 @@
+"""
+Token estimates for Azure OpenAI requests, used to size max_tokens.
+
+Azure counts max_tokens against the deployment's tokens-per-minute quota
+when a request is admitted, so a flat 4000-5000 per call reserves far
+more than most planning calls use. Prompts are counted with tiktoken when
+it is installed (point TIKTOKEN_CACHE_DIR at a directory holding the
+encoding file to avoid downloading it at start-up), or estimated at about
+four characters per token otherwise. Completion budgets come from the
+shape of the expected output.
+
+Every call records its estimate next to the reported usage, so the
+budgets can be tuned from /api/metrics.
+"""
+import os
+import json
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+TOKENIZER_ENCODING = os.getenv('TOKENIZER_ENCODING', 'o200k_base')  # the gpt-4o family
+# Headroom multiplied onto every completion estimate
+TOKEN_BUDGET_MARGIN = float(os.getenv('TOKEN_BUDGET_MARGIN', '1.3'))
+TOKEN_BUDGET_MIN = int(os.getenv('TOKEN_BUDGET_MIN', '256'))
+# Largest completion any call may reserve (gpt-4o and gpt-4o-mini allow 16384)
+TOKEN_BUDGET_MAX = int(os.getenv('TOKEN_BUDGET_MAX', '16384'))
+
+# Chat framing per message, plus the priming of the assistant reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Typical sizes of the JSON the prompts ask for, in tokens
+GOAL_TOKENS = 70  # id, title, description
+SUB_TASK_TOKENS = 55
+EXPECTED_GOALS = int(os.getenv('TOKEN_BUDGET_EXPECTED_GOALS', '8'))
+EXPECTED_SUB_TASKS = int(os.getenv('TOKEN_BUDGET_EXPECTED_SUB_TASKS', '5'))
+EXPECTED_SMALLER_GOALS = 5  # BREAK_DOWN_GOAL_PROMPT asks for 3-5
+REPO_INFO_TOKENS = 80
+# Voice edits in patch mode: one JSON Patch operation with a short value
+PATCH_OPERATION_TOKENS = 45
+EXPECTED_PATCH_OPERATIONS = int(os.getenv('TOKEN_BUDGET_EXPECTED_PATCH_OPS', '20'))
+# Summaries of speech; people speak about 2.5 words (~3.5 tokens) per second
+SUMMARY_TOKENS_PER_AUDIO_SECOND = 3
+SUMMARY_BASE_TOKENS = 200
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if tiktoken is None or _encoding_failed:
+        return None
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_failed:
+                try:
+                    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception as e:
+                    # No cached encoding file and no network: fall back to the heuristic
+                    print(f"Token estimator falling back to character counts: {str(e)}")
+                    _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text):
+    """Count (or estimate) the tokens in a string."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages):
+    """
+    Count the prompt tokens of chat messages.
+
+    Text parts are counted; input_audio parts are skipped, since audio is
+    billed separately and does not count toward max_tokens.
+    """
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE
+        content = message.get('content')
+        if isinstance(content, str):
+            total += count_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get('type') == 'text':
+                    total += count_tokens(part.get('text'))
+    return total
+
+
+def _clamp(tokens):
+    return max(TOKEN_BUDGET_MIN, min(TOKEN_BUDGET_MAX, int(tokens * TOKEN_BUDGET_MARGIN)))
+
+
+def goals_budget(goals=EXPECTED_GOALS, sub_tasks=EXPECTED_SUB_TASKS):
+    """Completion budget for a goals document with the given shape."""
+    return _clamp(40 + goals * (GOAL_TOKENS + sub_tasks * SUB_TASK_TOKENS))
+
+
+def break_down_budget(smaller_goals=EXPECTED_SMALLER_GOALS):
+    """Completion budget for one goal breakdown."""
+    return _clamp(30 + smaller_goals * GOAL_TOKENS)
+
+
+def repo_info_budget():
+    """Completion budget for a repository name and description."""
+    return _clamp(REPO_INFO_TOKENS)
+
+
+def rewrite_budget(document):
+    """Completion budget for a model that returns an edited copy of a JSON document plus a short reply."""
+    text = document if isinstance(document, str) else json.dumps(document)
+    return _clamp(count_tokens(text) + 300)
+
+
+def patch_budget(operations=EXPECTED_PATCH_OPERATIONS):
+    """Completion budget for a transcription plus a JSON Patch, independent of the document size."""
+    return _clamp(80 + operations * PATCH_OPERATION_TOKENS)
+
+
+def summary_budget(audio_seconds, cap=None):
+    """Completion budget for summarizing a recording of the given length."""
+    budget = _clamp(SUMMARY_BASE_TOKENS + audio_seconds * SUMMARY_TOKENS_PER_AUDIO_SECOND)
+    return min(budget, cap) if cap else budget
+
+
+class TokenUsageRecorder:
+    """Per-call-kind totals of estimated versus reported token usage."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.kinds = {}
+
+    def record(self, kind, estimated_prompt, max_tokens, response):
+        """
+        Record one completion.
+
+        Args:
+            kind (str): Call site, e.g. "goals" or "modify_tasks_voice"
+            estimated_prompt (int): count_message_tokens of the request
+            max_tokens (int): The completion budget that was requested
+            response: The chat completion (its usage and finish_reason are read)
+
+        cached_prompt_tokens counts the prompt tokens the provider served from its
+        prompt cache (usage.prompt_tokens_details.cached_tokens).
+        """
+        usage = getattr(response, 'usage', None)
+        choices = getattr(response, 'choices', None) or []
+        truncated = bool(choices) and getattr(choices[0], 'finish_reason', None) == 'length'
+        with self.lock:
+            stats = self.kinds.setdefault(kind, {
+                'calls': 0,
+                'estimated_prompt_tokens': 0,
+                'prompt_tokens': 0,
+                'cached_prompt_tokens': 0,
+                'reserved_completion_tokens': 0,
+                'completion_tokens': 0,
+                'truncated': 0
+            })
+            stats['calls'] += 1
+            stats['estimated_prompt_tokens'] += estimated_prompt
+            stats['reserved_completion_tokens'] += max_tokens
+            if usage is not None:
+                stats['prompt_tokens'] += getattr(usage, 'prompt_tokens', 0) or 0
+                details = getattr(usage, 'prompt_tokens_details', None)
+                if isinstance(details, dict):
+                    cached = details.get('cached_tokens')
+                else:
+                    cached = getattr(details, 'cached_tokens', None)
+                stats['cached_prompt_tokens'] += cached or 0
+                stats['completion_tokens'] += getattr(usage, 'completion_tokens', 0) or 0
+            if truncated:
+                stats['truncated'] += 1
+
+    def get_stats(self):
+        """Return the totals per kind plus the tokenizer in use."""
+        with self.lock:
+            kinds = {kind: dict(stats) for kind, stats in self.kinds.items()}
+        for stats in kinds.values():
+            stats['cached_prompt_rate'] = round(stats['cached_prompt_tokens'] / stats['prompt_tokens'], 4) if stats['prompt_tokens'] else 0.0
+        return {
+            'tokenizer': TOKENIZER_ENCODING if _get_encoding() is not None else 'chars/4',
+            'kinds': kinds
+        }
+
+
+token_usage = TokenUsageRecorder()
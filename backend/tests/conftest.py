@@ -0,0 +1,23 @@
+"""
+Shared setup for the backend tests.
+
+The services read their settings at import time, so the environment is
+prepared here, before any test module imports app. Nothing reaches Azure
+or GitHub: the tests replace the service calls they exercise.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_data_dir = tempfile.mkdtemp(prefix='backend-tests-')
+os.environ['PLAN_STORE_PATH'] = os.path.join(_data_dir, 'plans.db')
+os.environ.setdefault('AZURE_SPEECH_KEY', 'test-speech-key')
+os.environ.setdefault('GITHUB_TOKEN', 'test-token')
+os.environ['AUDIO_DECODE_WORKERS'] = '0'
+
+import app  # noqa: E402
+
+app.create_app()
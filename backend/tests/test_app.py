@@ -0,0 +1,18 @@
+"""Tests of the Flask app as a whole: it imports, and its routes work together."""
+import os
+import runpy
+
+import app as app_module
+import asgi
+
+
+def test_app_and_asgi_import():
+    assert app_module.app is not None
+    assert asgi.application is not None
+
+
+def test_rerunning_the_script_builds_no_services():
+    # What a spawned audio decode worker does with the main script of python app.py
+    namespace = runpy.run_path(os.path.join(os.path.dirname(app_module.__file__), 'app.py'), run_name='__mp_main__')
+    assert namespace['plan_store'] is None
+    assert namespace['azure_service'] is None
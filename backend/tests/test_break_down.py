@@ -0,0 +1,50 @@
+"""Batch goal break-down: request validation happens before the stream starts."""
+import json
+
+import pytest
+
+import app as app_module
+
+GOALS = [{'goal_id': 1, 'goal_title': 'Build the API', 'goal_description': 'REST endpoints'},
+         {'goal_id': 2, 'goal_title': 'Ship the UI', 'goal_description': 'Pages'}]
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def break_down_goal(goal_id, goal_title, goal_description, timeout=None):
+        calls.append((goal_id, timeout))
+        return [{'id': goal_id * 100 + 1, 'title': f'{goal_title} step', 'description': ''}]
+
+    monkeypatch.setattr(app_module.azure_service, 'break_down_goal', break_down_goal)
+    return calls
+
+
+def messages(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+def test_numeric_strings_are_parsed_and_clamped(calls):
+    client = app_module.app.test_client()
+    response = client.post('/api/break-down-goals', json={'goals': GOALS, 'max_concurrency': '3', 'timeout': '1e9'})
+    assert response.status_code == 200
+    assert messages(response)[-1] == {'type': 'done', 'completed': 2, 'failed': 0}
+    assert {timeout for _, timeout in calls} == {app_module.BREAKDOWN_TIMEOUT}
+
+
+@pytest.mark.parametrize('body', [
+    {'goals': GOALS, 'max_concurrency': 'three'},
+    {'goals': GOALS, 'max_concurrency': [3]},
+    {'goals': GOALS, 'timeout': 'soon'},
+    {'goals': GOALS, 'timeout': 0},
+    {'goals': GOALS, 'timeout': True},
+    {'goals': {'goal_id': 1}},
+    {'goals': 'Build the API'},
+    {'goals': ['Build the API']},
+])
+def test_bad_input_is_rejected_before_streaming(calls, body):
+    response = app_module.app.test_client().post('/api/break-down-goals', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert calls == []
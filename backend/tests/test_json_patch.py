@@ -0,0 +1,57 @@
+"""JSON Patch over ID-keyed documents."""
+import pytest
+
+from services.json_patch import apply_patch, JSONPatchError
+
+TASKS = [
+    {'id': 1, 'title': 'Build the API', 'sub_tasks': [{'id': 101, 'title': 'Schema'}, {'id': 102, 'title': 'Routes'}]},
+    {'id': 2, 'title': 'Ship the UI', 'sub_tasks': []}
+]
+
+
+def test_paths_address_items_by_id():
+    patched = apply_patch(TASKS, [
+        {'op': 'replace', 'path': '/1/sub_tasks/102/title', 'value': 'Endpoints'},
+        {'op': 'remove', 'path': '/2'},
+    ])
+    assert patched == [{'id': 1, 'title': 'Build the API',
+                        'sub_tasks': [{'id': 101, 'title': 'Schema'}, {'id': 102, 'title': 'Endpoints'}]}]
+    assert TASKS[0]['sub_tasks'][1]['title'] == 'Routes'
+
+
+def test_add_appends_new_ids():
+    patched = apply_patch(TASKS, [
+        {'op': 'add', 'path': '/-', 'value': {'id': 3, 'title': 'Write docs'}},
+        {'op': 'add', 'path': '/1/sub_tasks/103', 'value': {'title': 'Auth'}},
+    ])
+    assert [task['id'] for task in patched] == [1, 2, 3]
+    assert patched[0]['sub_tasks'][-1] == {'id': 103, 'title': 'Auth'}
+
+
+@pytest.mark.parametrize('operation', [
+    {'op': 'add', 'path': '/1', 'value': {'id': 1, 'title': 'Clobbered'}},
+    {'op': 'add', 'path': '/1/sub_tasks/101', 'value': {'title': 'Clobbered'}},
+    {'op': 'add', 'path': '/-', 'value': {'id': 2, 'title': 'Clobbered'}},
+    {'op': 'copy', 'from': '/1/sub_tasks/101', 'path': '/1/sub_tasks/-'},
+])
+def test_add_never_replaces_an_existing_item(operation):
+    with pytest.raises(JSONPatchError, match='already exists'):
+        apply_patch(TASKS, [operation])
+
+
+@pytest.mark.parametrize('operation', [
+    {'op': 'move', 'from': '/1', 'path': 5},
+    {'op': 'copy', 'from': None, 'path': '/3'},
+    {'op': 'add', 'path': '/-', 'value': {'id': [3]}},
+    {'op': 'add', 'path': '/-', 'value': {'id': True}},
+    {'op': 'replace', 'path': '/9/title', 'value': 'Missing'},
+])
+def test_malformed_operations_are_rejected(operation):
+    with pytest.raises(JSONPatchError):
+        apply_patch(TASKS, [operation])
+
+
+def test_a_failing_patch_changes_nothing():
+    with pytest.raises(JSONPatchError):
+        apply_patch(TASKS, [{'op': 'remove', 'path': '/2'}, {'op': 'test', 'path': '/1/title', 'value': 'Other'}])
+    assert [task['id'] for task in TASKS] == [1, 2]
@@ -0,0 +1,112 @@
+"""Plan endpoints: goals generated by /api/analyze are reused through plan_id."""
+import pytest
+
+import app as app_module
+from services.plan_store import InvalidPlanError, plan_goal, plan_goal_titles, plan_issue_goals
+
+GOALS = [
+    {'id': 1, 'title': 'Build the API', 'description': 'REST endpoints',
+     'sub_tasks': [{'id': 11, 'title': 'Schema', 'description': 'Tables'}]},
+    {'id': 2, 'title': 'Ship the UI', 'description': 'Pages',
+     'smaller_goals': [{'id': 21, 'title': 'Login page', 'description': 'Form'}]}
+]
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {}
+        self.links = {}
+        self.text = str(body)
+        self.content = self.text.encode('utf-8')
+
+    def json(self):
+        return self.body
+
+
+class FakeGitHub:
+    """Answers the GitHubService requests create-issues makes."""
+
+    def __init__(self):
+        self.created = []
+        self.links = []
+
+    def request(self, method, url, is_write=None, **kwargs):
+        if method == 'GET' and url.endswith('/user'):
+            return FakeResponse(200, {'login': 'octo'})
+        if method == 'POST' and url.endswith('/issues'):
+            number = len(self.created) + 100
+            self.created.append(kwargs['json'])
+            return FakeResponse(201, {**kwargs['json'], 'number': number, 'id': number * 10, 'state': 'open',
+                                      'html_url': f'https://github.com/octo/repo/issues/{number}'})
+        if method == 'POST' and url.endswith('/sub_issues'):
+            self.links.append((url, kwargs['json']))
+            return FakeResponse(201, {})
+        raise AssertionError(f"Unexpected GitHub request {method} {url}")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module.azure_service, 'generate_goals', lambda prompt: {'goals': GOALS})
+    return app_module.app.test_client()
+
+
+def test_analyze_then_create_issues_from_plan_id(client, monkeypatch):
+    github = FakeGitHub()
+    monkeypatch.setattr(app_module.github_service, '_request', github.request)
+
+    analyzed = client.post('/api/analyze', json={'prompt': 'A todo app'})
+    assert analyzed.status_code == 200
+    body = analyzed.get_json()
+    assert body['big_goals'] == {'goals': GOALS}
+    assert app_module.plan_store.get(body['plan_id'])['plan']['goals'] == GOALS
+
+    created = client.post('/api/create-issues', json={'repo_name': 'repo', 'plan_id': body['plan_id'], 'max_workers': 2})
+    assert created.status_code == 200, created.get_json()
+    assert created.get_json()['success'] is True
+    assert sorted(issue['title'] for issue in github.created) == ['Build the API', 'Login page', 'Schema', 'Ship the UI']
+    assert len(github.links) == 2
+
+
+def test_plan_id_routes_read_the_stored_goals(client, monkeypatch):
+    plan_id = client.post('/api/analyze', json={'prompt': 'A todo app'}).get_json()['plan_id']
+    seen = {}
+
+    def generate_repo_info(prompt, goals):
+        seen['goals'] = goals
+        return {'name': 'todo-app', 'description': 'A todo app'}
+
+    monkeypatch.setattr(app_module.azure_service, 'generate_repo_info', generate_repo_info)
+    response = client.post('/api/generate-repo-info', json={'plan_id': plan_id})
+    assert response.status_code == 200
+    assert seen['goals'] == 'Build the API\nShip the UI'
+
+    # Goal 2 already has a break-down in the plan, so no model call is made
+    response = client.post('/api/break-down-goal', json={'plan_id': plan_id, 'goal_id': 2})
+    assert response.status_code == 200
+    assert response.get_json()['smaller_goals'] == GOALS[1]['smaller_goals']
+
+
+def test_malformed_stored_plan_is_a_client_error(client):
+    plan_id, _ = app_module.plan_store.create({'prompt': 'x', 'goals': {'goals': GOALS}}, 'test')
+    for path, body in [
+        ('/api/break-down-goal', {'plan_id': plan_id, 'goal_id': 1}),
+        ('/api/break-down-goals', {'plan_id': plan_id}),
+        ('/api/generate-repo-info', {'plan_id': plan_id}),
+        ('/api/create-issues', {'plan_id': plan_id, 'repo_name': 'repo'}),
+    ]:
+        response = client.post(path, json=body)
+        assert response.status_code == 422, path
+
+
+@pytest.mark.parametrize('plan', [{'goals': {'goals': []}}, {'goals': ['title']}, []])
+def test_plan_helpers_reject_malformed_documents(plan):
+    for helper in (lambda: plan_goal(plan, 1), lambda: plan_goal_titles(plan), lambda: plan_issue_goals(plan)):
+        with pytest.raises(InvalidPlanError):
+            helper()
+
+
+def test_plan_issue_goals_rejects_malformed_children():
+    with pytest.raises(InvalidPlanError):
+        plan_issue_goals({'goals': [{'id': 1, 'sub_tasks': 'x'}]})
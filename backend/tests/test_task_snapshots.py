@@ -0,0 +1,50 @@
+"""Task tree snapshots and the webhook deliveries that keep them current."""
+import threading
+
+from services.task_snapshots import TaskSnapshotStore
+
+ISSUES = [{'id': 1, 'title': 'Build the API', 'description': '', 'url': '', 'state': 'open',
+           'labels': ['broad-goal'], 'is_broad_goal': True, 'is_specific_goal': False}]
+
+
+def delivery(repo_name='repo', number=2):
+    return {
+        'action': 'opened',
+        'repository': {'name': repo_name, 'owner': {'login': 'octo'}},
+        'issue': {'number': number, 'title': 'Write docs', 'body': '', 'html_url': '', 'state': 'open', 'labels': []}
+    }
+
+
+def test_webhook_during_a_build_discards_the_build():
+    store = TaskSnapshotStore(ttl=0)
+    fetching = threading.Event()
+    delivered = threading.Event()
+
+    def issues():
+        fetching.set()
+        delivered.wait(5)
+        yield from ISSUES
+
+    builder = threading.Thread(target=store.build, args=('repo', issues(), lambda parent: [], 'octo'))
+    builder.start()
+    assert fetching.wait(5)
+    assert store.apply_webhook('issues', delivery()) is False
+    delivered.set()
+    builder.join(5)
+
+    assert store.get_payload('repo') is None
+    assert store.get_stats()['stale_builds'] == 1
+
+
+def test_webhook_for_a_built_repository_updates_the_snapshot():
+    store = TaskSnapshotStore(ttl=0)
+    store.build('repo', iter(ISSUES), lambda parent: [], owner='octo')
+    assert store.apply_webhook('issues', delivery()) is True
+    assert 'Write docs' in store.get_payload('repo')
+
+
+def test_webhook_for_another_repository_keeps_builds():
+    store = TaskSnapshotStore(ttl=0)
+    store.apply_webhook('issues', delivery(repo_name='other'))
+    store.build('repo', iter(ISSUES), lambda parent: [], owner='octo')
+    assert store.get_payload('repo') is not None
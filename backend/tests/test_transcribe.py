@@ -0,0 +1,46 @@
+"""Streaming transcription: uploads as a multipart field or as the raw request body."""
+import io
+import json
+
+import pytest
+
+import app as app_module
+from services.audio_normalizer import pcm_to_wav
+
+# Two seconds of a 16 kHz mono s16le square wave, already in the target format
+RECORDING = pcm_to_wav((b'\x00\x10' * 40 + b'\x00\xf0' * 40) * 400)
+
+
+def sse_events(response):
+    events = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, '_transcribe_window',
+                        lambda index, total, start, end, wav_bytes: f"window {index}")
+    return app_module.app.test_client()
+
+
+def test_transcribe_stream_accepts_a_raw_body(client):
+    response = client.post('/api/transcribe/stream', data=RECORDING, content_type='audio/wav')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    events = sse_events(response)
+    assert events[0][0] == 'start'
+    assert events[-1] == ('done', {'text': 'window 0', 'failed': []})
+
+
+def test_transcribe_stream_accepts_a_multipart_upload(client):
+    response = client.post('/api/transcribe/stream', data={'audio': (io.BytesIO(RECORDING), 'recording.wav')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert sse_events(response)[-1][0] == 'done'
+
+
+def test_transcribe_stream_rejects_an_empty_body(client):
+    response = client.post('/api/transcribe/stream', data=b'', content_type='audio/wav')
+    assert response.status_code == 400